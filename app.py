@@ -1,6 +1,12 @@
 import logging
-from controllers import ai_controller, user_controller, prompt_controller, parameter_controller, menu_controller,report_controller,favourite_prompt_controller
+from controllers import ai_controller, user_controller, prompt_controller, parameter_controller, menu_controller,report_controller,favourite_prompt_controller,job_controller,metrics_controller
 from database.db_setup import DatabaseSetup
+from utils.process_pool import shutdown_process_pool
+from utils.file_handle_cache import close_file_caches
+from utils.http_util import close_http_clients
+from utils.logging_config import RequestIdMiddleware, configure_logging
+from utils.request_metrics import MetricsMiddleware, mark_process_dead
+from utils.timing import ServerTimingMiddleware
 from fastapi import FastAPI 
 from fastapi.middleware.cors import CORSMiddleware 
 import uvicorn
@@ -18,7 +24,7 @@ app = FastAPI(
 
 app = FastAPI()
 
-logging.basicConfig(level=logging.INFO)
+configure_logging()
 logger = logging.getLogger(__name__)
  
 origins = [
@@ -32,8 +38,15 @@ app.add_middleware(
     allow_credentials=True, # Allow cookies to be included in cross-origin requests
     allow_methods=["*"], # Allow all HTTP methods (GET, POST, PUT, DELETE, etc.)
     allow_headers=["*"], # Allow all headers
+    expose_headers=["Server-Timing", "X-Request-ID"], # Permite ler o detalhamento de latência e o id da requisição no navegador
 )
 
+# Adicionados por último para envolver todos os outros: medem a requisição inteira
+app.add_middleware(ServerTimingMiddleware, allow_origins=origins)
+app.add_middleware(MetricsMiddleware)
+# Mais externo de todos: o request_id vale para qualquer log emitido durante a requisição
+app.add_middleware(RequestIdMiddleware)
+
 
 app.include_router(parameter_controller.router)
 app.include_router(ai_controller.router)
@@ -42,6 +55,24 @@ app.include_router(user_controller.router)
 app.include_router(menu_controller.router)
 app.include_router(report_controller.router)
 app.include_router(favourite_prompt_controller.router)
+app.include_router(job_controller.router)
+app.include_router(metrics_controller.router)
+
+@app.on_event("startup")
+async def startup():
+    # LLM_JOB_WORKERS=0 deixa o consumo da fila para processos `python -m service.job_worker`
+    job_controller.job_worker.start()
+    ai_controller.ai_service.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await job_controller.job_worker.stop()
+    # Depois dos workers de jobs, que também enfileiram histórico e débitos
+    await ai_controller.ai_service.close()
+    await close_file_caches()
+    await close_http_clients()
+    shutdown_process_pool()
+    mark_process_dead()
 
 @app.get("/")
 async def read_root(): 
@@ -54,5 +85,6 @@ if __name__ == "__main__":
         print("Database was setup successfully")
     else:
         print("Database setup failed")
-    uvicorn.run(app, host="0.0.0.0", port=7860)
+    # log_config=None: os logs do uvicorn também passam pelo handler JSON do root
+    uvicorn.run(app, host="0.0.0.0", port=7860, log_config=None)
 
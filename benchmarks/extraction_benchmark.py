@@ -0,0 +1,151 @@
+"""
+Mede a extração local de texto (service/document_extractor.py): tempo de extração
+(serial, no pool de processos e com cache) e a redução do que é enviado ao LLM, comparando
+o arquivo nativo em base64 com o texto extraído.
+
+Sem --corpus, gera um corpus sintético (CSV, TXT, XLSX, XLS, DOCX) em memória. Com --corpus,
+usa os arquivos da pasta (extensões .csv, .txt, .xlsx, .xls, .docx).
+Tokens são estimados em ~4 caracteres por token.
+
+Uso:
+    python -m benchmarks.extraction_benchmark --rows 5000 --copies 8
+    python -m benchmarks.extraction_benchmark --corpus ./amostras
+"""
+import argparse
+import asyncio
+import base64
+import io
+import os
+import random
+import time
+from typing import Dict, List, Tuple
+from models.enums import TipoParametro
+from service.document_extractor import DocumentExtractor
+from utils.file_payload import FilePayload
+from utils.file_util import get_tipo_arquivo
+from utils.process_pool import shutdown_process_pool
+from utils.text_extraction import extract_text
+
+CHARS_PER_TOKEN = 4
+
+Sample = Tuple[str, TipoParametro, bytes]
+
+
+def _rows(count: int, rng: random.Random) -> List[list]:
+    produtos = ["Caneta", "Caderno", "Mochila", "Lápis", "Borracha", "Régua", "Estojo", "Agenda"]
+    return [
+        [i, rng.choice(produtos), f"Descrição do item {i}", rng.randint(1, 500), round(rng.uniform(1, 300), 2), "", None, ""]
+        for i in range(count)
+    ]
+
+
+def build_corpus(rows: int, seed: int = 42) -> List[Sample]:
+    import docx
+    import openpyxl
+
+    rng = random.Random(seed)
+    header = ["id", "produto", "descricao", "quantidade", "preco", "obs", "extra", "vazio"]
+    data = _rows(rows, rng)
+    corpus = []
+
+    csv_text = "\n".join(";".join("" if v is None else str(v) for v in row) for row in [header] + data)
+    corpus.append(("vendas.csv", TipoParametro.ARQUIVO_CSV, csv_text.encode("utf-8")))
+
+    paragraphs = [f"Parágrafo {i}: " + " ".join(rng.choice(["aluno", "escola", "aula", "prova", "nota"]) for _ in range(40)) for i in range(rows // 20)]
+    corpus.append(("relatorio.txt", TipoParametro.ARQUIVO_TXT, "\n\n".join(paragraphs).encode("utf-8")))
+
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "Vendas"
+    sheet.append(header)
+    for row in data:
+        sheet.append(row)
+    # Planilhas reais costumam ter formatação em uma área bem maior que os dados
+    sheet.cell(row=rows + 200, column=20).value = None
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    corpus.append(("vendas.xlsx", TipoParametro.ARQUIVO_XLSX, buffer.getvalue()))
+
+    try:
+        import xlwt
+
+        xls_book = xlwt.Workbook()
+        xls_sheet = xls_book.add_sheet("Vendas")
+        for r, row in enumerate([header] + data[:min(rows, 65000)]):
+            for c, value in enumerate(row):
+                if value is not None:
+                    xls_sheet.write(r, c, value)
+        buffer = io.BytesIO()
+        xls_book.save(buffer)
+        corpus.append(("vendas.xls", TipoParametro.ARQUIVO_XLS, buffer.getvalue()))
+    except ImportError:
+        print("xlwt não instalado: amostra XLS ignorada")
+
+    document = docx.Document()
+    for paragraph in paragraphs:
+        document.add_paragraph(paragraph)
+    table = document.add_table(rows=1, cols=len(header))
+    for cell, title in zip(table.rows[0].cells, header):
+        cell.text = title
+    for row in data[:min(rows, 500)]:
+        for cell, value in zip(table.add_row().cells, row):
+            cell.text = "" if value is None else str(value)
+    buffer = io.BytesIO()
+    document.save(buffer)
+    corpus.append(("documento.docx", TipoParametro.ARQUIVO_DOCX, buffer.getvalue()))
+
+    return corpus
+
+
+def load_corpus(folder: str) -> List[Sample]:
+    corpus = []
+    for name in sorted(os.listdir(folder)):
+        tipo = get_tipo_arquivo(name)
+        if tipo is None or tipo == TipoParametro.IMAGEM:
+            continue
+        with open(os.path.join(folder, name), "rb") as f:
+            corpus.append((name, tipo, f.read()))
+    return corpus
+
+
+async def _extract_all(extractors: List[DocumentExtractor], corpus: List[Sample]) -> float:
+    # Cada extrator tem o próprio cache: na primeira rodada todas as cópias são extraídas de fato
+    payloads = [(FilePayload(file_base64=base64.b64encode(content).decode(), filename=name), tipo) for name, tipo, content in corpus]
+    start = time.perf_counter()
+    await asyncio.gather(*(extractor.extract(payload, tipo) for extractor in extractors for payload, tipo in payloads))
+    return time.perf_counter() - start
+
+
+async def main(args):
+    corpus = load_corpus(args.corpus) if args.corpus else build_corpus(args.rows)
+
+    print(f"{'arquivo':<16} {'nativo b64 (KB)':>15} {'texto (KB)':>11} {'redução':>8} {'tokens texto':>13} {'extração (ms)':>14}")
+    totals: Dict[str, float] = {"native": 0, "text": 0}
+    for name, tipo, content in corpus:
+        start = time.perf_counter()
+        text = extract_text(content, tipo) or ""
+        elapsed = time.perf_counter() - start
+        native_kb = len(base64.b64encode(content)) / 1024
+        text_kb = len(text.encode("utf-8")) / 1024
+        totals["native"] += native_kb
+        totals["text"] += text_kb
+        print(f"{name:<16} {native_kb:>15.1f} {text_kb:>11.1f} {1 - text_kb / native_kb:>8.0%} "
+              f"{len(text) // CHARS_PER_TOKEN:>13,} {elapsed * 1000:>14.1f}")
+    print(f"{'total':<16} {totals['native']:>15.1f} {totals['text']:>11.1f} {1 - totals['text'] / totals['native']:>8.0%}")
+
+    extractors = [DocumentExtractor() for _ in range(args.copies)]
+    files = len(corpus) * args.copies
+    cold = await _extract_all(extractors, corpus)
+    warm = await _extract_all(extractors, corpus)
+    print(f"\npool de {os.getenv('PROCESS_POOL_WORKERS', '2')} processos: {files} arquivos em {cold * 1000:.0f} ms (frio), "
+          f"{warm * 1000:.0f} ms (cache)")
+    shutdown_process_pool()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark da extração local de texto de arquivos")
+    parser.add_argument("--corpus", help="pasta com arquivos de exemplo")
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--copies", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(main(args))
@@ -0,0 +1,65 @@
+"""
+Compara latência e taxa de erro com e sem a política de failover/hedging
+(service/hedging.py), usando provedores stub com latência de cauda longa e erros.
+
+Uso:
+    python -m benchmarks.failover_benchmark --requests 300 --error-rate 0.1
+"""
+import argparse
+import asyncio
+import os
+import time
+from fastapi import HTTPException
+from benchmarks.stub_providers import build_stub_registry
+from models.enums import LLM, TipoPrompt
+from service.hedging import HedgePolicy
+
+
+def _percentile(samples, percentile):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * percentile / 100))]
+
+
+async def _run(total: int, concurrency: int, use_hedging: bool, error_rate: float):
+    registry = build_stub_registry(
+        CHAT_GPT={"median_ms": 300, "sigma": 0.9, "error_rate": error_rate, "seed": 1},
+        GEMINI={"median_ms": 300, "sigma": 0.5, "seed": 2},
+    )
+    policy = HedgePolicy(registry)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                if use_hedging:
+                    await policy.run(TipoPrompt.TEXTO, LLM.CHAT_GPT, "prompt de teste")
+                else:
+                    await registry.dispatch(TipoPrompt.TEXTO, LLM.CHAT_GPT, "prompt de teste")
+                latencies.append(time.perf_counter() - start)
+            except HTTPException:
+                errors += 1
+
+    await asyncio.gather(*[one() for _ in range(total)])
+    return latencies, errors
+
+
+async def main(args):
+    print(f"{'modo':<10} {'ok':>5} {'erros':>6} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9}")
+    for label, use_hedging in (("direto", False), ("hedging", True)):
+        latencies, errors = await _run(args.requests, args.concurrency, use_hedging, args.error_rate)
+        print(f"{label:<10} {len(latencies):>5} {errors:>6} "
+              f"{_percentile(latencies, 50) * 1000:>9.0f} {_percentile(latencies, 95) * 1000:>9.0f} {_percentile(latencies, 99) * 1000:>9.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark da política de failover/hedging")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.1)
+    args = parser.parse_args()
+    os.environ.setdefault("LLM_HEDGE_MIN_DELAY_MS", "200")
+    os.environ.setdefault("LLM_HEDGE_DEFAULT_DELAY_MS", "600")
+    asyncio.run(main(args))
@@ -0,0 +1,75 @@
+"""
+Benchmark de concorrência dos clientes OpenAI/Anthropic contra o stub local.
+
+Compara o modo antigo (cliente síncrono chamado dentro de uma coroutine, bloqueando o
+event loop) com os clientes assíncronos usando o pool httpx compartilhado de utils.http_util.
+
+Uso:
+    python -m benchmarks.provider_concurrency --requests 200 --latency-ms 200
+"""
+import argparse
+import asyncio
+import time
+import anthropic
+from openai import AsyncOpenAI, OpenAI
+from benchmarks.stub_llm_server import STUB_CONFIG, start_in_thread
+from utils.http_util import build_async_http_client, close_http_clients, get_http_timeout
+
+MESSAGES = [{"role": "user", "content": "ping"}]
+
+
+async def _blocking_openai(client: OpenAI):
+    return client.chat.completions.create(model="stub", messages=MESSAGES)
+
+
+async def _blocking_anthropic(client: anthropic.Anthropic):
+    return client.messages.create(model="stub", max_tokens=16, messages=MESSAGES)
+
+
+async def _measure(make_call, total: int) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*[make_call() for _ in range(total)])
+    return time.perf_counter() - start
+
+
+async def run(total: int, base_url: str):
+    results = []
+
+    sync_openai = OpenAI(api_key="stub", base_url=f"{base_url}/v1")
+    sync_anthropic = anthropic.Anthropic(api_key="stub", base_url=base_url)
+    results.append(("openai", "sync (antes)", await _measure(lambda: _blocking_openai(sync_openai), total)))
+    results.append(("anthropic", "sync (antes)", await _measure(lambda: _blocking_anthropic(sync_anthropic), total)))
+
+    async_openai = AsyncOpenAI(
+        api_key="stub",
+        base_url=f"{base_url}/v1",
+        http_client=build_async_http_client("OPENAI"),
+        timeout=get_http_timeout("OPENAI"),
+    )
+    async_anthropic = anthropic.AsyncAnthropic(
+        api_key="stub",
+        base_url=base_url,
+        http_client=build_async_http_client("ANTHROPIC"),
+        timeout=get_http_timeout("ANTHROPIC"),
+    )
+    results.append(("openai", "async (depois)", await _measure(
+        lambda: async_openai.chat.completions.create(model="stub", messages=MESSAGES), total)))
+    results.append(("anthropic", "async (depois)", await _measure(
+        lambda: async_anthropic.messages.create(model="stub", max_tokens=16, messages=MESSAGES), total)))
+    await close_http_clients()
+
+    print(f"{'provedor':<10} {'modo':<15} {'reqs':>5} {'tempo (s)':>10} {'req/s':>8}")
+    for provider, mode, elapsed in results:
+        print(f"{provider:<10} {mode:<15} {total:>5} {elapsed:>10.2f} {total / elapsed:>8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de concorrência dos clientes de LLM")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--port", type=int, default=9100)
+    args = parser.parse_args()
+
+    STUB_CONFIG["latency_ms"] = args.latency_ms
+    start_in_thread(args.port)
+    asyncio.run(run(args.requests, f"http://127.0.0.1:{args.port}"))
@@ -0,0 +1,486 @@
+"""
+Servidor HTTP local que imita as APIs da OpenAI (chat completions, responses e files), da
+Anthropic (messages e files) e do Gemini (generateContent/streamGenerateContent via REST),
+incluindo streaming. Usado nos benchmarks e testes de carga para medir vazão e latência de
+cauda sem chamar (nem pagar) os provedores reais.
+
+Para apontar os managers para o stub:
+    OPENAI_BASE_URL=http://127.0.0.1:9100/v1
+    ANTHROPIC_BASE_URL=http://127.0.0.1:9100
+    GEMINI_BASE_URL=http://127.0.0.1:9100
+    GEMINI_API_KEY=stub (e chaves quaisquer para OPENAI_API_KEY/ANTHROPIC_API_KEY)
+
+Latência até o primeiro token segue a distribuição escolhida (fixed, uniform, lognormal ou
+exponential); o restante da resposta é gerado a --tokens-per-second. Erros 500 acontecem com
+probabilidade --error-rate e 429 com --rate-limit-rate; além disso, a cada --burst-every-s
+segundos todas as requisições recebem 429 (com Retry-After) durante --burst-duration-s.
+A configuração pode ser alterada em execução com POST /stub/config e os contadores lidos em
+GET /stub/stats (zerados com DELETE /stub/stats).
+
+Uso:
+    python -m benchmarks.stub_llm_server --port 9100 --latency-ms 500
+    python -m benchmarks.stub_llm_server --latency-dist lognormal --latency-ms 800 --latency-sigma 0.6 \\
+        --tokens-per-second 80 --output-tokens 300 --error-rate 0.01 --burst-every-s 30 --burst-duration-s 2 --seed 42
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import AsyncIterator, List, Optional
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+STUB_CONFIG = {
+    "latency_ms": 500.0,
+    "latency_dist": "fixed",  # fixed | uniform | lognormal | exponential
+    "latency_sigma": 0.5,  # desvio do log (lognormal) ou meia largura relativa (uniform)
+    "tokens_per_second": 0.0,  # 0 = resposta inteira sem atraso adicional
+    "output_tokens": 10,
+    "error_rate": 0.0,
+    "rate_limit_rate": 0.0,
+    "burst_every_s": 0.0,  # 0 = sem rajadas de 429
+    "burst_duration_s": 0.0,
+    "retry_after_s": 1.0,
+    "seed": None,
+    "response_text": "Resposta simulada pelo servidor stub.",
+}
+
+CHARS_PER_TOKEN = 4
+_STREAM_CHUNK_TOKENS = 5
+
+app = FastAPI()
+_random = random.Random()
+_started_at = time.monotonic()
+_stats: Counter = Counter()
+
+
+def configure(**overrides) -> None:
+    STUB_CONFIG.update({key: value for key, value in overrides.items() if value is not None})
+    if overrides.get("seed") is not None:
+        _random.seed(overrides["seed"])
+
+
+def _first_token_delay() -> float:
+    latency = STUB_CONFIG["latency_ms"] / 1000
+    dist = STUB_CONFIG["latency_dist"]
+    sigma = STUB_CONFIG["latency_sigma"]
+    if dist == "uniform":
+        return _random.uniform(latency * (1 - sigma), latency * (1 + sigma))
+    if dist == "lognormal":
+        # latency_ms é a mediana; sigma controla a cauda
+        return latency * _random.lognormvariate(0, sigma)
+    if dist == "exponential":
+        return _random.expovariate(1 / latency) if latency else 0
+    return latency
+
+
+def _token_delay(tokens: int) -> float:
+    tps = STUB_CONFIG["tokens_per_second"]
+    return tokens / tps if tps > 0 else 0
+
+
+def _in_burst() -> bool:
+    every = STUB_CONFIG["burst_every_s"]
+    return every > 0 and (time.monotonic() - _started_at) % every < STUB_CONFIG["burst_duration_s"]
+
+
+def _injected_error() -> Optional[int]:
+    """Status de erro a devolver nesta requisição, ou None"""
+    if _in_burst() or _random.random() < STUB_CONFIG["rate_limit_rate"]:
+        return 429
+    if _random.random() < STUB_CONFIG["error_rate"]:
+        return 500
+    return None
+
+
+def _response_text() -> str:
+    base = STUB_CONFIG["response_text"]
+    words = base.split()
+    target_chars = STUB_CONFIG["output_tokens"] * CHARS_PER_TOKEN
+    text = base
+    i = 0
+    while len(text) < target_chars:
+        text += " " + words[i % len(words)]
+        i += 1
+    return text
+
+
+def _pieces(text: str) -> List[str]:
+    size = _STREAM_CHUNK_TOKENS * CHARS_PER_TOKEN
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def _input_tokens(body: dict) -> int:
+    # Conta o corpo inteiro: aproximação suficiente para benchmarks
+    return max(1, len(json.dumps(body, ensure_ascii=False)) // CHARS_PER_TOKEN)
+
+
+def _error_response(provider: str, status: int) -> JSONResponse:
+    message = "Rate limit simulado pelo stub." if status == 429 else "Erro interno simulado pelo stub."
+    if provider == "anthropic":
+        kind = "rate_limit_error" if status == 429 else "api_error"
+        content = {"type": "error", "error": {"type": kind, "message": message}}
+    elif provider == "gemini":
+        kind = "RESOURCE_EXHAUSTED" if status == 429 else "INTERNAL"
+        content = {"error": {"code": status, "message": message, "status": kind}}
+    else:
+        kind = "rate_limit_exceeded" if status == 429 else "server_error"
+        content = {"error": {"message": message, "type": kind, "code": kind}}
+    headers = {"retry-after": str(STUB_CONFIG["retry_after_s"])} if status == 429 else None
+    return JSONResponse(status_code=status, content=content, headers=headers)
+
+
+async def _begin(provider: str, route: str) -> Optional[JSONResponse]:
+    """Conta a requisição, aplica a latência até o primeiro token e injeta erros"""
+    _stats[f"{provider}:{route}:requests"] += 1
+    await asyncio.sleep(_first_token_delay())
+    status = _injected_error()
+    if status is not None:
+        _stats[f"{provider}:{route}:{status}"] += 1
+        return _error_response(provider, status)
+    return None
+
+
+async def _paced(pieces: List[str]) -> AsyncIterator[str]:
+    for piece in pieces:
+        await asyncio.sleep(_token_delay(len(piece) // CHARS_PER_TOKEN or 1))
+        yield piece
+
+
+def _sse(data: dict, event: str = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _event_stream(events: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(events, media_type="text/event-stream")
+
+
+# --- OpenAI ---
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    error = await _begin("openai", "chat")
+    if error:
+        return error
+    model = body.get("model", "stub")
+    text = _response_text()
+    usage = {"prompt_tokens": _input_tokens(body), "completion_tokens": STUB_CONFIG["output_tokens"]}
+    usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+
+    if not body.get("stream"):
+        await asyncio.sleep(_token_delay(STUB_CONFIG["output_tokens"]))
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": text},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": usage,
+        }
+
+    include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+    async def events():
+        base = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model}
+        async for piece in _paced(_pieces(text)):
+            yield _sse({**base, "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]})
+        yield _sse({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if include_usage:
+            yield _sse({**base, "choices": [], "usage": usage})
+        yield "data: [DONE]\n\n"
+
+    return _event_stream(events())
+
+
+@app.post("/v1/responses")
+async def responses(request: Request):
+    body = await request.json()
+    error = await _begin("openai", "responses")
+    if error:
+        return error
+    text = _response_text()
+    response_id = f"resp_{uuid.uuid4().hex}"
+    message_id = f"msg_{uuid.uuid4().hex}"
+    usage = {
+        "input_tokens": _input_tokens(body),
+        "input_tokens_details": {"cached_tokens": 0},
+        "output_tokens": STUB_CONFIG["output_tokens"],
+        "output_tokens_details": {"reasoning_tokens": 0},
+    }
+    usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+
+    def response_object(status: str, output: list, with_usage: bool) -> dict:
+        return {
+            "id": response_id,
+            "object": "response",
+            "created_at": int(time.time()),
+            "model": body.get("model", "stub"),
+            "status": status,
+            "output": output,
+            "parallel_tool_calls": True,
+            "tool_choice": "auto",
+            "tools": [],
+            "usage": usage if with_usage else None,
+        }
+
+    message = {
+        "id": message_id,
+        "type": "message",
+        "role": "assistant",
+        "status": "completed",
+        "content": [{"type": "output_text", "text": text, "annotations": []}],
+    }
+
+    if not body.get("stream"):
+        await asyncio.sleep(_token_delay(STUB_CONFIG["output_tokens"]))
+        return response_object("completed", [message], True)
+
+    async def events():
+        sequence = 0
+
+        def event(kind: str, **data) -> str:
+            nonlocal sequence
+            sequence += 1
+            return _sse({"type": kind, "sequence_number": sequence, **data}, kind)
+
+        yield event("response.created", response=response_object("in_progress", [], False))
+        async for piece in _paced(_pieces(text)):
+            yield event("response.output_text.delta", item_id=message_id, output_index=0, content_index=0, delta=piece)
+        yield event("response.output_text.done", item_id=message_id, output_index=0, content_index=0, text=text)
+        yield event("response.completed", response=response_object("completed", [message], True))
+
+    return _event_stream(events())
+
+
+@app.post("/v1/files")
+async def upload_file(request: Request):
+    # OpenAI e Anthropic usam o mesmo caminho; a Anthropic sempre manda anthropic-version
+    provider = "anthropic" if "anthropic-version" in request.headers else "openai"
+    form = await request.form()
+    upload = form.get("file")
+    content = await upload.read() if upload is not None else b""
+    await form.close()
+    error = await _begin(provider, "files")
+    if error:
+        return error
+    filename = getattr(upload, "filename", None) or "arquivo"
+    if provider == "anthropic":
+        return {
+            "id": f"file_{uuid.uuid4().hex}",
+            "type": "file",
+            "filename": filename,
+            "mime_type": getattr(upload, "content_type", None) or "application/octet-stream",
+            "size_bytes": len(content),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+    return {
+        "id": f"file-{uuid.uuid4().hex}",
+        "object": "file",
+        "bytes": len(content),
+        "created_at": int(time.time()),
+        "filename": filename,
+        "purpose": form.get("purpose") or "user_data",
+        "status": "processed",
+    }
+
+
+@app.delete("/v1/files/{file_id}")
+async def delete_file(file_id: str, request: Request):
+    if "anthropic-version" in request.headers:
+        _stats["anthropic:files_delete:requests"] += 1
+        return {"id": file_id, "type": "file_deleted"}
+    _stats["openai:files_delete:requests"] += 1
+    return {"id": file_id, "object": "file", "deleted": True}
+
+
+# --- Anthropic ---
+
+@app.post("/v1/messages")
+async def messages(request: Request):
+    body = await request.json()
+    error = await _begin("anthropic", "messages")
+    if error:
+        return error
+    model = body.get("model", "stub")
+    text = _response_text()
+    message_id = f"msg_{uuid.uuid4().hex}"
+    input_tokens = _input_tokens(body)
+
+    if not body.get("stream"):
+        await asyncio.sleep(_token_delay(STUB_CONFIG["output_tokens"]))
+        return {
+            "id": message_id,
+            "type": "message",
+            "role": "assistant",
+            "model": model,
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": input_tokens, "output_tokens": STUB_CONFIG["output_tokens"]},
+        }
+
+    async def events():
+        yield _sse({
+            "type": "message_start",
+            "message": {
+                "id": message_id,
+                "type": "message",
+                "role": "assistant",
+                "model": model,
+                "content": [],
+                "stop_reason": None,
+                "stop_sequence": None,
+                "usage": {"input_tokens": input_tokens, "output_tokens": 1},
+            },
+        }, "message_start")
+        yield _sse({"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}}, "content_block_start")
+        async for piece in _paced(_pieces(text)):
+            yield _sse({"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": piece}}, "content_block_delta")
+        yield _sse({"type": "content_block_stop", "index": 0}, "content_block_stop")
+        yield _sse({
+            "type": "message_delta",
+            "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+            "usage": {"output_tokens": STUB_CONFIG["output_tokens"]},
+        }, "message_delta")
+        yield _sse({"type": "message_stop"}, "message_stop")
+
+    return _event_stream(events())
+
+
+# --- Gemini (transporte REST do SDK) ---
+
+def _gemini_chunk(text: str, body: dict, finished: bool) -> dict:
+    chunk = {
+        "candidates": [{
+            "content": {"parts": [{"text": text}], "role": "model"},
+            "index": 0,
+            **({"finishReason": "STOP"} if finished else {}),
+        }],
+    }
+    if finished:
+        chunk["usageMetadata"] = {
+            "promptTokenCount": _input_tokens(body),
+            "candidatesTokenCount": STUB_CONFIG["output_tokens"],
+            "totalTokenCount": _input_tokens(body) + STUB_CONFIG["output_tokens"],
+        }
+    return chunk
+
+
+@app.post("/v1beta/models/{model_action}")
+async def gemini_generate(model_action: str, request: Request):
+    body = await request.json()
+    action = model_action.rsplit(":", 1)[-1]
+    error = await _begin("gemini", action)
+    if error:
+        return error
+    text = _response_text()
+
+    if action != "streamGenerateContent":
+        await asyncio.sleep(_token_delay(STUB_CONFIG["output_tokens"]))
+        return _gemini_chunk(text, body, finished=True)
+
+    async def chunks():
+        # Sem alt=sse o SDK lê um array JSON incremental
+        pieces = _pieces(text)
+        yield "["
+        i = 0
+        async for piece in _paced(pieces):
+            i += 1
+            yield ("," if i > 1 else "") + json.dumps(_gemini_chunk(piece, body, finished=i == len(pieces)), ensure_ascii=False)
+        yield "]"
+
+    return StreamingResponse(chunks(), media_type="application/json")
+
+
+# --- Controle ---
+
+@app.get("/stub/config")
+async def get_config():
+    return STUB_CONFIG
+
+
+@app.post("/stub/config")
+async def update_config(request: Request):
+    overrides = await request.json()
+    unknown = set(overrides) - set(STUB_CONFIG)
+    if unknown:
+        return JSONResponse(status_code=400, content={"detail": f"Chaves desconhecidas: {sorted(unknown)}"})
+    configure(**overrides)
+    return STUB_CONFIG
+
+
+@app.get("/stub/stats")
+async def get_stats():
+    return dict(_stats)
+
+
+@app.delete("/stub/stats")
+async def reset_stats():
+    _stats.clear()
+    return {}
+
+
+def start_in_thread(port: int) -> uvicorn.Server:
+    """Sobe o stub em uma thread daemon e aguarda até que esteja aceitando conexões"""
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Opções do stub, reaproveitadas pelos benchmarks que sobem o servidor em processo"""
+    parser.add_argument("--latency-ms", type=float, default=STUB_CONFIG["latency_ms"])
+    parser.add_argument("--latency-dist", choices=["fixed", "uniform", "lognormal", "exponential"], default=STUB_CONFIG["latency_dist"])
+    parser.add_argument("--latency-sigma", type=float, default=STUB_CONFIG["latency_sigma"])
+    parser.add_argument("--tokens-per-second", type=float, default=STUB_CONFIG["tokens_per_second"])
+    parser.add_argument("--output-tokens", type=int, default=STUB_CONFIG["output_tokens"])
+    parser.add_argument("--error-rate", type=float, default=STUB_CONFIG["error_rate"])
+    parser.add_argument("--rate-limit-rate", type=float, default=STUB_CONFIG["rate_limit_rate"])
+    parser.add_argument("--burst-every-s", type=float, default=STUB_CONFIG["burst_every_s"])
+    parser.add_argument("--burst-duration-s", type=float, default=STUB_CONFIG["burst_duration_s"])
+    parser.add_argument("--retry-after-s", type=float, default=STUB_CONFIG["retry_after_s"])
+    parser.add_argument("--seed", type=int, default=STUB_CONFIG["seed"])
+
+
+def configure_from_args(args: argparse.Namespace) -> None:
+    configure(
+        latency_ms=args.latency_ms,
+        latency_dist=args.latency_dist,
+        latency_sigma=args.latency_sigma,
+        tokens_per_second=args.tokens_per_second,
+        output_tokens=args.output_tokens,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        burst_every_s=args.burst_every_s,
+        burst_duration_s=args.burst_duration_s,
+        retry_after_s=args.retry_after_s,
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub local das APIs de LLM")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    add_arguments(parser)
+    args = parser.parse_args()
+    configure_from_args(args)
+    uvicorn.run(app, host=args.host, port=args.port)
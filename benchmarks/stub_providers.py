@@ -0,0 +1,67 @@
+"""
+Provedores de LLM falsos, em processo, com latência e erros injetáveis.
+
+Implementam a mesma interface dos módulos de managers/ (process, process_file,
+process_web_search e as versões stream*), então podem ser registrados em um
+ProviderRegistry no lugar dos provedores reais.
+"""
+import asyncio
+import random
+from typing import AsyncIterator
+from models.enums import LLM, TipoParametro, TipoPrompt
+from models.llm_models import LLMResult
+from service.provider_registry import LLMProvider, ProviderRegistry
+from utils.file_payload import FilePayload
+
+
+class StubManager:
+    def __init__(self, name: str, median_ms: float = 500, sigma: float = 0.5, error_rate: float = 0.0, seed: int = None):
+        self.name = name
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.calls = 0
+
+    async def _simulate(self, prompt: str, model: str) -> LLMResult:
+        self.calls += 1
+        # Latência log-normal: a maioria perto da mediana, com cauda longa
+        await asyncio.sleep(self.median_ms * self.random.lognormvariate(0, self.sigma) / 1000)
+        if self.random.random() < self.error_rate:
+            raise RuntimeError(f"Erro injetado pelo stub {self.name}")
+        return LLMResult(text=f"[{self.name}] {prompt[:50]}", model=model, input_tokens=len(prompt) // 4, output_tokens=10)
+
+    async def process(self, prompt_content: str, model: str) -> LLMResult:
+        return await self._simulate(prompt_content, model)
+
+    async def process_file(self, file: FilePayload, prompt_text: str, tipo_arquivo: TipoParametro, model: str) -> LLMResult:
+        return await self._simulate(prompt_text, model)
+
+    async def process_web_search(self, prompt_content: str, model: str) -> LLMResult:
+        return await self._simulate(prompt_content, model)
+
+    async def stream(self, prompt_content: str, model: str, result: LLMResult) -> AsyncIterator[str]:
+        full = await self._simulate(prompt_content, model)
+        for word in full.text.split(" "):
+            yield word + " "
+        result.input_tokens, result.output_tokens = full.input_tokens, full.output_tokens
+
+    async def stream_file(self, file: FilePayload, prompt_text: str, tipo_arquivo: TipoParametro, model: str, result: LLMResult) -> AsyncIterator[str]:
+        async for delta in self.stream(prompt_text, model, result):
+            yield delta
+
+    async def stream_web_search(self, prompt_content: str, model: str, result: LLMResult) -> AsyncIterator[str]:
+        async for delta in self.stream(prompt_content, model, result):
+            yield delta
+
+
+def build_stub_registry(**overrides) -> ProviderRegistry:
+    """
+    Registry com os três LLMs apontando para stubs. `overrides` recebe kwargs de
+    StubManager por LLM, ex.: build_stub_registry(CHAT_GPT={"error_rate": 0.3}).
+    """
+    registry = ProviderRegistry()
+    for llm in LLM:
+        stub = StubManager(llm.name, **overrides.get(llm.name, {}))
+        registry.register(LLMProvider(llm, llm.name, f"STUB_{llm.name}", stub, {tipo: f"stub-{llm.name.lower()}" for tipo in TipoPrompt}))
+    return registry
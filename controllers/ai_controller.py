@@ -1,10 +1,18 @@
-from fastapi import APIRouter, HTTPException, Depends, Response, File, UploadFile, Form
+from fastapi import APIRouter, HTTPException, Depends, Header, Request, Response, File, UploadFile, Form
+from pydantic import ValidationError
+from starlette.datastructures import FormData, UploadFile as FormFile
+from fastapi.responses import StreamingResponse
 from utils.token_util import verify_token
-from models.prompt_models import PromptRequest 
+from models.prompt_models import BatchPromptRequest, BatchResponse, FilledParameter, PromptRequest 
+from models.enums import TipoParametro
 from service.ai_service_new import AIService
+from utils.deadline import Deadline
+from utils.file_payload import FilePayload
+from utils.file_util import get_tipo_arquivo
+from utils.upload_util import parse_upload
+from typing import Optional
 import logging
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 ai_service = AIService()
@@ -13,7 +21,8 @@ router = APIRouter()
 @router.post("/api/process/")
 async def process_ai(
     req: PromptRequest, 
-    token: dict = Depends(verify_token)
+    token: dict = Depends(verify_token),
+    x_request_timeout: Optional[float] = Header(default=None),
 ):
     try:
         user_id = token.get("uid") 
@@ -21,7 +30,7 @@ async def process_ai(
         if not user_id:
             raise HTTPException(status_code=403, detail="ID de usuário não encontrado no token ou token inválido.")
  
-        response_content = await ai_service.route_ai(req, user_id)
+        response_content = await ai_service.route_ai(req, user_id, Deadline.from_header(x_request_timeout))
          
         return response_content
  
@@ -30,4 +39,129 @@ async def process_ai(
         raise he
     except Exception as e:
         logger.error(f"Erro genérico em /api/process: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Erro interno do servidor: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Erro interno do servidor: {str(e)}")
+
+
+@router.post("/api/process/stream")
+async def process_ai_stream(
+    req: PromptRequest, 
+    token: dict = Depends(verify_token),
+    x_request_timeout: Optional[float] = Header(default=None),
+):
+    try:
+        user_id = token.get("uid") 
+        
+        if not user_id:
+            raise HTTPException(status_code=403, detail="ID de usuário não encontrado no token ou token inválido.")
+ 
+        events = await ai_service.stream_ai(req, user_id, Deadline.from_header(x_request_timeout))
+         
+        return StreamingResponse(
+            events,
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+ 
+    except HTTPException as he:  
+        logger.error(f"HTTP Erro em /api/process/stream: {str(he.detail)} (Status: {he.status_code})")
+        raise he
+    except Exception as e:
+        logger.error(f"Erro genérico em /api/process/stream: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Erro interno do servidor: {str(e)}")
+
+
+
+@router.post("/api/process/batch")
+async def process_ai_batch(
+    batch: BatchPromptRequest,
+    token: dict = Depends(verify_token),
+    x_request_timeout: Optional[float] = Header(default=None),
+):
+    try:
+        user_id = token.get("uid")
+
+        if not user_id:
+            raise HTTPException(status_code=403, detail="ID de usuário não encontrado no token ou token inválido.")
+
+        items = await ai_service.route_batch(batch.requests, user_id, Deadline.from_header(x_request_timeout))
+
+        if batch.stream:
+            async def ndjson():
+                async for item in items:
+                    yield item.model_dump_json() + "\n"
+            return StreamingResponse(ndjson(), media_type="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
+
+        results = sorted([item async for item in items], key=lambda item: item.index)
+        return BatchResponse(results=results, credits_used=sum(item.credits for item in results))
+
+    except HTTPException as he:
+        logger.error(f"HTTP Erro em /api/process/batch: {str(he.detail)} (Status: {he.status_code})")
+        raise he
+    except Exception as e:
+        logger.error(f"Erro genérico em /api/process/batch: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Erro interno do servidor: {str(e)}")
+
+
+
+def _upload_request(form: FormData) -> PromptRequest:
+    """
+    Monta o PromptRequest do upload multipart: o campo `request` traz o JSON do PromptRequest
+    sem o arquivo e o campo `file` traz o arquivo, que vira o parâmetro `titulo` (padrão
+    "arquivo") do tipo `tipo_arquivo` (deduzido da extensão se omitido).
+    """
+    upload = form.get("file")
+    if not isinstance(upload, FormFile) or not upload.size:
+        raise HTTPException(status_code=400, detail="Arquivo não enviado no campo 'file'.")
+
+    try:
+        req = PromptRequest.model_validate_json(form.get("request") or "")
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=f"Campo 'request' inválido: {e.errors(include_url=False)}")
+
+    tipo_arquivo = form.get("tipo_arquivo")
+    try:
+        tipo = TipoParametro(int(tipo_arquivo)) if tipo_arquivo else get_tipo_arquivo(upload.filename)
+    except ValueError:
+        tipo = None
+    if tipo is None or tipo in (TipoParametro.TEXTO, TipoParametro.NUMERICO):
+        raise HTTPException(status_code=400, detail="Tipo do arquivo inválido ou não reconhecido.")
+
+    # O form só é fechado quando nem esta requisição nem uma chamada compartilhada
+    # (single-flight) que ela tenha iniciado precisarem mais do arquivo
+    payload = FilePayload(file=upload.file, size=upload.size, filename=upload.filename, on_close=form.close)
+    payload.hold()
+    req.parameters.append(FilledParameter(titulo=form.get("titulo") or "arquivo", tipo=tipo, valor=payload))
+    return req
+
+
+@router.post("/api/process/upload")
+async def process_ai_upload(
+    request: Request,
+    token: dict = Depends(verify_token),
+    x_request_timeout: Optional[float] = Header(default=None),
+):
+    form = None
+    payload = None
+    try:
+        user_id = token.get("uid")
+
+        if not user_id:
+            raise HTTPException(status_code=403, detail="ID de usuário não encontrado no token ou token inválido.")
+
+        form = await parse_upload(request)
+        req = _upload_request(form)
+        payload = req.parameters[-1].valor
+
+        return await ai_service.route_ai(req, user_id, Deadline.from_header(x_request_timeout))
+
+    except HTTPException as he:
+        logger.error(f"HTTP Erro em /api/process/upload: {str(he.detail)} (Status: {he.status_code})")
+        raise he
+    except Exception as e:
+        logger.error(f"Erro genérico em /api/process/upload: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Erro interno do servidor: {str(e)}")
+    finally:
+        if payload is not None:
+            await payload.release()
+        elif form is not None:
+            await form.close()
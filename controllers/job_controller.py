@@ -0,0 +1,64 @@
+from fastapi import APIRouter, HTTPException, Depends
+from utils.token_util import verify_token
+from models.enums import StatusJob
+from models.job_models import JobCreated, JobResponse
+from models.prompt_models import PromptRequest
+from database.job_repo import JobRepository
+from controllers.ai_controller import ai_service
+from service.job_worker import JobWorker
+import logging
+
+logger = logging.getLogger(__name__)
+
+job_repo = JobRepository()
+job_worker = JobWorker(ai_service, job_repo)
+router = APIRouter()
+
+@router.post("/api/jobs", status_code=202, response_model=JobCreated)
+async def create_job(
+    req: PromptRequest,
+    token: dict = Depends(verify_token)
+):
+    """
+    Enfileira o prompt e devolve o id do job. Os créditos são reservados quando o job roda
+    (route_ai, como nas chamadas síncronas): sem saldo nesse momento o job termina como
+    falho com o 402, sem nova tentativa, e nada é cobrado.
+    """
+    try:
+        user_id = token.get("uid")
+
+        if not user_id:
+            raise HTTPException(status_code=403, detail="ID de usuário não encontrado no token ou token inválido.")
+
+        # Só uma recusa antecipada para quem já está sem saldo; não garante nada, a garantia
+        # contra gastar além do saldo é a reserva atômica feita pelo worker
+        if not await ai_service.credits_repo.has_credits(user_id):
+            raise HTTPException(status_code=402, detail="Créditos insuficientes para realizar esta operação.")
+
+        job_id = await job_worker.enqueue(user_id, req)
+
+        return JobCreated(job_id=job_id, status=StatusJob.PENDENTE)
+
+    except HTTPException as he:
+        logger.error(f"HTTP Erro em /api/jobs: {str(he.detail)} (Status: {he.status_code})")
+        raise he
+    except Exception as e:
+        logger.error(f"Erro genérico em /api/jobs: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Erro interno do servidor: {str(e)}")
+
+
+@router.get("/api/jobs/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: str,
+    token: dict = Depends(verify_token)
+):
+    user_id = token.get("uid")
+
+    if not user_id:
+        raise HTTPException(status_code=403, detail="ID de usuário não encontrado no token ou token inválido.")
+
+    job = await job_repo.get(job_id, user_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job com ID {job_id} não encontrado.")
+
+    return JobResponse(job_id=job["id"], **{k: v for k, v in job.items() if k != "id"})
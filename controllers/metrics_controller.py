@@ -0,0 +1,18 @@
+import asyncio
+import os
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Response
+from utils.request_metrics import render_metrics
+
+router = APIRouter(tags=["Metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics(authorization: Optional[str] = Header(default=None)):
+    # Com METRICS_TOKEN definido, o scraper precisa enviar "Authorization: Bearer <token>"
+    token = os.getenv("METRICS_TOKEN")
+    if token and authorization != f"Bearer {token}":
+        raise HTTPException(status_code=401, detail="Token de métricas inválido.")
+    # Em modo multiprocesso a coleta lê arquivos de todos os workers: fora do event loop
+    content, content_type = await asyncio.to_thread(render_metrics)
+    return Response(content=content, media_type=content_type)
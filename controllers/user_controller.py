@@ -1,4 +1,5 @@
 from typing import List
+from uuid import UUID
 from fastapi import APIRouter, HTTPException, Depends, Header
 from pydantic import BaseModel
 from firebase_admin import auth
@@ -6,9 +7,8 @@ from utils.token_util import validate_password,verify_token
 from managers.user_mgr import UserManager
 import logging
 from managers.credits_mgr import get_user_data
+from managers.log_mgr import get_history_detail
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
@@ -97,4 +97,9 @@ async def get_usage_data(token=Depends(verify_token)):
         user_data = await get_user_data(user_id)
         return user_data
     except Exception as e:
-        raise HTTPException(status_code=404, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=404, detail=str(e))
+
+# Resposta completa de um item do histórico (a listagem do dashboard traz só a prévia)
+@router.get("/api/users/history/{log_id}")
+async def get_history_item(log_id: UUID, token=Depends(verify_token)):
+    return await get_history_detail(token.get("uid"), log_id)
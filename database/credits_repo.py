@@ -5,16 +5,40 @@ from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
+from typing import Any, Dict, List, Optional
 from dotenv import load_dotenv
 from database.db_config import AsyncSessionLocal
+from utils.metrics import CREDIT_OPERATIONS, CREDITS_AMOUNT
+from utils.timing import timed_async
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
+
+# Efeito de cada lançamento de aux.credit_transactions no saldo disponível. O `consume` de uma
+# reserva não mexe no saldo (os créditos já saíram no `reserve`); sem reserva é um débito direto.
+BALANCE_DELTA_SQL = """
+    CASE kind
+        WHEN 'grant' THEN amount
+        WHEN 'refund' THEN amount
+        WHEN 'reserve' THEN -amount
+        WHEN 'consume' THEN CASE WHEN reservation_id IS NULL THEN -amount ELSE 0 END
+    END
+"""
  
 class UserCreditRepository: 
+    """
+    Créditos dos usuários. Toda movimentação é registrada no livro-razão append-only
+    aux.credit_transactions (grant, reserve, consume, refund) no mesmo comando que atualiza
+    aux.user_credits, o saldo materializado lido pelo dashboard e pelas reservas.
+    reconcile_balances() recalcula os saldos a partir do livro-razão.
+    """
+    _table_ready = False
+
     async def _ensure_table_exists(self):
         """Ensures the user_credits table exists."""
+        if UserCreditRepository._table_ready:
+            return
         async with AsyncSessionLocal() as session:
             try:
                 create_table_sql = text("""
@@ -24,7 +48,57 @@ class UserCreditRepository:
                     );
                 """)
                 await session.execute(create_table_sql)
+                # Créditos retidos por requisições em andamento (já descontados de user_credits)
+                await session.execute(text("""
+                    CREATE TABLE IF NOT EXISTS aux.credit_reservations (
+                        id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+                        user_id TEXT NOT NULL,
+                        amount INTEGER NOT NULL,
+                        created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+                        expires_at TIMESTAMP WITH TIME ZONE NOT NULL
+                    );
+                """))
+                await session.execute(text("""
+                    CREATE INDEX IF NOT EXISTS idx_credit_reservations_expires_at
+                    ON aux.credit_reservations (expires_at);
+                """))
+                # Livro-razão: amount é sempre positivo, o sinal vem de `kind` (BALANCE_DELTA_SQL)
+                await session.execute(text("""
+                    CREATE TABLE IF NOT EXISTS aux.credit_transactions (
+                        id BIGSERIAL PRIMARY KEY,
+                        user_id TEXT NOT NULL,
+                        kind TEXT NOT NULL CHECK (kind IN ('grant', 'reserve', 'consume', 'refund')),
+                        amount INTEGER NOT NULL CHECK (amount > 0),
+                        reservation_id UUID,
+                        request_id UUID,
+                        created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+                    );
+                """))
+                await session.execute(text("""
+                    CREATE INDEX IF NOT EXISTS idx_credit_transactions_user_id
+                    ON aux.credit_transactions (user_id, id);
+                """))
+                # Saldos anteriores ao livro-razão entram como um grant de abertura (mais o que
+                # estiver reservado, com o respectivo reserve). O lock evita a abertura em dobro
+                # quando vários processos sobem juntos.
+                await session.execute(text("SELECT pg_advisory_xact_lock(hashtext('aux.credit_transactions'));"))
+                await session.execute(text("""
+                    WITH opening AS (
+                        SELECT u.user_id,
+                               u.credits + COALESCE((SELECT SUM(r.amount) FROM aux.credit_reservations r WHERE r.user_id = u.user_id), 0) AS amount
+                        FROM aux.user_credits u
+                        WHERE NOT EXISTS (SELECT 1 FROM aux.credit_transactions t WHERE t.user_id = u.user_id)
+                    ),
+                    reserved AS (
+                        INSERT INTO aux.credit_transactions (user_id, kind, amount, reservation_id)
+                        SELECT r.user_id, 'reserve', r.amount, r.id
+                        FROM aux.credit_reservations r JOIN opening o ON o.user_id = r.user_id
+                    )
+                    INSERT INTO aux.credit_transactions (user_id, kind, amount)
+                    SELECT user_id, 'grant', amount FROM opening WHERE amount > 0;
+                """))
                 await session.commit()
+                UserCreditRepository._table_ready = True
             except SQLAlchemyError as e:
                 await session.rollback()
                 logger.error(f"SQLAlchemy error during user_credits table creation: {e}", exc_info=True)
@@ -35,8 +109,11 @@ class UserCreditRepository:
                 raise # Re-raise other exceptions
 
 
+    @timed_async("db.credits")
     async def add_credits(self, user_id: str, amount: int) -> None:
         """Adds a specified amount of credits to a user's balance."""
+        if amount == 0:
+            return
         if amount < 0:
             logger.warning(f"Attempted to add negative credits ({amount}) for user: {user_id}")
             return # Do not add negative credits
@@ -48,6 +125,10 @@ class UserCreditRepository:
             try:
                 # Use INSERT ON CONFLICT DO UPDATE for atomic upsert (insert or update if exists)
                 insert_sql = text("""
+                    WITH ledger AS (
+                        INSERT INTO aux.credit_transactions (user_id, kind, amount)
+                        VALUES (:user_id, 'grant', CAST(:amount AS INTEGER))
+                    )
                     INSERT INTO aux.user_credits (user_id, credits)
                     VALUES (:user_id, :amount)
                     ON CONFLICT (user_id)
@@ -63,52 +144,257 @@ class UserCreditRepository:
                 )
                 await session.commit()
                 logger.info(f"Added {amount} credits for user: {user_id}")
+                CREDIT_OPERATIONS.labels(operation="add", result="ok").inc()
+                CREDITS_AMOUNT.labels(operation="add").inc(amount)
 
             except SQLAlchemyError as e:
                 await session.rollback()
+                CREDIT_OPERATIONS.labels(operation="add", result="error").inc()
                 logger.error(f"SQLAlchemy error adding credits for {user_id}: {e}", exc_info=True)
             except Exception as e:
                 await session.rollback()
+                CREDIT_OPERATIONS.labels(operation="add", result="error").inc()
                 logger.error(f"Unexpected error adding credits for {user_id}: {e}", exc_info=True)
  
-    async def deduct_credit(self, user_id: str) -> bool:  
+    @timed_async("db.credits")
+    async def deduct_credit(self, user_id: str, amount: int = 1) -> bool:  
         await self._ensure_table_exists()
 
         async with AsyncSessionLocal() as session:
             try: 
                 update_sql = text("""
-                    UPDATE aux.user_credits
-                    SET credits = credits - 1
-                    WHERE user_id = :user_id AND credits > 0;
+                    WITH debit AS (
+                        UPDATE aux.user_credits
+                        SET credits = credits - CAST(:amount AS INTEGER)
+                        WHERE user_id = :user_id AND credits >= CAST(:amount AS INTEGER)
+                        RETURNING user_id
+                    ),
+                    ledger AS (
+                        INSERT INTO aux.credit_transactions (user_id, kind, amount)
+                        SELECT user_id, 'consume', CAST(:amount AS INTEGER) FROM debit
+                    )
+                    SELECT user_id FROM debit;
                 """)
 
                 result = await session.execute(
                     update_sql,
                     {
                         "user_id": user_id,
+                        "amount": amount,
                     },
                 )
 
                 # Check if any row was updated
-                if result.rowcount == 1:
+                if result.fetchone() is not None:
                     await session.commit()
-                    logger.info(f"Deducted 1 credit for user: {user_id}")
+                    logger.info(f"Deducted {amount} credit(s) for user: {user_id}")
+                    CREDIT_OPERATIONS.labels(operation="deduct", result="ok").inc()
+                    CREDITS_AMOUNT.labels(operation="deduct").inc(amount)
                     return True
                 else:
                     # No row updated means user_id wasn't found or credits were 0
                     await session.rollback() # No change occurred, but rollback is harmless
                     logger.warning(f"Failed to deduct credit for user {user_id}: user not found or insufficient credits.")
+                    CREDIT_OPERATIONS.labels(operation="deduct", result="insufficient").inc()
                     return False
 
             except SQLAlchemyError as e:
                 await session.rollback()
+                CREDIT_OPERATIONS.labels(operation="deduct", result="error").inc()
                 logger.error(f"SQLAlchemy error deducting credit for {user_id}: {e}", exc_info=True)
                 return False
             except Exception as e:
                 await session.rollback()
+                CREDIT_OPERATIONS.labels(operation="deduct", result="error").inc()
                 logger.error(f"Unexpected error deducting credit for {user_id}: {e}", exc_info=True)
                 return False
                 
+    @timed_async("db.credits")
+    async def reserve(self, user_id: str, amount: int, ttl_seconds: int) -> Optional[str]:
+        """
+        Retém `amount` créditos antes da chamada ao LLM: desconta o saldo e cria a reserva
+        num único comando, de modo que requisições simultâneas do mesmo usuário nunca gastam
+        mais do que o saldo. Retorna o id da reserva, ou None se o saldo não for suficiente;
+        erros do banco são propagados (não significam falta de créditos).
+        """
+        await self._ensure_table_exists()
+
+        async with AsyncSessionLocal() as session:
+            try:
+                result = await session.execute(
+                    text("""
+                        WITH debit AS (
+                            UPDATE aux.user_credits
+                            SET credits = credits - CAST(:amount AS INTEGER)
+                            WHERE user_id = :user_id AND credits >= CAST(:amount AS INTEGER)
+                            RETURNING user_id
+                        ),
+                        reservation AS (
+                            INSERT INTO aux.credit_reservations (user_id, amount, expires_at)
+                            SELECT user_id, CAST(:amount AS INTEGER), now() + make_interval(secs => CAST(:ttl_seconds AS INTEGER))
+                            FROM debit
+                            RETURNING id, user_id, amount
+                        ),
+                        ledger AS (
+                            INSERT INTO aux.credit_transactions (user_id, kind, amount, reservation_id)
+                            SELECT user_id, 'reserve', amount, id FROM reservation
+                        )
+                        SELECT id FROM reservation;
+                    """),
+                    {"user_id": user_id, "amount": amount, "ttl_seconds": ttl_seconds},
+                )
+                row = result.fetchone()
+                await session.commit()
+            except SQLAlchemyError as e:
+                await session.rollback()
+                CREDIT_OPERATIONS.labels(operation="reserve", result="error").inc()
+                logger.error(f"SQLAlchemy error reserving credits for {user_id}: {e}", exc_info=True)
+                raise
+
+        if row is None:
+            CREDIT_OPERATIONS.labels(operation="reserve", result="insufficient").inc()
+            return None
+        CREDIT_OPERATIONS.labels(operation="reserve", result="ok").inc()
+        CREDITS_AMOUNT.labels(operation="reserve").inc(amount)
+        return str(row[0])
+
+    @timed_async("db.credits")
+    async def settle(self, used: Dict[str, int], request_ids: Dict[str, str] = None) -> None:
+        """
+        Encerra reservas ({id da reserva: créditos usados}) num único comando: apaga a
+        reserva, lança consume/refund no livro-razão (com o request_id de aux.llm_log, quando
+        houver) e devolve ao saldo o que não foi usado. Idempotente (uma reserva já encerrada
+        é ignorada), então pode ser repetido após falhas; erros de banco são propagados.
+        """
+        request_ids = request_ids or {}
+        if not used:
+            return
+
+        await self._ensure_table_exists()
+
+        async with AsyncSessionLocal() as session:
+            try:
+                result = await session.execute(
+                    text("""
+                        WITH settled AS (
+                            DELETE FROM aux.credit_reservations AS r
+                            USING unnest(CAST(:ids AS UUID[]), CAST(:used AS INTEGER[]), CAST(:request_ids AS UUID[])) AS s(id, used, request_id)
+                            WHERE r.id = s.id
+                            RETURNING r.id, r.user_id, s.request_id, LEAST(s.used, r.amount) AS used, r.amount - LEAST(s.used, r.amount) AS refund
+                        ),
+                        ledger AS (
+                            INSERT INTO aux.credit_transactions (user_id, kind, amount, reservation_id, request_id)
+                            SELECT user_id, 'consume', used, id, request_id FROM settled WHERE used > 0
+                            UNION ALL
+                            SELECT user_id, 'refund', refund, id, request_id FROM settled WHERE refund > 0
+                        ),
+                        refunds AS (
+                            SELECT user_id, SUM(refund) AS refund FROM settled GROUP BY user_id
+                        )
+                        UPDATE aux.user_credits AS u
+                        SET credits = u.credits + refunds.refund
+                        FROM refunds
+                        WHERE u.user_id = refunds.user_id AND refunds.refund > 0
+                        RETURNING refunds.refund;
+                    """),
+                    {"ids": list(used), "used": list(used.values()), "request_ids": [request_ids.get(reservation) for reservation in used]},
+                )
+                refunded = sum(row.refund for row in result.fetchall())
+                await session.commit()
+            except SQLAlchemyError:
+                await session.rollback()
+                CREDIT_OPERATIONS.labels(operation="settle", result="error").inc(len(used))
+                raise
+
+        CREDIT_OPERATIONS.labels(operation="settle", result="ok").inc(len(used))
+        CREDITS_AMOUNT.labels(operation="refund").inc(refunded)
+
+    @timed_async("db.credits")
+    async def reap_expired_reservations(self) -> int:
+        """
+        Devolve ao saldo as reservas vencidas (processo que morreu no meio da requisição ou
+        confirmação perdida). Retorna quantos créditos foram devolvidos.
+        """
+        await self._ensure_table_exists()
+
+        async with AsyncSessionLocal() as session:
+            try:
+                result = await session.execute(text("""
+                    WITH expired AS (
+                        DELETE FROM aux.credit_reservations
+                        WHERE expires_at < now()
+                        RETURNING id, user_id, amount
+                    ),
+                    ledger AS (
+                        INSERT INTO aux.credit_transactions (user_id, kind, amount, reservation_id)
+                        SELECT user_id, 'refund', amount, id FROM expired
+                    ),
+                    refunds AS (
+                        SELECT user_id, SUM(amount) AS amount FROM expired GROUP BY user_id
+                    )
+                    UPDATE aux.user_credits AS u
+                    SET credits = u.credits + refunds.amount
+                    FROM refunds
+                    WHERE u.user_id = refunds.user_id
+                    RETURNING refunds.amount;
+                """))
+                refunded = sum(row.amount for row in result.fetchall())
+                await session.commit()
+            except SQLAlchemyError as e:
+                await session.rollback()
+                logger.error(f"SQLAlchemy error reaping credit reservations: {e}", exc_info=True)
+                return 0
+
+        if refunded:
+            logger.warning(f"{refunded} crédito(s) de reservas vencidas devolvidos.")
+            CREDITS_AMOUNT.labels(operation="reap").inc(refunded)
+        return refunded
+
+    async def reconcile_balances(self, fix: bool = True) -> List[Dict[str, Any]]:
+        """
+        Recalcula em lote o saldo de todos os usuários a partir do livro-razão e devolve as
+        divergências ({user_id, credits, ledger_balance}); com fix=True corrige o saldo
+        materializado. A tabela de saldos fica bloqueada para escrita durante o comando, para
+        que nenhuma movimentação aconteça entre a soma do livro-razão e a correção.
+        """
+        await self._ensure_table_exists()
+
+        async with AsyncSessionLocal() as session:
+            try:
+                await session.execute(text("LOCK TABLE aux.user_credits IN EXCLUSIVE MODE;"))
+                ledger_sql = f"""
+                    WITH ledger AS (
+                        SELECT user_id, SUM({BALANCE_DELTA_SQL}) AS balance
+                        FROM aux.credit_transactions
+                        GROUP BY user_id
+                    )
+                """
+                if fix:
+                    result = await session.execute(text(ledger_sql + """
+                        UPDATE aux.user_credits AS u
+                        SET credits = ledger.balance
+                        FROM ledger, aux.user_credits AS old
+                        WHERE u.user_id = ledger.user_id AND old.user_id = u.user_id AND u.credits <> ledger.balance
+                        RETURNING u.user_id, old.credits, ledger.balance AS ledger_balance;
+                    """))
+                else:
+                    result = await session.execute(text(ledger_sql + """
+                        SELECT u.user_id, u.credits, ledger.balance AS ledger_balance
+                        FROM aux.user_credits AS u JOIN ledger ON ledger.user_id = u.user_id
+                        WHERE u.credits <> ledger.balance;
+                    """))
+                drift = [dict(row._mapping) for row in result.fetchall()]
+                await session.commit()
+            except SQLAlchemyError as e:
+                await session.rollback()
+                logger.error(f"SQLAlchemy error reconciling credit balances: {e}", exc_info=True)
+                raise
+
+        for row in drift:
+            logger.warning(f"Saldo divergente de {row['user_id']}: {row['credits']} materializado, {row['ledger_balance']} no livro-razão" + (" (corrigido)" if fix else ""))
+        return drift
+
+    @timed_async("db.credits")
     async def get_credits(self, user_id: str) -> int:
         """Gets the current credit balance for a user."""
         # Ensure the table exists before interacting
@@ -148,6 +434,7 @@ class UserCreditRepository:
                 logger.error(f"Unexpected error retrieving credits for {user_id}: {e}", exc_info=True)
                 return 0 # Return 0 or raise
 
+    @timed_async("db.credits")
     async def has_credits(self, user_id: str) -> bool:
         """
         Checks if a user has at least one credit.
@@ -4,7 +4,8 @@ import logging
 from dotenv import load_dotenv
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy import text
+from sqlalchemy import event, text
+from utils.metrics import DB_POOL_CONNECTIONS
 
 load_dotenv()
 
@@ -21,6 +22,16 @@ engine = create_async_engine(
     pool_recycle=1800,
 )
 
+def _publish_pool_state(*_) -> None:
+    """Atualiza as métricas do pool a cada checkout/checkin/conexão (sem custo no scrape)"""
+    pool = engine.sync_engine.pool
+    DB_POOL_CONNECTIONS.labels(state="checked_out").set(pool.checkedout())
+    DB_POOL_CONNECTIONS.labels(state="idle").set(pool.checkedin())
+    DB_POOL_CONNECTIONS.labels(state="overflow").set(max(0, pool.overflow()))
+
+for _pool_event in ("connect", "checkout", "checkin", "close"):
+    event.listen(engine.sync_engine.pool, _pool_event, _publish_pool_state)
+
 AsyncSessionLocal = sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
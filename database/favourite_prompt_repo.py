@@ -5,10 +5,12 @@ from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 from database.db_config import AsyncSessionLocal # Assuming this is correctly configured
 from typing import List, Dict, Any
+from utils.timing import timed_async
 
 logger = logging.getLogger(__name__)
 
 class FavoritePromptRepository:
+    @timed_async("db.favourites")
     async def add_favourite_prompt(self, user_id: str, prompt_id: int) -> str:
         """
         Adds a prompt to a user's favourites.
@@ -75,6 +77,7 @@ class FavoritePromptRepository:
                 logger.error(f"Unexpected error adding favourite prompt: {e}", exc_info=True)
                 raise
 
+    @timed_async("db.favourites")
     async def get_favourite_prompts_by_user_id(self, user_id: str) -> List[Dict[str, Any]]:
         """
         Retrieves all favourite prompts for a given user.
@@ -114,6 +117,7 @@ class FavoritePromptRepository:
                 logger.error(f"Unexpected error retrieving favourite prompts for user {user_id}: {e}", exc_info=True)
                 raise
 
+    @timed_async("db.favourites")
     async def remove_favourite_prompt(self, user_id: str, prompt_id: int) -> bool:
         """
         Removes a prompt from a user's favourites.
@@ -0,0 +1,302 @@
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from database.db_config import AsyncSessionLocal
+from models.enums import StatusJob
+from utils.timing import timed_async
+
+logger = logging.getLogger(__name__)
+
+
+def _load_json(value: Any) -> Any:
+    # asyncpg devolve colunas JSONB como texto quando não há codec registrado
+    return json.loads(value) if isinstance(value, str) else value
+
+
+class JobRepository:
+    """
+    Fila de jobs de LLM em Postgres (aux.llm_jobs).
+
+    Workers reservam jobs com SELECT ... FOR UPDATE SKIP LOCKED, então vários processos
+    podem consumir a mesma fila sem se bloquearem. Um job reservado fica invisível até
+    `locked_until`; se o worker morrer, ele volta a ser elegível depois desse prazo.
+
+    Arquivos dos jobs ficam fora da linha, em aux.llm_job_files (bytes, chaveados pelo sha256):
+    a requisição guarda só a referência e a coluna `files` lista os hashes usados pelo job.
+    """
+
+    _table_ready = False
+
+    async def _ensure_table_exists(self):
+        if JobRepository._table_ready:
+            return
+        async with AsyncSessionLocal() as session:
+            try:
+                await session.execute(text("""
+                    CREATE TABLE IF NOT EXISTS aux.llm_jobs (
+                        id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+                        user_id TEXT NOT NULL,
+                        request JSONB NOT NULL,
+                        status SMALLINT NOT NULL,
+                        attempts INTEGER NOT NULL DEFAULT 0,
+                        max_attempts INTEGER NOT NULL,
+                        run_after TIMESTAMP WITH TIME ZONE NOT NULL,
+                        locked_until TIMESTAMP WITH TIME ZONE,
+                        locked_by TEXT,
+                        result JSONB,
+                        error TEXT,
+                        created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+                        updated_at TIMESTAMP WITH TIME ZONE NOT NULL
+                    );
+                """))
+                await session.execute(text("ALTER TABLE aux.llm_jobs ADD COLUMN IF NOT EXISTS files TEXT[] NOT NULL DEFAULT '{}';"))
+                await session.execute(text("""
+                    CREATE TABLE IF NOT EXISTS aux.llm_job_files (
+                        sha256 TEXT PRIMARY KEY,
+                        content BYTEA NOT NULL,
+                        last_used_at TIMESTAMP WITH TIME ZONE NOT NULL
+                    );
+                """))
+                await session.execute(text("""
+                    CREATE INDEX IF NOT EXISTS idx_llm_jobs_claim
+                    ON aux.llm_jobs (status, run_after)
+                    WHERE status IN (1, 2);
+                """))
+                await session.commit()
+                JobRepository._table_ready = True
+            except SQLAlchemyError as e:
+                await session.rollback()
+                logger.error(f"SQLAlchemy error during llm_jobs table creation: {e}", exc_info=True)
+                raise
+
+    @timed_async("db.jobs")
+    async def enqueue(self, user_id: str, request: Dict[str, Any], max_attempts: int, files: Dict[str, bytes] = None) -> str:
+        """Grava o job e, na mesma transação, os arquivos (sha256 -> bytes) que a requisição referencia"""
+        await self._ensure_table_exists()
+        files = files or {}
+        async with AsyncSessionLocal() as session:
+            try:
+                now = datetime.now(timezone.utc)
+                if files:
+                    # Atualizar last_used_at trava a linha: a limpeza não apaga um arquivo reaproveitado agora
+                    await session.execute(
+                        text("""
+                            INSERT INTO aux.llm_job_files (sha256, content, last_used_at)
+                            VALUES (:sha256, :content, :now)
+                            ON CONFLICT (sha256) DO UPDATE SET last_used_at = EXCLUDED.last_used_at;
+                        """),
+                        [{"sha256": sha256, "content": content, "now": now} for sha256, content in files.items()],
+                    )
+                result = await session.execute(
+                    text("""
+                        INSERT INTO aux.llm_jobs (user_id, request, files, status, max_attempts, run_after, created_at, updated_at)
+                        VALUES (:user_id, CAST(:request AS JSONB), :files, :status, :max_attempts, :now, :now, :now)
+                        RETURNING id;
+                    """),
+                    {
+                        "user_id": user_id,
+                        "request": json.dumps(request),
+                        "files": list(files),
+                        "status": int(StatusJob.PENDENTE),
+                        "max_attempts": max_attempts,
+                        "now": now,
+                    },
+                )
+                job_id = result.fetchone()[0]
+                await session.commit()
+                return str(job_id)
+            except SQLAlchemyError as e:
+                await session.rollback()
+                logger.error(f"SQLAlchemy error enqueuing llm job for {user_id}: {e}", exc_info=True)
+                raise
+
+    @timed_async("db.jobs")
+    async def get(self, job_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        """Retorna o job do usuário (sem o payload da requisição), ou None"""
+        await self._ensure_table_exists()
+        async with AsyncSessionLocal() as session:
+            try:
+                result = await session.execute(
+                    text("""
+                        SELECT id, status, attempts, result, error, created_at, updated_at
+                        FROM aux.llm_jobs
+                        WHERE id = CAST(:job_id AS UUID) AND user_id = :user_id;
+                    """),
+                    {"job_id": job_id, "user_id": user_id},
+                )
+                row = result.fetchone()
+                if not row:
+                    return None
+                job = dict(row._mapping)
+                job["id"] = str(job["id"])
+                job["result"] = _load_json(job["result"])
+                return job
+            except SQLAlchemyError as e:
+                logger.error(f"SQLAlchemy error reading llm job {job_id}: {e}", exc_info=True)
+                return None
+
+    @timed_async("db.jobs")
+    async def claim(self, worker_id: str, visibility_seconds: float) -> Optional[Dict[str, Any]]:
+        """
+        Reserva o próximo job pendente (ou cuja reserva expirou) para o worker e
+        incrementa suas tentativas. Retorna None se a fila estiver vazia.
+        """
+        await self._ensure_table_exists()
+        async with AsyncSessionLocal() as session:
+            try:
+                now = datetime.now(timezone.utc)
+                result = await session.execute(
+                    text("""
+                        UPDATE aux.llm_jobs
+                        SET status = :running,
+                            attempts = attempts + 1,
+                            locked_until = :locked_until,
+                            locked_by = :worker_id,
+                            updated_at = :now
+                        WHERE id = (
+                            SELECT id FROM aux.llm_jobs
+                            WHERE attempts < max_attempts
+                              AND ((status = :pending AND run_after <= :now)
+                                OR (status = :running AND locked_until < :now))
+                            ORDER BY run_after
+                            FOR UPDATE SKIP LOCKED
+                            LIMIT 1
+                        )
+                        RETURNING id, user_id, request, attempts, max_attempts;
+                    """),
+                    {
+                        "pending": int(StatusJob.PENDENTE),
+                        "running": int(StatusJob.PROCESSANDO),
+                        "worker_id": worker_id,
+                        "locked_until": now + timedelta(seconds=visibility_seconds),
+                        "now": now,
+                    },
+                )
+                row = result.fetchone()
+                await session.commit()
+                if not row:
+                    return None
+                job = dict(row._mapping)
+                job["id"] = str(job["id"])
+                job["request"] = _load_json(job["request"])
+                return job
+            except SQLAlchemyError as e:
+                await session.rollback()
+                logger.error(f"SQLAlchemy error claiming llm job: {e}", exc_info=True)
+                return None
+
+    @timed_async("db.jobs")
+    async def get_files(self, hashes: List[str]) -> Dict[str, bytes]:
+        """Conteúdo dos arquivos de um job (sha256 -> bytes); hashes ausentes ficam de fora"""
+        if not hashes:
+            return {}
+        await self._ensure_table_exists()
+        async with AsyncSessionLocal() as session:
+            try:
+                result = await session.execute(
+                    text("SELECT sha256, content FROM aux.llm_job_files WHERE sha256 = ANY(:hashes);"),
+                    {"hashes": list(hashes)},
+                )
+                return {row.sha256: bytes(row.content) for row in result.fetchall()}
+            except SQLAlchemyError as e:
+                logger.error(f"SQLAlchemy error reading llm job files: {e}", exc_info=True)
+                raise
+
+    async def _finish(self, job_id: str, attempts: int, values: Dict[str, Any]) -> bool:
+        """
+        Atualiza um job reservado. A condição em `attempts` garante que um worker cuja
+        reserva expirou (e o job foi pego por outro) não sobrescreva o resultado.
+        """
+        async with AsyncSessionLocal() as session:
+            try:
+                result = await session.execute(
+                    text("""
+                        UPDATE aux.llm_jobs
+                        SET status = :status,
+                            result = CAST(:result AS JSONB),
+                            error = :error,
+                            run_after = COALESCE(:run_after, run_after),
+                            locked_until = NULL,
+                            locked_by = NULL,
+                            updated_at = :now
+                        WHERE id = CAST(:job_id AS UUID) AND attempts = :attempts;
+                    """),
+                    {
+                        "job_id": job_id,
+                        "attempts": attempts,
+                        "now": datetime.now(timezone.utc),
+                        "result": None,
+                        "error": None,
+                        "run_after": None,
+                        **values,
+                    },
+                )
+                await session.commit()
+                return result.rowcount == 1
+            except SQLAlchemyError as e:
+                await session.rollback()
+                logger.error(f"SQLAlchemy error updating llm job {job_id}: {e}", exc_info=True)
+                return False
+
+    @timed_async("db.jobs")
+    async def complete(self, job_id: str, attempts: int, result: Dict[str, Any]) -> bool:
+        return await self._finish(job_id, attempts, {"status": int(StatusJob.CONCLUIDO), "result": json.dumps(result)})
+
+    @timed_async("db.jobs")
+    async def fail(self, job_id: str, attempts: int, error: str, retry_at: Optional[datetime] = None) -> bool:
+        """Devolve o job à fila para `retry_at`, ou o marca como falho se retry_at for None"""
+        status = StatusJob.PENDENTE if retry_at else StatusJob.FALHOU
+        return await self._finish(job_id, attempts, {"status": int(status), "error": error, "run_after": retry_at})
+
+    @timed_async("db.jobs")
+    async def fail_abandoned(self) -> int:
+        """Marca como falhos os jobs cuja reserva expirou sem tentativas restantes"""
+        await self._ensure_table_exists()
+        async with AsyncSessionLocal() as session:
+            try:
+                now = datetime.now(timezone.utc)
+                result = await session.execute(
+                    text("""
+                        UPDATE aux.llm_jobs
+                        SET status = :failed, error = 'Tempo de processamento esgotado.', locked_until = NULL, locked_by = NULL, updated_at = :now
+                        WHERE status = :running AND locked_until < :now AND attempts >= max_attempts;
+                    """),
+                    {"failed": int(StatusJob.FALHOU), "running": int(StatusJob.PROCESSANDO), "now": now},
+                )
+                await session.commit()
+                return result.rowcount
+            except SQLAlchemyError as e:
+                await session.rollback()
+                logger.error(f"SQLAlchemy error failing abandoned llm jobs: {e}", exc_info=True)
+                return 0
+
+    @timed_async("db.jobs")
+    async def purge_files(self, older_than_seconds: float) -> int:
+        """Apaga arquivos sem job pendente ou em andamento que os use há mais de `older_than_seconds`"""
+        await self._ensure_table_exists()
+        async with AsyncSessionLocal() as session:
+            try:
+                result = await session.execute(
+                    text("""
+                        DELETE FROM aux.llm_job_files f
+                        WHERE f.last_used_at < :cutoff
+                          AND NOT EXISTS (
+                              SELECT 1 FROM aux.llm_jobs j
+                              WHERE j.status IN (:pending, :running) AND f.sha256 = ANY(j.files)
+                          );
+                    """),
+                    {
+                        "cutoff": datetime.now(timezone.utc) - timedelta(seconds=older_than_seconds),
+                        "pending": int(StatusJob.PENDENTE),
+                        "running": int(StatusJob.PROCESSANDO),
+                    },
+                )
+                await session.commit()
+                return result.rowcount
+            except SQLAlchemyError as e:
+                await session.rollback()
+                logger.error(f"SQLAlchemy error purging llm job files: {e}", exc_info=True)
+                return 0
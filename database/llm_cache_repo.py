@@ -0,0 +1,118 @@
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from database.db_config import AsyncSessionLocal
+from utils.timing import timed_async
+
+logger = logging.getLogger(__name__)
+
+
+class LLMCacheRepository:
+    """Camada persistente do cache de respostas de LLM (aux.llm_response_cache)"""
+
+    _table_ready = False
+
+    async def _ensure_table_exists(self):
+        if LLMCacheRepository._table_ready:
+            return
+        async with AsyncSessionLocal() as session:
+            try:
+                await session.execute(text("""
+                    CREATE TABLE IF NOT EXISTS aux.llm_response_cache (
+                        cache_key TEXT PRIMARY KEY,
+                        llm_response TEXT NOT NULL,
+                        model TEXT NOT NULL,
+                        input_tokens INTEGER NOT NULL DEFAULT 0,
+                        output_tokens INTEGER NOT NULL DEFAULT 0,
+                        created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+                        expires_at TIMESTAMP WITH TIME ZONE NOT NULL
+                    );
+                """))
+                await session.execute(text("""
+                    CREATE INDEX IF NOT EXISTS idx_llm_response_cache_expires_at
+                    ON aux.llm_response_cache (expires_at);
+                """))
+                await session.commit()
+                LLMCacheRepository._table_ready = True
+            except SQLAlchemyError as e:
+                await session.rollback()
+                logger.error(f"SQLAlchemy error during llm_response_cache table creation: {e}", exc_info=True)
+                raise
+
+    @timed_async("db.cache")
+    async def get(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """Retorna a entrada não expirada para a chave, ou None"""
+        try:
+            await self._ensure_table_exists()
+            async with AsyncSessionLocal() as session:
+                result = await session.execute(
+                    text("""
+                        SELECT llm_response, model, input_tokens, output_tokens, expires_at
+                        FROM aux.llm_response_cache
+                        WHERE cache_key = :cache_key AND expires_at > :now;
+                    """),
+                    {"cache_key": cache_key, "now": datetime.now(timezone.utc)},
+                )
+                row = result.fetchone()
+                return dict(row._mapping) if row else None
+        except SQLAlchemyError as e:
+            logger.error(f"SQLAlchemy error reading llm cache entry: {e}", exc_info=True)
+            return None
+
+    @timed_async("db.cache")
+    async def set(
+            self,
+            cache_key: str,
+            llm_response: str,
+            model: str,
+            input_tokens: int,
+            output_tokens: int,
+            expires_at: datetime,
+        ) -> None:
+        try:
+            await self._ensure_table_exists()
+            async with AsyncSessionLocal() as session:
+                await session.execute(
+                    text("""
+                        INSERT INTO aux.llm_response_cache
+                            (cache_key, llm_response, model, input_tokens, output_tokens, created_at, expires_at)
+                        VALUES (:cache_key, :llm_response, :model, :input_tokens, :output_tokens, :created_at, :expires_at)
+                        ON CONFLICT (cache_key) DO UPDATE SET
+                            llm_response = EXCLUDED.llm_response,
+                            model = EXCLUDED.model,
+                            input_tokens = EXCLUDED.input_tokens,
+                            output_tokens = EXCLUDED.output_tokens,
+                            created_at = EXCLUDED.created_at,
+                            expires_at = EXCLUDED.expires_at;
+                    """),
+                    {
+                        "cache_key": cache_key,
+                        "llm_response": llm_response,
+                        "model": model,
+                        "input_tokens": input_tokens,
+                        "output_tokens": output_tokens,
+                        "created_at": datetime.now(timezone.utc),
+                        "expires_at": expires_at,
+                    },
+                )
+                await session.commit()
+        except SQLAlchemyError as e:
+            logger.error(f"SQLAlchemy error writing llm cache entry: {e}", exc_info=True)
+
+    @timed_async("db.cache")
+    async def delete_expired(self) -> int:
+        """Remove entradas expiradas; retorna quantas foram apagadas"""
+        try:
+            await self._ensure_table_exists()
+            async with AsyncSessionLocal() as session:
+                result = await session.execute(
+                    text("DELETE FROM aux.llm_response_cache WHERE expires_at <= :now;"),
+                    {"now": datetime.now(timezone.utc)},
+                )
+                await session.commit()
+                return result.rowcount
+        except SQLAlchemyError as e:
+            logger.error(f"SQLAlchemy error purging llm cache: {e}", exc_info=True)
+            return 0
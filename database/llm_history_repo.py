@@ -3,23 +3,35 @@ import logging
 from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 from database.db_config import AsyncSessionLocal
-from typing import List, Any, Dict
+from typing import List, Any, Dict, Optional
 import asyncio 
+import hashlib
+import json
+import uuid
+import zlib
+from utils.timing import timed_async
 
 
 logger = logging.getLogger(__name__)
+
+# Caracteres da resposta mantidos em aux.llm_log para a listagem do histórico
+PREVIEW_CHARS = 150
  
 class LLMHistoryRepository:  
-    async def log_message( 
-            self,
-            user_id: str,
-            user_query: str,
-            gpt_response: str,
-        ) -> str: 
-
+    """
+    Histórico de chamadas ao LLM. aux.llm_log guarda só colunas estreitas (prompt, provedor,
+    impressão digital dos parâmetros, hashes dos arquivos, latência, tokens, status e uma
+    prévia da resposta); a resposta completa fica comprimida em aux.llm_log_response e só é
+    lida no detalhe de um item.
+    """
+    _table_ready = False
+
+    async def _ensure_table_exists(self):
+        if LLMHistoryRepository._table_ready:
+            return
         async with AsyncSessionLocal() as session:
             try:
-                create_table_sql = text("""
+                await session.execute(text("""
                     CREATE TABLE IF NOT EXISTS aux.llm_log (
                         id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
                         user_id TEXT NOT NULL,
@@ -27,58 +39,109 @@ class LLMHistoryRepository:
                         gpt_response TEXT,
                         timestamp TIMESTAMP WITH TIME ZONE NOT NULL
                     );
-                """)
-
-                logger.debug("Executando CREATE TABLE IF NOT EXISTS...") # Use debug, info pode poluir o log
-                await session.execute(create_table_sql)
-               
+                """))
+                # Provedor/modelo que de fato respondeu (em failover pode diferir do pedido)
+                await session.execute(text("ALTER TABLE aux.llm_log ADD COLUMN IF NOT EXISTS llm_id INTEGER;"))
+                await session.execute(text("ALTER TABLE aux.llm_log ADD COLUMN IF NOT EXISTS model TEXT;"))
+                # Colunas estruturadas; user_query fica só nas linhas antigas
+                await session.execute(text("""
+                    ALTER TABLE aux.llm_log
+                        ADD COLUMN IF NOT EXISTS prompt_id INTEGER,
+                        ADD COLUMN IF NOT EXISTS params_fingerprint TEXT,
+                        ADD COLUMN IF NOT EXISTS files JSONB,
+                        ADD COLUMN IF NOT EXISTS latency_ms INTEGER,
+                        ADD COLUMN IF NOT EXISTS input_tokens INTEGER,
+                        ADD COLUMN IF NOT EXISTS output_tokens INTEGER,
+                        ADD COLUMN IF NOT EXISTS status TEXT;
+                """))
+                await session.execute(text("""
+                    CREATE INDEX IF NOT EXISTS idx_llm_log_user_timestamp
+                    ON aux.llm_log (user_id, timestamp DESC);
+                """))
+                await session.execute(text("""
+                    CREATE TABLE IF NOT EXISTS aux.llm_log_response (
+                        log_id UUID PRIMARY KEY REFERENCES aux.llm_log (id) ON DELETE CASCADE,
+                        response BYTEA NOT NULL
+                    );
+                """))
                 await session.commit()
-                logger.debug("Commit após CREATE TABLE executado.")
- 
-                result = await session.execute(create_table_sql)
-                print("Resultado de criar a tabela llm_log: "+ str(result))
- 
-                insert_sql = text("""
-                    INSERT INTO aux.llm_log (user_id, user_query, gpt_response, timestamp)
-                    VALUES (:user_id, :user_query, :gpt_response, :timestamp)
-                    RETURNING id;
-                """)
+                LLMHistoryRepository._table_ready = True
+            except SQLAlchemyError as e:
+                await session.rollback()
+                logger.error(f"SQLAlchemy error during llm_log table creation: {e}", exc_info=True)
+                raise
+
+    async def log_message(self, entry: Dict[str, Any]) -> str:
+        """Registra uma chamada (mesmo formato de `log_messages`) e devolve o id"""
+        await self.log_messages([entry])
+        return entry["id"]
+
+    @timed_async("db.llm_log")
+    async def log_messages(self, entries: List[Dict[str, Any]]) -> None:
+        """
+        Insere várias chamadas numa única transação: as linhas de aux.llm_log e as respostas
+        completas comprimidas em aux.llm_log_response. Idempotente pelo `id` (UUID gerado
+        pelo chamador), então o lote pode ser regravado após uma falha. Cada entrada traz
+        id, user_id, prompt_id, llm_id, model, params_fingerprint, files, latency_ms,
+        input_tokens, output_tokens, status, llm_response e timestamp (o momento da chamada,
+        não o da gravação em lote; sem ele vale o horário atual).
+        """
+        if not entries:
+            return
+
+        await self._ensure_table_exists()
+
+        now = datetime.now(timezone.utc)
+        log_rows = []
+        response_rows = []
+        for entry in entries:
+            response = entry["llm_response"]
+            log_rows.append({
+                **{key: value for key, value in entry.items() if key != "llm_response"},
+                "files": json.dumps(entry["files"]) if entry.get("files") else None,
+                "gpt_response": response[:PREVIEW_CHARS],
+                "timestamp": entry.get("timestamp") or now,
+            })
+            response_rows.append({"log_id": entry["id"], "response": zlib.compress(response.encode("utf-8"))})
 
-                result = await session.execute(
-                    insert_sql,
-                    {
-                        "user_id": user_id,
-                        "user_query": user_query,
-                        "gpt_response": gpt_response,
-                        "timestamp": datetime.now(timezone.utc),  
-                    },
-                )
-                
-                # Obter o ID gerado do RETURNING
-                inserted_id = result.fetchone()[0]
-                
-                # --- Crucial Fix: Commit the INSERT operation ---
+        async with AsyncSessionLocal() as session:
+            try:
+                await session.execute(text("""
+                    INSERT INTO aux.llm_log
+                        (id, user_id, prompt_id, llm_id, model, params_fingerprint, files,
+                         latency_ms, input_tokens, output_tokens, status, gpt_response, timestamp)
+                    VALUES
+                        (:id, :user_id, :prompt_id, :llm_id, :model, :params_fingerprint, CAST(:files AS JSONB),
+                         :latency_ms, :input_tokens, :output_tokens, :status, :gpt_response, :timestamp)
+                    ON CONFLICT (id) DO NOTHING;
+                """), log_rows)
+                await session.execute(text("""
+                    INSERT INTO aux.llm_log_response (log_id, response)
+                    VALUES (:log_id, :response)
+                    ON CONFLICT (log_id) DO NOTHING;
+                """), response_rows)
                 await session.commit()
-                logger.debug("Commit após INSERT executado.")
-                
-                return str(inserted_id)
-    
-            except SQLAlchemyError as e: 
+            except SQLAlchemyError as e:
+                await session.rollback()
                 logger.error(f"SQLAlchemy error during message logging: {e}", exc_info=True)
-                raise  # Re-raise para que o chamador saiba que houve erro
-            except Exception as e: 
-                logger.error(f"Unexpected error during message logging: {e}", exc_info=True)
-                raise  # Re-raise para que o chamador saiba que houve erro
+                raise
 
+    @timed_async("db.llm_log")
     async def get_recent_history(
                 self, 
                 user_id: str,
             ) -> List[Dict[str, Any]]: 
         
+            await self._ensure_table_exists()
             async with AsyncSessionLocal() as session:
                 try:   
+                    # Só colunas estreitas: a resposta completa fica para get_history_detail.
+                    # user_id, user_query, gpt_response e timestamp mantêm o formato anterior do
+                    # dashboard (user_query só existe nas linhas antigas; nas novas vem NULL)
                     select_sql = text("""
-                        SELECT user_id, user_query, gpt_response, timestamp
+                        SELECT id, user_id, user_query, gpt_response, timestamp,
+                               prompt_id, llm_id, model, status,
+                               input_tokens, output_tokens, latency_ms
                         FROM aux.llm_log
                         WHERE user_id = :user_id 
                         ORDER BY timestamp DESC
@@ -106,6 +169,39 @@ class LLMHistoryRepository:
                     logger.error(f"Unexpected error during llm log history for user: {user_id}: {e}", exc_info=True)
                     return [] 
 
+    @timed_async("db.llm_log")
+    async def get_history_detail(self, user_id: str, log_id: str) -> Optional[Dict[str, Any]]:
+        """Item do histórico do usuário com a resposta completa, ou None se não existir"""
+        await self._ensure_table_exists()
+        async with AsyncSessionLocal() as session:
+            try:
+                result = await session.execute(
+                    text("""
+                        SELECT l.id, l.prompt_id, l.llm_id, l.model, l.status, l.params_fingerprint, l.files,
+                               l.input_tokens, l.output_tokens, l.latency_ms, l.timestamp,
+                               l.user_query, l.gpt_response, r.response
+                        FROM aux.llm_log l
+                        LEFT JOIN aux.llm_log_response r ON r.log_id = l.id
+                        WHERE l.id = :log_id AND l.user_id = :user_id;
+                    """),
+                    {"log_id": log_id, "user_id": user_id},
+                )
+                row = result.fetchone()
+            except SQLAlchemyError as e:
+                logger.error(f"SQLAlchemy error reading llm log {log_id}: {e}", exc_info=True)
+                raise
+
+        if not row:
+            return None
+        detail = dict(row._mapping)
+        compressed = detail.pop("response")
+        preview = detail.pop("gpt_response")
+        # Linhas anteriores à tabela de respostas só têm a prévia
+        detail["llm_response"] = zlib.decompress(compressed).decode("utf-8") if compressed is not None else preview
+        if detail["user_query"] is None:
+            detail.pop("user_query")
+        return detail
+
 async def test_log_message_and_retrieve():
 
     repository = LLMHistoryRepository()
@@ -120,12 +216,25 @@ async def test_log_message_and_retrieve():
     # --- Testando log_message ---
     print(f"Testando log_message para user_id: {test_user_id}")
     try:
-        await repository.log_message(test_user_id, test_query_1, test_response_1)
-        print("Primeira mensagem logada com sucesso.")
-        await repository.log_message(test_user_id, test_query_2, test_response_2)
-        print("Segunda mensagem logada com sucesso.")
+        for query, response in ((test_query_1, test_response_1), (test_query_2, test_response_2)):
+            await repository.log_message({
+                "id": str(uuid.uuid4()),
+                "user_id": test_user_id,
+                "prompt_id": None,
+                "llm_id": None,
+                "model": None,
+                "params_fingerprint": hashlib.sha256(query.encode("utf-8")).hexdigest(),
+                "files": [],
+                "latency_ms": 0,
+                "input_tokens": 0,
+                "output_tokens": 0,
+                "status": "ok",
+                "llm_response": response,
+            })
+            print("Mensagem logada com sucesso.")
         result = await repository.get_recent_history(test_user_id)
         print(str(result))
+        print(str(await repository.get_history_detail(test_user_id, result[0]["id"])))
     except Exception as e:
         logger.error(f"Erro durante o teste de log_message: {e}", exc_info=True)
         # Podemos sair ou continuar dependendo da severidade
@@ -10,11 +10,13 @@ from dotenv import load_dotenv
 from models.enums import TipoParametro, TipoPrompt, LLM 
 from models.menu_models import MenuParameter, MenuPromptWithParams
 from database.db_config import AsyncSessionLocal
+from utils.timing import timed_async
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
 class MenuRepository:
+    @timed_async("db.menu")
     async def get_prompts_with_parameters(self) -> List[MenuPromptWithParams]:
         async with AsyncSessionLocal() as session:
             try:
@@ -67,6 +69,7 @@ class MenuRepository:
                 logger.error(f"Erro inesperado ao buscar prompts para menu: {str(e)}")
                 return []
 
+    @timed_async("db.menu")
     async def get_prompt_with_parameters(self, prompt_id: int) -> Optional[MenuPromptWithParams]:
         async with AsyncSessionLocal() as session:
             try:
@@ -10,10 +10,12 @@ from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 import os
 from dotenv import load_dotenv
 from database.db_config import AsyncSessionLocal
+from utils.timing import timed_async
 load_dotenv()
  
 logger = logging.getLogger(__name__)
 class ParameterRepository:
+    @timed_async("db.parameters")
     async def create_parameter(self, parameter_data: ParameterCreate) -> Optional[ParameterResponse]:
         async with AsyncSessionLocal() as session:
             try:
@@ -50,6 +52,7 @@ class ParameterRepository:
                 await session.rollback()
                 logger.error(f"Erro inesperado ao criar parâmetro: {e}")
                 return None
+    @timed_async("db.parameters")
     async def get_parameter(self, parameter_id: int) -> Optional[ParameterResponse]:
         async with AsyncSessionLocal() as session:
             try:
@@ -74,6 +77,7 @@ class ParameterRepository:
             except Exception as e:
                 logger.error(f"Erro inesperado ao buscar parâmetro por ID: {e}")
                 return None
+    @timed_async("db.parameters")
     async def get_parameters_for_prompt(self, prompt_id: int) -> List[ParameterResponse]:
         async with AsyncSessionLocal() as session:
             try:
@@ -98,6 +102,7 @@ class ParameterRepository:
             except Exception as e:
                 logger.error(f"Erro inesperado ao buscar parâmetros para o prompt {prompt_id}: {e}")
                 return []
+    @timed_async("db.parameters")
     async def update_parameter(self, parameter_id: int, parameter_data: ParameterUpdate) -> Optional[ParameterResponse]:
         async with AsyncSessionLocal() as session:
             try:
@@ -175,6 +180,7 @@ class ParameterRepository:
                 await session.rollback()
                 logger.error(f"Erro inesperado ao atualizar parâmetro {parameter_id}: {str(e)}")
                 return None
+    @timed_async("db.parameters")
     async def delete_parameter(self, parameter_id: int) -> bool:
         async with AsyncSessionLocal() as session:
             try:
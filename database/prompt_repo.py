@@ -10,6 +10,7 @@ from dotenv import load_dotenv
 from models.prompt_models import PromptResponse, PromptCreate, PromptUpdate
 from models.enums import TipoPrompt, LLM, CategoriaPrompt
 from database.db_config import AsyncSessionLocal
+from utils.timing import timed_async
 
 load_dotenv()
  
@@ -17,6 +18,7 @@ logger = logging.getLogger(__name__)
 
 class PromptRepository:
 
+    @timed_async("db.prompts")
     async def create_prompt(self, prompt_data: PromptCreate) -> Optional[PromptResponse]:
         async with AsyncSessionLocal() as session:
             try:
@@ -71,6 +73,7 @@ class PromptRepository:
                 logger.error(f"Erro inesperado ao criar prompt: {e}")
                 return None
 
+    @timed_async("db.prompts")
     async def get_prompt(self, prompt_id: int) -> Optional[PromptResponse]:
         async with AsyncSessionLocal() as session:
             try:
@@ -104,6 +107,7 @@ class PromptRepository:
                 logger.error(f"Erro inesperado ao buscar prompt por ID: {e}")
                 return None
 
+    @timed_async("db.prompts")
     async def get_prompts(self) -> List[PromptResponse]:
         async with AsyncSessionLocal() as session:
             try:
@@ -136,6 +140,7 @@ class PromptRepository:
                 logger.error(f"Erro inesperado ao buscar prompts: {e}")
                 return []
 
+    @timed_async("db.prompts")
     async def update_prompt(self, prompt_id: int, prompt_update_data: PromptUpdate) -> Optional[PromptResponse]:
         async with AsyncSessionLocal() as session:
             try:
@@ -201,6 +206,7 @@ class PromptRepository:
                 logger.error(f"Erro inesperado ao atualizar prompt: {e}")
                 return None
 
+    @timed_async("db.prompts")
     async def delete_prompt(self, prompt_id: int) -> bool: # No changes needed here
         async with AsyncSessionLocal() as session:
             try:
@@ -222,6 +228,7 @@ class PromptRepository:
                 logger.error(f"Erro inesperado ao deletar prompt: {e}")
                 return False
  
+    @timed_async("db.prompts")
     async def get_prompts_with_parameters_dict(self) -> List[Dict[str, Any]]:
         async with AsyncSessionLocal() as session:
             try:
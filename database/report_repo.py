@@ -4,10 +4,12 @@ from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 from database.db_config import AsyncSessionLocal # Assuming this is correctly configured
 from typing import List, Any, Dict
+from utils.timing import timed_async
 
 logger = logging.getLogger(__name__)
 
 class ReportRepository:
+    @timed_async("db.reports")
     async def insert_report(
         self,
         user_id: str,
@@ -60,6 +62,7 @@ class ReportRepository:
                 logger.error(f"Unexpected error inserting report: {e}", exc_info=True)
                 raise
 
+    @timed_async("db.reports")
     async def get_all_reports_by_user_id(self, user_id: str) -> List[Dict[str, Any]]:
         async with AsyncSessionLocal() as session:
             try:
@@ -1,106 +1,157 @@
 import os
 import logging
-from fastapi import HTTPException
-from models.prompt_models import PromptRequest
+from typing import AsyncIterator
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI
 from models.enums import TipoParametro
-from managers.menu_mgr import MenuManager # Assuming this is still needed for text-only part
+from models.llm_models import LLMResult
 from utils.file_util import get_default_filename , get_mime_type
+from utils.file_handle_cache import FileHandleCache
+from utils.file_payload import FilePayload
+from utils.http_util import build_async_http_client, get_http_timeout
 load_dotenv()
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 openai_api_key = os.getenv("OPENAI_API_KEY")
 if not openai_api_key:
     logger.warning("OpenAI API key not found in environment variables")
 
-client = OpenAI(api_key=openai_api_key)
-menu_mgr = MenuManager()  
+client = AsyncOpenAI(
+    api_key=openai_api_key,
+    http_client=build_async_http_client("OPENAI"),
+    timeout=get_http_timeout("OPENAI"),
+    # As novas tentativas ficam a cargo da RetryPolicy do registry (com deadline e jitter)
+    max_retries=0,
+)
+
+
+async def _upload_file(file_bytes: bytes, mime_type: str, filename: str):
+    uploaded = await client.files.create(file=(filename, file_bytes, mime_type), purpose="user_data")
+    return uploaded.id, None
+
+async def _delete_file(file_id: str) -> None:
+    await client.files.delete(file_id)
+
+file_cache = FileHandleCache("OPENAI", _upload_file, _delete_file, default_ttl=24 * 3600)
 
 MULTIMODAL_MODEL = "gpt-4o"  
 TEXT_MODEL = "gpt-4.1"  
+SEARCH_MODEL = "gpt-4.1"
 
 
+def _text_args(prompt_content: str, model: str) -> dict:
+    return dict(
+        model=model,
+        messages=[{"role": "user", "content": prompt_content}],
+        temperature=0.3,
+        max_tokens=2048
+    )
 
-async def process(req: PromptRequest) -> str:
-    try:
-        prompt_content = await menu_mgr.mount(req)  
-        print("####PROMPT CONTENT#######")
-        print(prompt_content)
-        
-        response = client.chat.completions.create(
-            model=TEXT_MODEL,
-            messages=[{"role": "user", "content": prompt_content}],
-            temperature=0.3,
-            max_tokens=2048
-        )
-        
-        result = response.choices[0].message.content.strip()
-        return result
+async def _file_part(file: FilePayload, tipo_arquivo: TipoParametro) -> dict:
+    """
+    Imagens como input_image; demais arquivos como input_file, com file_id reaproveitado do
+    cache para arquivos grandes e base64 inline para os demais.
+    """
+    mime_type = file.mime_type or get_mime_type(tipo_arquivo)
     
-    except Exception as e:
-        logger.error(f"Erro ao processar com ChatGPT (texto): {e}")
-        raise HTTPException(status_code=500, detail=f"Erro na categorização com ChatGPT: {str(e)}")
-
-async def process_file(file_base64: str, prompt_text: str, tipo_arquivo: TipoParametro) -> str:
+    filename = get_default_filename(tipo_arquivo)
     
-    try:
-        mime_type = get_mime_type(tipo_arquivo)
-        
-        filename = get_default_filename(tipo_arquivo)
-        
-        response = client.responses.create(
-            model=MULTIMODAL_MODEL,
-            input=[
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "input_file",
-                            "filename": filename,
-                            "file_data": f"data:{mime_type};base64,{file_base64}",
-                        },
-                        {
-                            "type": "input_text",
-                            "text": prompt_text,
-                        },
-                    ],
-                }
-            ]
-        )
-        
-        result = response.output_text.strip()
-        return result
-        
-    except Exception as e:
-        logger.error(f"Erro ao processar arquivo {tipo_arquivo.name} com ChatGPT: {e}")
-        raise HTTPException(status_code=500, detail=f"Erro no processamento de arquivo {tipo_arquivo.name} com ChatGPT: {str(e)}")
+    if tipo_arquivo == TipoParametro.IMAGEM:
+        return {"type": "input_image", "image_url": f"data:{mime_type};base64,{await file.base64()}"}
     
-async def process_web_search(req: PromptRequest) -> str:
-    try:
-        prompt_content = await menu_mgr.mount(req)
-
-        print("####WEB SEARCH PROMPT#######")
-        print(prompt_content)
-
-        response = client.chat.completions.create(
-           model="gpt-4.1",
-    tools=[{"type": "web_search_preview"}],  messages=[
-                {
-                    "role": "user",
-                    "content": f"""Pesquise na internet informações reais e atualizadas sobre: {prompt_content}
+    if file_cache.applies_to(file.size):
+        file_id = await file_cache.get_or_upload(file, mime_type, filename)
+        return {"type": "input_file", "file_id": file_id}
+    
+    return {
+        "type": "input_file",
+        "filename": filename,
+        "file_data": f"data:{mime_type};base64,{await file.base64()}",
+    }
+
+def _file_args(file_part: dict, prompt_text: str, model: str) -> dict:
+    return dict(
+        model=model,
+        input=[
+            {
+                "role": "user",
+                "content": [
+                    file_part,
+                    {
+                        "type": "input_text",
+                        "text": prompt_text,
+                    },
+                ],
+            }
+        ]
+    )
+
+def _web_search_args(prompt_content: str, model: str) -> dict:
+    return dict(
+       model=model,
+tools=[{"type": "web_search_preview"}],  messages=[
+            {
+                "role": "user",
+                "content": f"""Pesquise na internet informações reais e atualizadas sobre: {prompt_content}
 Forneça links reais, confiáveis e recentes como parte da resposta."""
-                }
-            ],
-            temperature=0.2,
-            max_tokens=4096
-        )
-
-        result = response.choices[0].message.content.strip()
-        return result
-
-    except Exception as e:
-        logger.error(f"Erro ao fazer busca web com ChatGPT: {e}")
-        raise HTTPException(status_code=500, detail=f"Erro no processamento de busca web com ChatGPT: {str(e)}")
+            }
+        ],
+        temperature=0.2,
+        max_tokens=4096
+    )
+
+
+async def process(prompt_content: str, model: str = TEXT_MODEL) -> LLMResult:
+    response = await client.chat.completions.create(**_text_args(prompt_content, model))
+    return _chat_result(response, model)
+
+async def process_file(file: FilePayload, prompt_text: str, tipo_arquivo: TipoParametro, model: str = MULTIMODAL_MODEL) -> LLMResult:
+    response = await client.responses.create(**_file_args(await _file_part(file, tipo_arquivo), prompt_text, model))
+    
+    usage = response.usage
+    return LLMResult(
+        text=response.output_text.strip(),
+        model=model,
+        input_tokens=usage.input_tokens if usage else 0,
+        output_tokens=usage.output_tokens if usage else 0,
+    )
+    
+async def process_web_search(prompt_content: str, model: str = SEARCH_MODEL) -> LLMResult:
+    response = await client.chat.completions.create(**_web_search_args(prompt_content, model))
+    return _chat_result(response, model)
+
+async def stream(prompt_content: str, model: str, result: LLMResult) -> AsyncIterator[str]:
+    async for delta in _stream_chat(_text_args(prompt_content, model), result):
+        yield delta
+
+async def stream_file(file: FilePayload, prompt_text: str, tipo_arquivo: TipoParametro, model: str, result: LLMResult) -> AsyncIterator[str]:
+    events = await client.responses.create(**_file_args(await _file_part(file, tipo_arquivo), prompt_text, model), stream=True)
+    async for event in events:
+        if event.type == "response.output_text.delta":
+            yield event.delta
+        elif event.type == "response.completed" and event.response.usage:
+            result.input_tokens = event.response.usage.input_tokens
+            result.output_tokens = event.response.usage.output_tokens
+
+async def stream_web_search(prompt_content: str, model: str, result: LLMResult) -> AsyncIterator[str]:
+    async for delta in _stream_chat(_web_search_args(prompt_content, model), result):
+        yield delta
+
+async def _stream_chat(args: dict, result: LLMResult) -> AsyncIterator[str]:
+    chunks = await client.chat.completions.create(**args, stream=True, stream_options={"include_usage": True})
+    async for chunk in chunks:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+        if chunk.usage:
+            result.input_tokens = chunk.usage.prompt_tokens
+            result.output_tokens = chunk.usage.completion_tokens
+
+def _chat_result(response, model: str) -> LLMResult:
+    usage = response.usage
+    return LLMResult(
+        text=response.choices[0].message.content.strip(),
+        model=model,
+        input_tokens=usage.prompt_tokens if usage else 0,
+        output_tokens=usage.completion_tokens if usage else 0,
+    )
@@ -1,97 +1,167 @@
 import anthropic
-from fastapi import HTTPException
 import logging
 import os
-from managers.menu_mgr import MenuManager 
+from typing import AsyncIterator
 from dotenv import load_dotenv
+from fastapi import HTTPException
 from models.enums import TipoParametro
-from models.prompt_models import PromptRequest
+from models.llm_models import LLMResult
 from utils.file_util import get_default_filename, get_mime_type
+from utils.file_handle_cache import FileHandleCache
+from utils.file_payload import FilePayload
+from utils.http_util import build_async_http_client, get_http_timeout
 
 load_dotenv()
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 anthropic_api_key = os.getenv("ANTHROPIC_API_KEY")
 if not anthropic_api_key:
     logger.warning("Anthropic API key not found in environment variables")
 
-client = anthropic.Anthropic(api_key=anthropic_api_key)
-menu_mgr = MenuManager() 
+client = anthropic.AsyncAnthropic(
+    api_key=anthropic_api_key,
+    http_client=build_async_http_client("ANTHROPIC"),
+    timeout=get_http_timeout("ANTHROPIC"),
+    # As novas tentativas ficam a cargo da RetryPolicy do registry (com deadline e jitter)
+    max_retries=0,
+)
+
+# Referenciar arquivos enviados pela Files API ainda exige o cabeçalho beta
+FILES_BETA = "files-api-2025-04-14"
+
+async def _upload_file(file_bytes: bytes, mime_type: str, filename: str):
+    uploaded = await client.beta.files.upload(file=(filename, file_bytes, mime_type), betas=[FILES_BETA])
+    return uploaded.id, None
+
+async def _delete_file(file_id: str) -> None:
+    await client.beta.files.delete(file_id, betas=[FILES_BETA])
+
+file_cache = FileHandleCache("ANTHROPIC", _upload_file, _delete_file, default_ttl=24 * 3600)
 
 #MODEL_NAME = "claude-3-sonnet-20240229" 
 CLAUDE4='claude-sonnet-4-20250514'
 
-async def process(req: PromptRequest) -> str:
-    try:
-        prompt_content = await menu_mgr.mount(req) # For text-based prompts
-        
-        response = client.messages.create(
-            model=CLAUDE4,
-            messages=[{"role": "user", "content": prompt_content}],
-            temperature=0.3,
-            max_tokens=2048
-        )
-
-        result = response.content[0].text.strip()
-        logger.info("Resposta do Claude (texto) recebida com sucesso.")
-        return result
-
-    except Exception as e:
-        logger.error(f"Erro ao processar prompt com Claude (texto): {e}")
-        raise HTTPException(status_code=500, detail=f"Erro no processamento com Claude (texto): {str(e)}")
- 
-async def process_file(file_base64: str, prompt_text: str, tipo_arquivo: TipoParametro) -> str:
-    try:
-        mime_type = get_mime_type(tipo_arquivo)
-          
-        response = client.messages.create(
-            model=CLAUDE4,
-            max_tokens=204,
-            messages=[
-              {
-                "role":"user",
-                "content":[
-                    {
-                        "type": "image",
-                        "source": { 
-                            "type": "base64",
-                            "media_type": mime_type,
-                            "data": file_base64
-                                }                       
-                    },
-                    {"type": "text", "text": prompt_text},
-                ],
-              }
-            ],
-        )
-        result = response.content[0].text.strip()
-        return result
-    except Exception as e:
-        print(e)
-        
-async def process_web_search(req: PromptRequest):
-    try:
-        prompt_content = await menu_mgr.mount(req)
-        
-        response = client.messages.create(
-            model=CLAUDE4,
-            max_tokens=2048,
-            messages=[
+
+def _text_args(prompt_content: str, model: str) -> dict:
+    return dict(
+        model=model,
+        messages=[{"role": "user", "content": prompt_content}],
+        temperature=0.3,
+        max_tokens=2048
+    )
+
+async def _file_args(file: FilePayload, prompt_text: str, tipo_arquivo: TipoParametro, model: str) -> dict:
+    """
+    Imagens vão em bloco `image`, PDF e texto em bloco `document`. Arquivos grandes são
+    referenciados pelo file_id do cache (Files API); os demais vão no corpo da requisição.
+    Planilhas e DOCX só chegam aqui sem extração local de texto e o Claude não os aceita.
+    """
+    mime_type = file.mime_type or get_mime_type(tipo_arquivo)
+
+    if tipo_arquivo in (TipoParametro.ARQUIVO_XLSX, TipoParametro.ARQUIVO_XLS, TipoParametro.ARQUIVO_DOCX):
+        raise HTTPException(status_code=415, detail=f"O Claude não aceita arquivos {tipo_arquivo.name} sem extração de texto.")
+
+    args = {}
+    if file_cache.applies_to(file.size):
+        file_id = await file_cache.get_or_upload(file, mime_type, get_default_filename(tipo_arquivo))
+        source = {"type": "file", "file_id": file_id}
+        args["betas"] = [FILES_BETA]
+    elif tipo_arquivo in (TipoParametro.ARQUIVO_TXT, TipoParametro.ARQUIVO_CSV):
+        file_bytes = await file.read_bytes()
+        source = {
+            "type": "text",
+            "media_type": "text/plain",
+            "data": file_bytes.decode("utf-8", errors="replace"),
+        }
+    else:
+        source = { 
+            "type": "base64",
+            "media_type": mime_type,
+            "data": await file.base64()
+        }
+      
+    return dict(
+        model=model,
+        max_tokens=2048,
+        messages=[
+          {
+            "role":"user",
+            "content":[
                 {
-                    "role": "user",
-                    "content": prompt_content
-                }
+                    "type": "image" if tipo_arquivo == TipoParametro.IMAGEM else "document",
+                    "source": source,
+                },
+                {"type": "text", "text": prompt_text},
             ],
-            tools=[{
-                "type": "web_search_20250305",
-                "name": "web_search",
-                "max_uses": 1
-            }]
-        )
-        return response
-    
-    except Exception as e:
-        logger.error(f"Erro ao processar prompt com Claude (texto): {e}")
-        raise HTTPException(status_code=500, detail=f"Erro no processamento com Claude (texto): {str(e)}")
+          }
+        ],
+        **args,
+    )
+
+def _messages_api(args: dict):
+    # Requisições com `betas` (ex.: arquivos da Files API) só são aceitas pelo endpoint beta
+    return client.beta.messages if "betas" in args else client.messages
+
+def _web_search_args(prompt_content: str, model: str) -> dict:
+    return dict(
+        model=model,
+        max_tokens=2048,
+        messages=[
+            {
+                "role": "user",
+                "content": prompt_content
+            }
+        ],
+        tools=[{
+            "type": "web_search_20250305",
+            "name": "web_search",
+            "max_uses": 1
+        }]
+    )
+
+
+async def process(prompt_content: str, model: str = CLAUDE4) -> LLMResult:
+    response = await client.messages.create(**_text_args(prompt_content, model))
+
+    logger.info("Resposta do Claude (texto) recebida com sucesso.")
+    return _message_result(response, model)
+ 
+async def process_file(file: FilePayload, prompt_text: str, tipo_arquivo: TipoParametro, model: str = CLAUDE4) -> LLMResult:
+    args = await _file_args(file, prompt_text, tipo_arquivo, model)
+    response = await _messages_api(args).create(**args)
+    return _message_result(response, model)
+        
+async def process_web_search(prompt_content: str, model: str = CLAUDE4) -> LLMResult:
+    response = await client.messages.create(**_web_search_args(prompt_content, model))
+    return _message_result(response, model)
+
+async def stream(prompt_content: str, model: str, result: LLMResult) -> AsyncIterator[str]:
+    async for delta in _stream_message(_text_args(prompt_content, model), result):
+        yield delta
+
+async def stream_file(file: FilePayload, prompt_text: str, tipo_arquivo: TipoParametro, model: str, result: LLMResult) -> AsyncIterator[str]:
+    async for delta in _stream_message(await _file_args(file, prompt_text, tipo_arquivo, model), result):
+        yield delta
+
+async def stream_web_search(prompt_content: str, model: str, result: LLMResult) -> AsyncIterator[str]:
+    async for delta in _stream_message(_web_search_args(prompt_content, model), result):
+        yield delta
+
+async def _stream_message(args: dict, result: LLMResult) -> AsyncIterator[str]:
+    async with _messages_api(args).stream(**args) as message_stream:
+        async for text in message_stream.text_stream:
+            yield text
+        final_message = await message_stream.get_final_message()
+        result.input_tokens = final_message.usage.input_tokens
+        result.output_tokens = final_message.usage.output_tokens
+
+def _message_result(response, model: str) -> LLMResult:
+    # Com ferramentas (web search) a resposta intercala blocos de texto e de tool use
+    text = "".join(block.text for block in response.content if block.type == "text")
+    return LLMResult(
+        text=text.strip(),
+        model=model,
+        input_tokens=response.usage.input_tokens,
+        output_tokens=response.usage.output_tokens,
+    )
@@ -5,7 +5,6 @@ from database.llm_history_repo import LLMHistoryRepository
 from database.credits_repo import UserCreditRepository
 load_dotenv()
     
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 llm_log_repo = LLMHistoryRepository()
@@ -14,6 +13,7 @@ credits_repo = UserCreditRepository()
 async def get_user_data(user_id: str):
     try: 
         log_history = await llm_log_repo.get_recent_history(user_id)
+        # Saldo materializado (aux.user_credits), sem somar o livro-razão
         credits = await credits_repo.get_credits(user_id)
 
         user_info = {
@@ -1,103 +1,161 @@
 import os
+import io
+import asyncio
 import logging
-import base64
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
 from fastapi import HTTPException
 import google.generativeai as genai
-from managers.menu_mgr import MenuManager
+from google.api_core import exceptions as google_exceptions
 from models.enums import TipoParametro
-from models.prompt_models import PromptRequest
+from models.llm_models import LLMResult
 from dotenv import load_dotenv
 
+from utils.file_handle_cache import FileHandleCache
+from utils.file_payload import FilePayload
 from utils.file_util import get_default_filename, get_mime_type
 
 load_dotenv()
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Erros de configuração da ferramenta de busca (modelo sem suporte, argumentos recusados):
+# só esses caem para o processamento sem busca; 429/5xx/timeout sobem para a RetryPolicy
+WEB_SEARCH_FALLBACK_ERRORS = (
+    google_exceptions.InvalidArgument,
+    google_exceptions.FailedPrecondition,
+    ValueError,
+    TypeError,
+)
+
 gemini_api_key = os.getenv("GEMINI_API_KEY")
+# Endpoint alternativo (ex.: benchmarks/stub_llm_server.py). O SDK só aceita outro host pelo
+# transporte REST, cujo cliente assíncrono não funciona: as chamadas rodam então numa thread.
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL")
 if not gemini_api_key:
     logger.warning("GEMINI_API_KEY not found in environment variables. Please set it.")
+elif GEMINI_BASE_URL:
+    genai.configure(api_key=gemini_api_key, transport="rest", client_options={"api_endpoint": GEMINI_BASE_URL})
 else:
     genai.configure(api_key=gemini_api_key)
 
-menu_mgr = MenuManager() # For text prompts if still used by 'process'
-
 # Updated models - Gemini 2.0 Flash
 #GEMINI_MODEL = "gemini-2.0-flash" 
 GEMINI_MODEL = "gemini-2.5-flash-preview-05-20"
 
-gemini_text_model = genai.GenerativeModel(GEMINI_MODEL) if gemini_api_key else None
-gemini_multimodal_model = genai.GenerativeModel(GEMINI_MODEL) if gemini_api_key else None
-
-# Web search model - try different approaches
-try:
-    # First attempt: use tools as dict
-    gemini_web_search_model = genai.GenerativeModel(
-        GEMINI_MODEL,
-        tools=[{"google_search": {}}]
-    ) if gemini_api_key else None
-except Exception as e1:
-    try:
-        # Second attempt: use system instruction approach
-        gemini_web_search_model = genai.GenerativeModel(
-            GEMINI_MODEL,
-            system_instruction="You have access to Google Search. When answering questions, search for current information when needed."
-        ) if gemini_api_key else None
-        logger.info("Using system instruction approach for web search")
-    except Exception as e2:
-        # Fallback: use regular model and handle search in the method
-        gemini_web_search_model = genai.GenerativeModel(GEMINI_MODEL) if gemini_api_key else None
-        logger.warning(f"Could not configure web search tools. Using fallback approach. Errors: {e1}, {e2}")
-
-async def process(req: PromptRequest) -> str:
-    if not gemini_text_model:
-        raise HTTPException(status_code=503, detail="Gemini API key não configurada.")
+# Arquivos até este tamanho vão inline na requisição (o limite da API é ~20MB por requisição)
+INLINE_MAX_BYTES = int(os.getenv("GEMINI_INLINE_MAX_BYTES", str(15 * 1024 * 1024)))
+FILE_PROCESSING_TIMEOUT = float(os.getenv("GEMINI_FILE_PROCESSING_TIMEOUT", "300"))
+
+_models = {}
+_background_tasks = set()
+
+def _build_web_search_model(model_name: str):
+    # Web search model - try different approaches
     try:
-        prompt_content = await menu_mgr.mount(req) # For text-based prompts
-        
-        logger.info(f"Enviando prompt de texto para Gemini ({GEMINI_MODEL}): {prompt_content[:100]}...")
-
-        response = await gemini_text_model.generate_content_async( # Use async version
-            contents=[{"role": "user", "parts": [prompt_content]}],
-            generation_config={
-                "temperature": 0.3,
-                "max_output_tokens": 2048
-            }
+        # First attempt: use tools as dict
+        return genai.GenerativeModel(
+            model_name,
+            tools=[{"google_search": {}}]
         )
-        
-        result = response.text.strip()
-        logger.info("Resposta do Gemini (texto) recebida com sucesso.")
-        return result
-
-    except Exception as e:
-        logger.error(f"Erro ao processar prompt de texto com Gemini: {e}")
-        raise HTTPException(status_code=500, detail=f"Erro no processamento de texto com Gemini: {str(e)}")
+    except Exception as e1:
+        try:
+            # Second attempt: use system instruction approach
+            web_search_model = genai.GenerativeModel(
+                model_name,
+                system_instruction="You have access to Google Search. When answering questions, search for current information when needed."
+            )
+            logger.info("Using system instruction approach for web search")
+            return web_search_model
+        except Exception as e2:
+            # Fallback: use regular model and handle search in the method
+            logger.warning(f"Could not configure web search tools. Using fallback approach. Errors: {e1}, {e2}")
+            return genai.GenerativeModel(model_name)
 
-async def process_web_search(req: PromptRequest) -> str:
-    if not gemini_web_search_model:
+def _get_model(model_name: str, web_search: bool = False):
+    if not gemini_api_key:
         raise HTTPException(status_code=503, detail="Gemini API key não configurada.")
-    
-    try:
-        prompt = await menu_mgr.mount(req) # For text-based prompts
-         
-        logger.info(f"Enviando busca web para Gemini ({GEMINI_MODEL}): {prompt[:100]}...")
+    key = (model_name, web_search)
+    if key not in _models:
+        _models[key] = _build_web_search_model(model_name) if web_search else genai.GenerativeModel(model_name)
+    return _models[key]
+
+async def _generate_content(gemini_model, args: dict, stream: bool = False):
+    if GEMINI_BASE_URL:
+        return await asyncio.to_thread(gemini_model.generate_content, **args, stream=stream)
+    return await gemini_model.generate_content_async(**args, stream=stream)
+
+async def _iter_chunks(response) -> AsyncIterator:
+    if not GEMINI_BASE_URL:
+        async for chunk in response:
+            yield chunk
+        return
+    chunks = iter(response)
+    done = object()
+    while (chunk := await asyncio.to_thread(next, chunks, done)) is not done:
+        yield chunk
 
-        # Enhanced prompt to encourage web search behavior
-        enhanced_prompt = f"""Please search for current, up-to-date information to answer this request: {prompt}
+def _result(response, model_name: str) -> LLMResult:
+    usage = getattr(response, "usage_metadata", None)
+    return LLMResult(
+        text=response.text.strip(),
+        model=model_name,
+        input_tokens=getattr(usage, "prompt_token_count", 0) or 0,
+        output_tokens=getattr(usage, "candidates_token_count", 0) or 0,
+    )
+
+def _text_args(prompt_content: str) -> dict:
+    return dict(
+        contents=[{"role": "user", "parts": [prompt_content]}],
+        generation_config={
+            "temperature": 0.3,
+            "max_output_tokens": 2048
+        }
+    )
+
+def _web_search_args(prompt: str) -> dict:
+    # Enhanced prompt to encourage web search behavior
+    enhanced_prompt = f"""Please search for current, up-to-date information to answer this request: {prompt}
 
 Use real-time web search to find the most current and accurate information available. Provide detailed, factual responses based on your search results."""
 
+    return dict(
+        contents=[{"role": "user", "parts": [enhanced_prompt]}],
+        generation_config={
+            "temperature": 0.1,  # Lower temperature for more factual responses
+            "max_output_tokens": 4096
+        }
+    )
+
+def _file_args(file_part, prompt_text: str) -> dict:
+    return dict(
+        contents=[file_part, prompt_text],
+        generation_config={
+            "temperature": 0.3,
+            "max_output_tokens": 4096
+        }
+    )
+
+async def process(prompt_content: str, model: str = GEMINI_MODEL) -> LLMResult:
+    gemini_text_model = _get_model(model)
+    
+    logger.info(f"Enviando prompt de texto para Gemini ({model}): {len(prompt_content)} caracteres")
+
+    response = await _generate_content(gemini_text_model, _text_args(prompt_content))
+    
+    logger.info("Resposta do Gemini (texto) recebida com sucesso.")
+    return _result(response, model)
+
+async def process_web_search(prompt: str, model: str = GEMINI_MODEL) -> LLMResult:
+    gemini_web_search_model = _get_model(model, web_search=True)
+    
+    try:
+        logger.info(f"Enviando busca web para Gemini ({model}): {len(prompt)} caracteres")
+
         # Use the model (may have search tools or system instruction)
-        response = await gemini_web_search_model.generate_content_async(
-            contents=[{"role": "user", "parts": [enhanced_prompt]}],
-            generation_config={
-                "temperature": 0.1,  # Lower temperature for more factual responses
-                "max_output_tokens": 4096
-            }
-        )
+        response = await _generate_content(gemini_web_search_model, _web_search_args(prompt))
         
-        result = response.text.strip()
+        result = _result(response, model)
         
         # Try to get grounding metadata if available
         try:
@@ -112,84 +170,129 @@ Use real-time web search to find the most current and accurate information avail
         logger.info("Resposta de busca web do Gemini recebida com sucesso.")
         return result
         
-    except Exception as e:
+    except WEB_SEARCH_FALLBACK_ERRORS as e:
         logger.error(f"Erro ao realizar busca web com Gemini: {e}")
-        # Fallback to regular text processing if web search fails
+        # Fallback to regular text processing if the search tool is not usable
         logger.info("Tentando fallback para processamento de texto regular...")
-        try:
-            return await process(req)
-        except Exception as fallback_error:
-            logger.error(f"Erro no fallback: {fallback_error}")
-            raise HTTPException(status_code=500, detail=f"Erro na busca web com Gemini: {str(e)}")
+        return await process(prompt, model)
  
     
+async def _delete_uploaded_file(name: str) -> None:
+    try:
+        await asyncio.to_thread(genai.delete_file, name)
+    except Exception as e:
+        logger.warning(f"Não foi possível remover o arquivo {name} do Gemini: {e}")
+
+async def _wait_until_active(uploaded_file):
+    """Aguarda o processamento do arquivo com backoff, sem bloquear o event loop"""
+    loop = asyncio.get_running_loop()
+    expires_at = loop.time() + FILE_PROCESSING_TIMEOUT
+    delay = 0.5
+    while uploaded_file.state.name == "PROCESSING":
+        if loop.time() + delay > expires_at:
+            raise HTTPException(status_code=504, detail="Tempo esgotado aguardando o processamento do arquivo pelo Gemini.")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 5)
+        uploaded_file = await asyncio.to_thread(genai.get_file, uploaded_file.name)
+
+    if uploaded_file.state.name != "ACTIVE":
+        raise HTTPException(status_code=502, detail=f"Falha no processamento do arquivo pelo Gemini: {uploaded_file.state.name}")
+    return uploaded_file
+
+async def _upload(file_bytes: bytes, mime_type: str, filename: str):
+    """Envia o arquivo pela File API (em thread separada) e aguarda ficar ACTIVE"""
+    uploaded_file = await asyncio.to_thread(
+        genai.upload_file, io.BytesIO(file_bytes), mime_type=mime_type, display_name=filename
+    )
+    logger.info(f"Arquivo enviado para Gemini: {uploaded_file.name}")
+    try:
+        return await _wait_until_active(uploaded_file)
+    except Exception:
+        await _delete_uploaded_file(uploaded_file.name)
+        raise
+
+async def _upload_cached(file_bytes: bytes, mime_type: str, filename: str):
+    uploaded_file = await _upload(file_bytes, mime_type, filename)
+    expires_at = uploaded_file.expiration_time.timestamp() if uploaded_file.expiration_time else None
+    return uploaded_file.uri, expires_at
+
+async def _delete_cached(file_uri: str) -> None:
+    await asyncio.to_thread(genai.delete_file, "files/" + file_uri.rsplit("/", 1)[-1])
+
+# Arquivos expiram no Gemini após 48h; o cache os descarta antes disso
+file_cache = FileHandleCache("GEMINI", _upload_cached, _delete_cached, default_ttl=46 * 3600)
+
+@asynccontextmanager
+async def _file_part(file: FilePayload, tipo_arquivo: TipoParametro, filename: str = None):
+    """
+    Parte do conteúdo com o arquivo. Arquivos a partir de GEMINI_FILE_CACHE_MIN_BYTES usam
+    o cache de uploads (mesmo conteúdo, mesmo arquivo no Gemini); os demais vão inline até
+    GEMINI_INLINE_MAX_BYTES. Sem cache, arquivos maiores são enviados e removidos ao final.
+    """
+    mime_type = file.mime_type or get_mime_type(tipo_arquivo)
+
+    if not filename:
+        filename = file.filename or get_default_filename(tipo_arquivo)
+
+    if file_cache.applies_to(file.size):
+        file_uri = await file_cache.get_or_upload(file, mime_type, filename)
+        yield {"file_data": {"mime_type": mime_type, "file_uri": file_uri}}
+        return
+
+    file_bytes = await file.read_bytes()
+
+    if len(file_bytes) <= INLINE_MAX_BYTES:
+        yield {"mime_type": mime_type, "data": file_bytes}
+        return
+
+    uploaded_file = await _upload(file_bytes, mime_type, filename)
+    del file_bytes
+
+    try:
+        yield uploaded_file
+    finally:
+        task = asyncio.create_task(_delete_uploaded_file(uploaded_file.name))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
 # Alternative implementation using upload_file (for larger files)
-async def process_file(file_base64: str, prompt_text: str, tipo_arquivo: TipoParametro, filename: str = None) -> str:
+async def process_file(file: FilePayload, prompt_text: str, tipo_arquivo: TipoParametro, model: str = GEMINI_MODEL, filename: str = None) -> LLMResult:
     """
     Alternative approach using genai.upload_file for larger files or when direct approach fails
     """
-    if not gemini_multimodal_model:
-        raise HTTPException(status_code=503, detail="Gemini API key não configurada.")
+    gemini_multimodal_model = _get_model(model)
     
-    import tempfile
-    import os
-    
-    try:
-        mime_type = get_mime_type(tipo_arquivo)
-        
-        if not filename:
-            filename = get_default_filename(tipo_arquivo)
-        
-        # Decodificar base64 para bytes
-        file_bytes = base64.b64decode(file_base64)
-        
-        # Create temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f".{filename.split('.')[-1]}" if '.' in filename else '') as temp_file:
-            temp_file.write(file_bytes)
-            temp_file_path = temp_file.name
-        
-        try:
-            # Upload file to Gemini
-            uploaded_file = genai.upload_file(path=temp_file_path, mime_type=mime_type)
-            
-            logger.info(f"Arquivo enviado para Gemini: {uploaded_file.name}")
-            
-            # Wait for processing if needed
-            import time
-            while uploaded_file.state.name == "PROCESSING":
-                time.sleep(1)
-                uploaded_file = genai.get_file(uploaded_file.name)
-            
-            if uploaded_file.state.name != "ACTIVE":
-                raise Exception(f"File processing failed: {uploaded_file.state.name}")
-            
-            # Generate content
-            response = await gemini_multimodal_model.generate_content_async(
-                contents=[uploaded_file, prompt_text],
-                generation_config={
-                    "temperature": 0.3,
-                    "max_output_tokens": 4096
-                }
-            )
-            
-            result = response.text.strip()
-            logger.info(f"Resposta de arquivo {tipo_arquivo.name} do Gemini recebida com sucesso.")
-            
-            # Clean up uploaded file
-            try:
-                genai.delete_file(uploaded_file.name)
-            except:
-                pass
-            
-            return result
-            
-        finally:
-            # Clean up temporary file
-            try:
-                os.unlink(temp_file_path)
-            except:
-                pass
+    async with _file_part(file, tipo_arquivo, filename) as file_part:
+        # Generate content
+        response = await _generate_content(gemini_multimodal_model, _file_args(file_part, prompt_text))
         
-    except Exception as e:
-        logger.error(f"Erro ao processar arquivo {tipo_arquivo.name} com Gemini (alternative): {e}")
-        raise HTTPException(status_code=500, detail=f"Erro no processamento de arquivo {tipo_arquivo.name} com Gemini: {str(e)}")
\ No newline at end of file
+        result = _result(response, model)
+        logger.info(f"Resposta de arquivo {tipo_arquivo.name} do Gemini recebida com sucesso.")
+        return result
+
+async def stream(prompt_content: str, model: str, result: LLMResult) -> AsyncIterator[str]:
+    response = await _generate_content(_get_model(model), _text_args(prompt_content), stream=True)
+    async for delta in _stream_response(response, result):
+        yield delta
+
+async def stream_file(file: FilePayload, prompt_text: str, tipo_arquivo: TipoParametro, model: str, result: LLMResult) -> AsyncIterator[str]:
+    gemini_multimodal_model = _get_model(model)
+    async with _file_part(file, tipo_arquivo) as file_part:
+        response = await _generate_content(gemini_multimodal_model, _file_args(file_part, prompt_text), stream=True)
+        async for delta in _stream_response(response, result):
+            yield delta
+
+async def stream_web_search(prompt: str, model: str, result: LLMResult) -> AsyncIterator[str]:
+    response = await _generate_content(_get_model(model, web_search=True), _web_search_args(prompt), stream=True)
+    async for delta in _stream_response(response, result):
+        yield delta
+
+async def _stream_response(response, result: LLMResult) -> AsyncIterator[str]:
+    async for chunk in _iter_chunks(response):
+        # Chunks sem partes de texto (ex.: só metadados de grounding) levantam erro em .text
+        if chunk.candidates and chunk.candidates[0].content.parts:
+            yield chunk.text
+        usage = getattr(chunk, "usage_metadata", None)
+        if usage:
+            result.input_tokens = usage.prompt_token_count or 0
+            result.output_tokens = usage.candidates_token_count or 0
@@ -1,7 +1,7 @@
 import logging
 from database.prompt_repo import PromptRepository
 from models.enums import TipoParametro
-from models.prompt_models import PromptRequest
+from models.prompt_models import PromptRequest, PromptResponse
 
 
 logger = logging.getLogger(__name__)
@@ -17,6 +17,10 @@ class MenuManager:
         
         prompt = await self.prompt_repo.get_prompt(req.prompt_id)
         
+        return self.mount_prompt(prompt, req)
+
+    def mount_prompt(self, prompt: PromptResponse, req: PromptRequest) -> str:
+        """Monta o prompt final a partir de um prompt já carregado, sem nova consulta ao banco"""
         result = prompt.conteudo
         param_values = ""
         for param in req.parameters:
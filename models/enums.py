@@ -23,4 +23,9 @@ class LLM(IntEnum):
     GEMINI = 3
     
 class CategoriaPrompt(IntEnum):
-    TESTE = 1
\ No newline at end of file
+    TESTE = 1
+class StatusJob(IntEnum):
+    PENDENTE = 1
+    PROCESSANDO = 2
+    CONCLUIDO = 3
+    FALHOU = 4
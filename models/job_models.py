@@ -0,0 +1,18 @@
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel
+from models.enums import StatusJob
+from models.prompt_models import AIResponse
+
+class JobCreated(BaseModel):
+    job_id: str
+    status: StatusJob
+
+class JobResponse(BaseModel):
+    job_id: str
+    status: StatusJob
+    attempts: int
+    result: Optional[AIResponse] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
@@ -0,0 +1,11 @@
+from typing import Optional
+from pydantic import BaseModel
+
+
+class LLMResult(BaseModel):
+    """Resposta normalizada de um provedor de LLM"""
+    text: str
+    model: str
+    input_tokens: int = 0
+    output_tokens: int = 0
+    llm_id: Optional[int] = None # Provedor que de fato respondeu (pode diferir do pedido em failover)
@@ -45,6 +45,10 @@ class PromptRequest(BaseModel):
     prompt_id: int
     llm_id: int # This refers to the LLM selected for the current request
     parameters: List[FilledParameter]
+    use_cache: bool = Field(default=True) # False força uma nova chamada ao LLM
+    failover: Optional[bool] = None # None usa o padrão do servidor (LLM_FAILOVER_DEFAULT)
+    latency_budget_ms: Optional[int] = None # Orçamento de latência para a política de failover
+    chunked: bool = Field(default=False) # Prompts ARQUIVO: processa o documento em partes (map-reduce)
 
 class PromptWithParams(PromptBase):
     id: int
@@ -53,6 +57,35 @@ class PromptWithParams(PromptBase):
     class Config:
         from_attributes = True # For Pydantic v2
         
+class MapReduceStats(BaseModel):
+    chunks: int
+    llm_calls: int
+    extract_ms: int
+    map_ms: int
+    reduce_ms: int
+    input_tokens: int
+    output_tokens: int
+
 class AIResponse(BaseModel):
     llm_response: str
-    request_id: str
\ No newline at end of file
+    request_id: str
+    cached: bool = False
+    map_reduce: Optional[MapReduceStats] = None # Presente quando a requisição usou o modo em partes
+
+
+class BatchPromptRequest(BaseModel):
+    requests: List[PromptRequest]
+    stream: bool = Field(default=False) # True devolve NDJSON, um item por linha, à medida que terminam
+
+class BatchItemResult(BaseModel):
+    index: int # Posição do item em BatchPromptRequest.requests
+    status_code: int = 200
+    llm_response: Optional[str] = None
+    request_id: Optional[str] = None
+    cached: bool = False
+    credits: int = 0 # Créditos efetivamente cobrados pelo item
+    detail: Optional[str] = None
+
+class BatchResponse(BaseModel):
+    results: List[BatchItemResult]
+    credits_used: int
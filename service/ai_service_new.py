@@ -1,84 +1,483 @@
+import asyncio
+import json
 import logging
+import math
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Tuple
 from fastapi import HTTPException
 from database.credits_repo import UserCreditRepository
-from managers import gemini_mgr, chatgpt_mgr, claude_mgr 
-from models.prompt_models import PromptRequest, AIResponse
-from models.enums import LLM, TipoParametro, TipoPrompt
+from models.llm_models import LLMResult
+from models.prompt_models import BatchItemResult, FilledParameter, PromptRequest, AIResponse, PromptResponse
+from models.enums import TipoPrompt
 from managers.prompt_mgr import PromptManager
-from managers.log_mgr import log_llm
-from utils.file_util import get_mime_type
+from managers.menu_mgr import MenuManager
+from service.document_extractor import DocumentExtractor
+from service.hedging import HedgePolicy
+from service.map_reduce import MapReduce
+from service.provider_registry import ProviderRegistry, build_default_registry
+from service.response_cache import ResponseCache, request_fingerprint
+from service.write_behind import WriteBehind
+from utils.deadline import Deadline
+from utils.file_payload import get_file_payload
+from utils.file_util import get_default_filename, get_file_parameter
+from utils.metrics import LLM_SINGLE_FLIGHT_REQUESTS
+from utils.redaction import parameters_fingerprint
+from utils.single_flight import SingleFlight
+from utils.timing import timed
 
 logger = logging.getLogger(__name__)
- 
+
+# Aceita (True) ou descarta (False) uma resposta antes da cobrança
+Confirm = Callable[[AIResponse], Awaitable[bool]]
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _status(cached: bool) -> str:
+    """
+    Valor de aux.llm_log.status para uma chamada concluída: "cached" ou "ok". Streams não
+    passam por aqui quando interrompidos: _stream_events grava "partial" (e cobra a reserva)
+    só se o cliente desconectar depois do primeiro trecho; sem nenhum trecho, ou com erro do
+    provedor no meio, a reserva é devolvida e nada é registrado.
+    """
+    return "cached" if cached else "ok"
+
 class AIService:
-    def __init__(self):
+    def __init__(self, registry: ProviderRegistry = None):
         self.credits_repo = UserCreditRepository()
-        self.prompt_mgr = PromptManager() 
-        pass
-    
-    async def route_ai(self, req: PromptRequest, user_id: str) -> AIResponse:
-        
-        if not await self.credits_repo.has_credits(user_id):
-            raise HTTPException(status_code=402, detail="Créditos insuficientes para realizar esta operação.")
+        self.prompt_mgr = PromptManager()
+        self.menu_mgr = MenuManager()
+        self.registry = registry or build_default_registry()
+        self.cache = ResponseCache()
+        self.extractor = DocumentExtractor()
+        self.map_reduce = MapReduce()
+        self.hedging = HedgePolicy(self.registry)
+        self.failover_default = os.getenv("LLM_FAILOVER_DEFAULT", "false").lower() == "true"
+        self.single_flight = SingleFlight() if os.getenv("LLM_SINGLE_FLIGHT_ENABLED", "true").lower() == "true" else None
+        # Prazo (monotonic) da chamada compartilhada em andamento, por chave do single-flight
+        self._flight_expiry = {}
+        self.batch_max_items = int(os.getenv("LLM_BATCH_MAX_ITEMS", "50"))
+        self.batch_concurrency = int(os.getenv("LLM_BATCH_CONCURRENCY", "8"))
+        # A reserva precisa durar mais que a requisição mais longa (jobs usam LLM_JOB_VISIBILITY_SECONDS)
+        self.reservation_ttl = int(os.getenv("LLM_CREDIT_RESERVATION_SECONDS", "900"))
+        self.reap_interval = float(os.getenv("LLM_CREDIT_REAP_SECONDS", "60"))
+        self.write_behind = WriteBehind(credits_repo=self.credits_repo)
+        self._background_tasks = set()
+        self._reaper: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Inicia a devolução periódica de reservas de crédito vencidas"""
+        if self._reaper is None and self.reap_interval > 0:
+            self._reaper = asyncio.create_task(self._reap_reservations())
+
+    async def close(self) -> None:
+        """Grava o histórico e as reservas pendentes; chamado no shutdown"""
+        if self._reaper:
+            self._reaper.cancel()
+            await asyncio.gather(self._reaper, return_exceptions=True)
+            self._reaper = None
+        await self.write_behind.close()
+
+    async def _reap_reservations(self) -> None:
+        # Vários processos podem rodar isto ao mesmo tempo: cada reserva é apagada (e devolvida) uma vez só
+        while True:
+            await asyncio.sleep(self.reap_interval)
+            try:
+                await self.credits_repo.reap_expired_reservations()
+            except Exception as e:
+                logger.error(f"Erro ao devolver reservas de crédito vencidas: {e}", exc_info=True)
 
+    def _track(self, task: asyncio.Task) -> None:
+        """Mantém referência a tarefas em segundo plano até terminarem"""
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def _reserve(self, user_id: str, amount: int, detail: str = "Créditos insuficientes para realizar esta operação.") -> str:
+        """Retém os créditos antes da chamada ao LLM; 402 se o saldo não for suficiente, 503 se o banco falhar"""
+        try:
+            reservation = await self.credits_repo.reserve(user_id, amount, self.reservation_ttl)
+        except Exception as e:
+            logger.error(f"Erro ao reservar créditos de {user_id}: {e}")
+            raise HTTPException(
+                status_code=503,
+                detail="Não foi possível verificar os créditos no momento. Tente novamente em instantes.",
+                headers={"Retry-After": "5"},
+            )
+        if not reservation:
+            raise HTTPException(status_code=402, detail=detail)
+        return reservation
+
+    async def _load_prompt(self, req: PromptRequest) -> Tuple[PromptResponse, str]:
         full_prompt = await self.prompt_mgr.get(req.prompt_id)
         if not full_prompt:
             raise HTTPException(status_code=404, detail=f"Prompt com ID {req.prompt_id} não encontrado.")
+        # Prompts de arquivo sempre enviaram o conteúdo cadastrado, sem os parâmetros de texto
+        if full_prompt.tipo == TipoPrompt.ARQUIVO:
+            return full_prompt, full_prompt.conteudo
+        return full_prompt, self.menu_mgr.mount_prompt(full_prompt, req)
 
-        result = None
-        prompt_content_for_llm = full_prompt.conteudo 
+    def _file_parameter(self, req: PromptRequest) -> FilledParameter:
+        file_param = get_file_parameter(req)
+        if not file_param or not file_param.valor:
+            raise HTTPException(status_code=400, detail="Dados do arquivo não fornecidos nos parâmetros para prompt de arquivo.")
+        return file_param
 
-        if full_prompt.tipo == TipoPrompt.TEXTO:
-            if req.llm_id == LLM.CHAT_GPT:
-                result = await chatgpt_mgr.process(req)
-            elif req.llm_id == LLM.CLAUDE:
-                result = await claude_mgr.process(req)
-            elif req.llm_id == LLM.GEMINI:
-                result = await gemini_mgr.process(req)
-            else:
-                raise HTTPException(status_code=400, detail="LLM ID inválido para prompt de texto.")
-
-        elif full_prompt.tipo == TipoPrompt.ARQUIVO:
-            base64 = None
-            tipo_param = None
-            for param in req.parameters:
-                if param.tipo != TipoParametro.TEXTO or param.tipo != TipoParametro.NUMERICO :
-                    base64 = param.valor
-                    tipo_param = param.tipo
-                    break
-            
-            if not base64:
-                raise HTTPException(status_code=400, detail="Dados da imagem não fornecidos nos parâmetros para prompt de imagem.")
-            
-            print("####### base 64 file ###########")
-            print(base64[:100])
-            
-            if req.llm_id == LLM.CHAT_GPT:
-                result = await chatgpt_mgr.process_file(base64, prompt_content_for_llm,tipo_param)
-            elif req.llm_id == LLM.CLAUDE:
-                result = await claude_mgr.process_file(base64, prompt_content_for_llm, tipo_param)
-            elif req.llm_id == LLM.GEMINI:
-                result = await gemini_mgr.process_file(base64, prompt_content_for_llm, tipo_param)
+    async def _prepare(self, req: PromptRequest) -> Tuple[PromptResponse, str, Optional[FilledParameter]]:
+        """
+        Carrega o prompt e monta o texto e o arquivo a enviar ao LLM. Quando o texto do
+        arquivo pode ser extraído localmente, ele é anexado ao prompt e a chamada segue
+        como TEXTO, sem arquivo.
+        """
+        full_prompt, prompt_text = await self._load_prompt(req)
+
+        file_param = None
+        if full_prompt.tipo == TipoPrompt.ARQUIVO:
+            file_param = self._file_parameter(req)
+            file = get_file_payload(file_param)
+            with timed("extract"):
+                extracted = await self.extractor.extract(file, file_param.tipo)
+            if extracted is not None:
+                filename = file.filename or get_default_filename(file_param.tipo)
+                prompt_text = f"{prompt_text}\n\nConteúdo do arquivo {filename}:\n{extracted}"
+                return full_prompt.model_copy(update={"tipo": TipoPrompt.TEXTO}), prompt_text, None
+
+        return full_prompt, prompt_text, file_param
+
+    async def _fingerprint(self, full_prompt: PromptResponse, req: PromptRequest, prompt_text: str, file_param: Optional[FilledParameter]) -> str:
+        provider = self.registry.get(req.llm_id)
+        provider.check_supported(full_prompt.tipo)
+        file_sha256 = await get_file_payload(file_param).sha256() if file_param else None
+        return request_fingerprint(full_prompt, req, provider.model_for(full_prompt.tipo), prompt_text, file_param.tipo if file_param else None, file_sha256)
+
+    def _uses_failover(self, req: PromptRequest) -> bool:
+        return self.failover_default if req.failover is None else req.failover
+
+    async def _generate(self, tipo: TipoPrompt, req: PromptRequest, prompt_text: str, file_param: Optional[FilledParameter], fingerprint: str, deadline: Optional[Deadline] = None) -> LLMResult:
+        """
+        Chama o provedor e alimenta o cache. Requisições idênticas simultâneas (mesmo
+        fingerprint, mesma política de failover e orçamento de latência) compartilham uma
+        única chamada; cada uma continua sendo registrada e cobrada individualmente por quem
+        chamou. Quem chega só entra numa chamada cujo prazo dure pelo menos tanto quanto o
+        seu, e desiste dela (504) quando o próprio prazo acaba.
+        """
+        failover = self._uses_failover(req)
+
+        async def call() -> LLMResult:
+            if failover:
+                result = await self.hedging.run(tipo, req.llm_id, prompt_text, file_param, req.latency_budget_ms, deadline)
             else:
-                raise HTTPException(status_code=400, detail="LLM ID inválido para prompt de imagem.")
-                 
-        elif full_prompt.tipo == TipoPrompt.BUSCA:
-            if req.llm_id == LLM.GEMINI:
-                result = await gemini_mgr.process_web_search(req)
-            if req.llm_id == LLM.CHAT_GPT:
-                result = await chatgpt_mgr.process_web_search(req)    
-            if req.llm_id == LLM.CLAUDE:
-                result = await claude_mgr.process_web_search(req)
-            
-            
-        else:
-            raise HTTPException(status_code=400, detail="Tipo de prompt não suportado.")
-
-        if result is not None:
-            req_id = await log_llm(user_id,str(req),result[:150])
-            response = AIResponse(llm_response=result, request_id=req_id)
-            await self.credits_repo.deduct_credit(user_id)
+                result = await self.registry.dispatch(tipo, req.llm_id, prompt_text, file_param, deadline)
+            # Respostas de outro provedor (failover) não podem ficar no cache do LLM pedido
+            if result.llm_id == int(req.llm_id):
+                await self.cache.set(fingerprint, tipo, result)
+            return result
+
+        if not self.single_flight:
+            return await call()
+
+        key = f"{fingerprint}:{int(failover)}:{req.latency_budget_ms if failover else ''}"
+        expires_at = deadline.expires_at if deadline else math.inf
+        file = get_file_payload(file_param) if file_param else None
+
+        async def shared() -> LLMResult:
+            try:
+                return await call()
+            finally:
+                self._flight_expiry.pop(key, None)
+                if file is not None:
+                    await file.release()
+
+        if self.single_flight.in_flight(key):
+            if self._flight_expiry.get(key, math.inf) < expires_at:
+                # A chamada em andamento desistiria antes do prazo desta requisição
+                LLM_SINGLE_FLIGHT_REQUESTS.labels(role="leader").inc()
+                return await call()
+            LLM_SINGLE_FLIGHT_REQUESTS.labels(role="follower").inc()
+            try:
+                return await asyncio.wait_for(self.single_flight.do(key, shared), deadline.remaining() if deadline else None)
+            except asyncio.TimeoutError:
+                raise HTTPException(status_code=504, detail="Tempo limite excedido aguardando resposta do LLM.")
+
+        LLM_SINGLE_FLIGHT_REQUESTS.labels(role="leader").inc()
+        self._flight_expiry[key] = expires_at
+        # A chamada compartilhada pode seguir depois que esta requisição terminar (ex.: cliente
+        # desconectou e há seguidores): ela detém o arquivo até acabar
+        if file is not None:
+            file.hold()
+        return await self.single_flight.do(key, shared)
+
+    async def _log_entry(self, req: PromptRequest, user_id: str, result: LLMResult, started: float, status: str) -> dict:
+        """Linha de aux.llm_log: colunas estruturadas, sem o conteúdo dos parâmetros nem dos arquivos"""
+        params_fingerprint, files = await parameters_fingerprint(req)
+        return {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "prompt_id": req.prompt_id,
+            "llm_id": result.llm_id or req.llm_id,
+            "model": result.model,
+            "params_fingerprint": params_fingerprint,
+            "files": files,
+            "latency_ms": int((time.perf_counter() - started) * 1000),
+            "input_tokens": result.input_tokens,
+            "output_tokens": result.output_tokens,
+            "status": status,
+            "llm_response": result.text,
+            # Horário da chamada: a fila write-behind só grava a linha depois
+            "timestamp": datetime.now(timezone.utc),
+        }
+
+    async def _record(self, req: PromptRequest, user_id: str, result: LLMResult, started: float, status: str = "ok", reservation: Optional[str] = None, credits: int = 1) -> str:
+        """
+        Enfileira o registro em aux.llm_log e, com uma reserva, o seu encerramento cobrando
+        `credits` (gravados em lote pela fila write-behind)
+        """
+        entry = await self._log_entry(req, user_id, result, started, status)
+        await self._enqueue_record(entry, reservation, credits)
+        return entry["id"]
+
+    async def _enqueue_record(self, entry: dict, reservation: Optional[str], credits: int) -> None:
+        await self.write_behind.log(entry)
+        if reservation:
+            await self.write_behind.settle(reservation, credits, entry["id"])
+
+    async def _confirm_and_record(self, response: AIResponse, entry: dict, reservation: str, credits: int, confirm: Optional[Confirm]) -> AIResponse:
+        """
+        Cobra e registra a resposta só depois que `confirm` a aceitar. Se ela for recusada
+        (ex.: job que perdeu a reserva para outro worker) ou `confirm` falhar, a reserva volta
+        inteira ao saldo: quem repetir a chamada é que será cobrado.
+        """
+        try:
+            accepted = confirm is None or await confirm(response)
+        except BaseException:
+            await self.write_behind.settle(reservation, 0)
+            raise
+        if not accepted:
+            await self.write_behind.settle(reservation, 0)
             return response
-        else:
+        await self._enqueue_record(entry, reservation, credits)
+        return response
+
+    async def _resolve(self, req: PromptRequest, deadline: Optional[Deadline] = None) -> Tuple[LLMResult, bool]:
+        """Responde a requisição pelo cache ou pelo provedor; retorna o resultado e se veio do cache"""
+        full_prompt, prompt_text, file_param = await self._prepare(req)
+
+        fingerprint = await self._fingerprint(full_prompt, req, prompt_text, file_param)
+        if self.cache.is_enabled_for(req, full_prompt.tipo):
+            with timed("cache"):
+                cached = await self.cache.get(fingerprint)
+            if cached:
+                return cached, True
+
+        with timed("llm"):
+            result = await self._generate(full_prompt.tipo, req, prompt_text, file_param, fingerprint, deadline)
+        return result, False
+
+    def _credit_cost(self, cached: bool) -> int:
+        return self.cache.hit_credit_cost if cached else 1
+
+    @property
+    def _max_credit_cost(self) -> int:
+        """Créditos a reservar por chamada: o custo de uma chamada ou de um acerto de cache, o que for maior"""
+        return max(1, self.cache.hit_credit_cost)
+
+    async def route_ai(self, req: PromptRequest, user_id: str, deadline: Optional[Deadline] = None, confirm: Optional[Confirm] = None) -> AIResponse:
+        """`confirm`, quando informado, decide se a resposta é aceita antes de cobrá-la (ver _confirm_and_record)"""
+        if req.chunked:
+            return await self._route_chunked(req, user_id, deadline, confirm)
+        started = time.perf_counter()
+        reservation = await self._reserve(user_id, self._max_credit_cost)
+
+        try:
+            result, cached = await self._resolve(req, deadline)
+        except BaseException:
+            # Falha do provedor (ou cancelamento): a reserva volta inteira ao saldo
+            await self.write_behind.settle(reservation, 0)
+            raise
+
+        entry = await self._log_entry(req, user_id, result, started, _status(cached))
+        response = AIResponse(llm_response=result.text, request_id=entry["id"], cached=cached)
+        return await self._confirm_and_record(response, entry, reservation, self._credit_cost(cached), confirm)
+
+    async def _route_chunked(self, req: PromptRequest, user_id: str, deadline: Optional[Deadline] = None, confirm: Optional[Confirm] = None) -> AIResponse:
+        """
+        Modo em partes (map-reduce) para prompts ARQUIVO com documentos grandes. Cada chamada
+        ao LLM é um prompt TEXTO comum (cacheado, com failover e prazo) e custa um crédito. O
+        máximo de créditos possível é reservado antes da primeira chamada; o que não foi usado
+        (ou a reserva inteira, se o processamento falhar) é devolvido ao final.
+        """
+        extract_start = time.perf_counter()
+        full_prompt, prompt_text = await self._load_prompt(req)
+        if full_prompt.tipo != TipoPrompt.ARQUIVO:
+            raise HTTPException(status_code=400, detail="O modo em partes só está disponível para prompts de arquivo.")
+
+        file_param = self._file_parameter(req)
+        file = get_file_payload(file_param)
+        with timed("extract"):
+            text = await self.extractor.extract(file, file_param.tipo, max_chars=0)
+        if text is None:
+            raise HTTPException(status_code=415, detail="O modo em partes só está disponível para arquivos CSV, TXT, XLSX, XLS e DOCX.")
+        chunks = self.map_reduce.split(text)
+        extract_ms = int((time.perf_counter() - extract_start) * 1000)
+
+        text_prompt = full_prompt.model_copy(update={"tipo": TipoPrompt.TEXTO})
+        self.registry.get(req.llm_id).check_supported(TipoPrompt.TEXTO)
+
+        async def call(chunk_prompt: str) -> Tuple[LLMResult, bool]:
+            fingerprint = await self._fingerprint(text_prompt, req, chunk_prompt, None)
+            if self.cache.is_enabled_for(req, TipoPrompt.TEXTO):
+                with timed("cache"):
+                    cached = await self.cache.get(fingerprint)
+                if cached:
+                    return cached, True
+            with timed("llm"):
+                return await self._generate(TipoPrompt.TEXTO, req, chunk_prompt, None, fingerprint, deadline), False
+
+        reserved = self.map_reduce.max_calls(len(chunks))
+        reservation = await self._reserve(user_id, reserved, f"Créditos insuficientes: o documento tem {len(chunks)} partes e pode exigir até {reserved} créditos.")
+
+        try:
+            filename = file.filename or get_default_filename(file_param.tipo)
+            result, stats, cached_flags = await self.map_reduce.run(call, prompt_text, filename, chunks)
+        except BaseException:
+            await self.write_behind.settle(reservation, 0)
+            raise
+        credits_used = sum(self._credit_cost(cached) for cached in cached_flags)
+
+        stats.extract_ms = extract_ms
+        logger.info(
+            f"Map-reduce: {stats.chunks} partes, {stats.llm_calls} chamadas, extração {stats.extract_ms} ms, "
+            f"map {stats.map_ms} ms, reduce {stats.reduce_ms} ms, {stats.input_tokens}+{stats.output_tokens} tokens"
+        )
+        # O registro leva o total de tokens de todas as chamadas, não só as do reduce final
+        totals = result.model_copy(update={"input_tokens": stats.input_tokens, "output_tokens": stats.output_tokens})
+        entry = await self._log_entry(req, user_id, totals, extract_start, _status(all(cached_flags)))
+        response = AIResponse(llm_response=result.text, request_id=entry["id"], cached=all(cached_flags), map_reduce=stats)
+        return await self._confirm_and_record(response, entry, reservation, credits_used, confirm)
+
+    async def route_batch(self, reqs: List[PromptRequest], user_id: str, deadline: Optional[Deadline] = None) -> AsyncIterator[BatchItemResult]:
+        """
+        Valida o lote e reserva de uma vez um crédito por item (antes de abrir a resposta,
+        para que erros virem status HTTP). Devolve um gerador de BatchItemResult na ordem em
+        que os itens terminam; ao final, créditos de itens que falharam (ou vieram mais
+        baratos do cache) são devolvidos e o histórico vai para a fila write-behind.
+        """
+        if not reqs:
+            raise HTTPException(status_code=400, detail="O lote não contém requisições.")
+        if len(reqs) > self.batch_max_items:
+            raise HTTPException(status_code=400, detail=f"O lote excede o limite de {self.batch_max_items} requisições.")
+        if any(req.chunked for req in reqs):
+            raise HTTPException(status_code=400, detail="O modo em partes não está disponível em lotes; use /api/jobs.")
+
+        reservation = await self._reserve(user_id, len(reqs) * self._max_credit_cost, "Créditos insuficientes para processar todo o lote.")
+
+        return self._batch_items(reqs, user_id, reservation, deadline)
+
+    async def _batch_item(self, index: int, req: PromptRequest, user_id: str, semaphore: asyncio.Semaphore, deadline: Optional[Deadline]) -> Tuple[BatchItemResult, Optional[dict]]:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                result, cached = await self._resolve(req, deadline)
+            except HTTPException as he:
+                return BatchItemResult(index=index, status_code=he.status_code, detail=he.detail, credits=0), None
+            except Exception as e:
+                logger.error(f"Erro no item {index} do lote: {e}", exc_info=True)
+                return BatchItemResult(index=index, status_code=500, detail=f"Erro interno do servidor: {str(e)}", credits=0), None
+
+        log_entry = await self._log_entry(req, user_id, result, started, _status(cached))
+        item = BatchItemResult(
+            index=index,
+            llm_response=result.text,
+            request_id=log_entry["id"],
+            cached=cached,
+            credits=self._credit_cost(cached),
+        )
+        return item, log_entry
+
+    async def _batch_items(self, reqs: List[PromptRequest], user_id: str, reservation: str, deadline: Optional[Deadline]) -> AsyncIterator[BatchItemResult]:
+        semaphore = asyncio.Semaphore(self.batch_concurrency)
+        tasks = [asyncio.create_task(self._batch_item(i, req, user_id, semaphore, deadline)) for i, req in enumerate(reqs)]
+        log_entries = []
+        credits_used = 0
+        completed = False
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                item, log_entry = await next_done
+                if log_entry:
+                    log_entries.append(log_entry)
+                credits_used += item.credits
+                yield item
+            completed = True
+        finally:
+            # Cliente desconectou no meio do lote: itens pendentes são cancelados e não cobrados
+            for task in tasks:
+                task.cancel()
+            settle = asyncio.create_task(self._settle_batch(reservation, credits_used, log_entries))
+            self._track(settle)
+            if completed:
+                await asyncio.shield(settle)
+
+    async def _settle_batch(self, reservation: str, credits_used: int, log_entries: List[dict]) -> None:
+        await self.write_behind.settle(reservation, credits_used)
+        for entry in log_entries:
+            await self.write_behind.log(entry)
+
+    async def stream_ai(self, req: PromptRequest, user_id: str, deadline: Optional[Deadline] = None) -> AsyncIterator[str]:
+        """
+        Faz as validações antes de abrir o stream (para que erros virem status HTTP) e
+        devolve um gerador de eventos SSE: `delta` para cada trecho, `done` com o request_id
+        ao final ou `error` se o provedor falhar no meio do caminho.
+        """
+        if req.chunked:
+            raise HTTPException(status_code=400, detail="O modo em partes não está disponível com streaming.")
+        started = time.perf_counter()
+        reservation = await self._reserve(user_id, self._max_credit_cost)
+        try:
+            full_prompt, prompt_text, file_param = await self._prepare(req)
+
+            fingerprint = await self._fingerprint(full_prompt, req, prompt_text, file_param)
+            if self.cache.is_enabled_for(req, full_prompt.tipo):
+                with timed("cache"):
+                    cached = await self.cache.get(fingerprint)
+                if cached:
+                    return self._cached_events(req, user_id, cached, started, reservation)
+
+            provider = self.registry.get(req.llm_id)
+            result = LLMResult(text="", model=provider.model_for(full_prompt.tipo))
+            deltas = provider.stream(full_prompt.tipo, prompt_text, result, file_param, deadline)
+        except BaseException:
+            await self.write_behind.settle(reservation, 0)
+            raise
+        return self._stream_events(req, user_id, deltas, result, full_prompt.tipo, fingerprint, started, reservation)
+
+    async def _cached_events(self, req: PromptRequest, user_id: str, cached: LLMResult, started: float, reservation: str) -> AsyncIterator[str]:
+        yield _sse("delta", {"text": cached.text})
+        req_id = await self._record(req, user_id, cached, started, _status(True), reservation, self.cache.hit_credit_cost)
+        yield _sse("done", {"request_id": req_id, "cached": True})
+
+    async def _stream_events(self, req: PromptRequest, user_id: str, deltas: AsyncIterator[str], result: LLMResult, tipo: TipoPrompt, fingerprint: str, started: float, reservation: str) -> AsyncIterator[str]:
+        chunks = []
+        try:
+            async for delta in deltas:
+                chunks.append(delta)
+                yield _sse("delta", {"text": delta})
+        except HTTPException as he:
+            logger.error(f"Erro durante streaming: {he.detail} (Status: {he.status_code})")
+            await self.write_behind.settle(reservation, 0)
+            yield _sse("error", {"status": he.status_code, "detail": he.detail})
+            return
+        except (asyncio.CancelledError, GeneratorExit):
+            # Cliente desconectou: o que já foi gerado é registrado e cobrado em segundo plano
+            if chunks:
+                result.text = "".join(chunks)
+                self._track(asyncio.create_task(self._record(req, user_id, result, started, "partial", reservation)))
+            else:
+                self._track(asyncio.create_task(self.write_behind.settle(reservation, 0)))
+            raise
 
-            raise HTTPException(status_code=500, detail="Falha no processamento da IA ou rota não encontrada.")
+        result.text = "".join(chunks)
+        await self.cache.set(fingerprint, tipo, result)
+        req_id = await self._record(req, user_id, result, started, reservation=reservation)
+        yield _sse("done", {"request_id": req_id})
@@ -0,0 +1,46 @@
+"""
+Job de conciliação dos créditos: recalcula em lote o saldo de cada usuário a partir do
+livro-razão aux.credit_transactions e corrige aux.user_credits onde houver divergência
+(ex.: saldo alterado à mão no banco). Pensado para rodar periodicamente (cron) fora dos
+processos da API.
+
+Uso:
+    python -m service.credit_reconciliation            # corrige e lista as divergências
+    python -m service.credit_reconciliation --dry-run  # só lista
+"""
+import argparse
+import asyncio
+import logging
+from dotenv import load_dotenv
+from database.credits_repo import UserCreditRepository
+from database.db_config import engine
+from utils.logging_config import configure_logging
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+async def reconcile(fix: bool = True) -> int:
+    """Executa a conciliação e devolve quantos saldos divergiam"""
+    # Reservas vencidas são devolvidas antes, para que o saldo reflita só requisições vivas
+    repo = UserCreditRepository()
+    await repo.reap_expired_reservations()
+    drift = await repo.reconcile_balances(fix=fix)
+    logger.info(f"Conciliação de créditos concluída: {len(drift)} saldo(s) divergente(s)" + (" corrigido(s)" if fix and drift else ""))
+    return len(drift)
+
+
+async def _main(fix: bool) -> int:
+    try:
+        return await reconcile(fix)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Conciliação dos saldos de créditos com o livro-razão")
+    parser.add_argument("--dry-run", action="store_true", help="só lista as divergências, sem corrigir")
+    args = parser.parse_args()
+    configure_logging()
+    asyncio.run(_main(not args.dry_run))
@@ -0,0 +1,77 @@
+import asyncio
+import logging
+import os
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+from cachetools import LRUCache
+from dotenv import load_dotenv
+from models.enums import TipoParametro
+from utils.file_payload import FilePayload
+from utils.metrics import LLM_FILE_EXTRACTIONS
+from utils.process_pool import get_process_pool, shutdown_process_pool
+from utils.single_flight import SingleFlight
+from utils.text_extraction import EXTRACTABLE_TYPES, extract_text
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+class DocumentExtractor:
+    """
+    Extrai localmente o texto de planilhas, DOCX, CSV e TXT para enviá-lo ao LLM como
+    texto em vez do arquivo nativo (mais barato em tokens e aceito por todos os provedores).
+    A extração roda num pool de processos e é cacheada pelo SHA-256 do conteúdo, num LRU
+    limitado pelo total de caracteres (EXTRACTION_CACHE_MAX_CHARS); textos maiores que o
+    próprio limite não são cacheados. Textos acima de EXTRACTION_MAX_CHARS ficam com o
+    envio nativo.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("EXTRACTION_ENABLED", "true").lower() == "true"
+        self.max_chars = int(os.getenv("EXTRACTION_MAX_CHARS", "400000"))
+        # Falhas (None) ocupam 1 para continuarem cacheadas
+        self._cache = LRUCache(
+            maxsize=int(os.getenv("EXTRACTION_CACHE_MAX_CHARS", str(20_000_000))),
+            getsizeof=lambda text: len(text) if text else 1,
+        )
+        self._single_flight = SingleFlight()
+
+    def supports(self, tipo_arquivo: TipoParametro) -> bool:
+        return self.enabled and tipo_arquivo in EXTRACTABLE_TYPES
+
+    async def extract(self, file: FilePayload, tipo_arquivo: TipoParametro, max_chars: Optional[int] = None) -> Optional[str]:
+        """Texto do arquivo, ou None quando o envio nativo deve ser mantido; max_chars substitui EXTRACTION_MAX_CHARS (0 = sem limite)"""
+        if not self.supports(tipo_arquivo):
+            return None
+
+        key = f"{int(tipo_arquivo)}:{await file.sha256()}"
+        if key in self._cache:
+            text = self._cache[key]
+            LLM_FILE_EXTRACTIONS.labels(tipo=tipo_arquivo.name, result="cached").inc()
+        else:
+            text = await self._single_flight.do(key, lambda: self._extract(key, file, tipo_arquivo))
+
+        limit = self.max_chars if max_chars is None else max_chars
+        if not text or (limit and len(text) > limit):
+            LLM_FILE_EXTRACTIONS.labels(tipo=tipo_arquivo.name, result="native").inc()
+            return None
+        return text
+
+    async def _extract(self, key: str, file: FilePayload, tipo_arquivo: TipoParametro) -> Optional[str]:
+        file_bytes = await file.read_bytes()
+        loop = asyncio.get_running_loop()
+        try:
+            text = await loop.run_in_executor(get_process_pool(), extract_text, file_bytes, tipo_arquivo)
+        except BrokenProcessPool as e:
+            logger.error(f"Pool de extração quebrado, será recriado: {e}")
+            shutdown_process_pool()
+            return None
+        except Exception as e:
+            # Arquivo corrompido ou num formato diferente da extensão: o provedor tenta o nativo
+            logger.warning(f"Falha ao extrair texto do arquivo {tipo_arquivo.name}: {e}")
+            text = None
+        else:
+            LLM_FILE_EXTRACTIONS.labels(tipo=tipo_arquivo.name, result="extracted").inc()
+        if self._cache.getsizeof(text) <= self._cache.maxsize:
+            self._cache[key] = text
+        return text
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import os
+from typing import List, Optional
+from fastapi import HTTPException
+from models.enums import TipoPrompt
+from models.llm_models import LLMResult
+from models.prompt_models import FilledParameter
+from service.provider_registry import LLMProvider, ProviderRegistry
+from utils.deadline import Deadline
+
+logger = logging.getLogger(__name__)
+
+
+class HedgePolicy:
+    """
+    Política opcional de failover com requisições "hedged".
+
+    O provedor pedido é chamado primeiro. Se ele falhar, o próximo provedor da ordem de
+    failover é chamado imediatamente; se ele demorar mais que o p95 recente do tipo de prompt
+    (LLM_HEDGE_PERCENTILE, limitado por LLM_HEDGE_MIN_DELAY_MS), uma segunda chamada é
+    disparada em paralelo. A primeira resposta bem-sucedida vence e as demais são canceladas.
+    Tudo isso limitado pelo orçamento de latência da requisição.
+    """
+
+    def __init__(self, registry: ProviderRegistry):
+        self.registry = registry
+        self.order = [int(llm) for llm in os.getenv("LLM_FAILOVER_ORDER", "3,2,1").split(",") if llm.strip()]
+        self.percentile = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+        self.min_delay = float(os.getenv("LLM_HEDGE_MIN_DELAY_MS", "2000")) / 1000
+        self.default_delay = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY_MS", "15000")) / 1000
+        self.default_budget_ms = int(os.getenv("LLM_FAILOVER_BUDGET_MS", "0"))
+        self.max_attempts = int(os.getenv("LLM_FAILOVER_MAX_ATTEMPTS", "2"))
+
+    def candidates(self, llm_id: int, tipo: TipoPrompt) -> List[LLMProvider]:
+        """Provedor pedido seguido dos demais, na ordem de failover, que suportam o tipo"""
+        primary = self.registry.get(llm_id)
+        ordered = [primary]
+        for other_id in self.order:
+            if other_id == int(primary.llm):
+                continue
+            try:
+                other = self.registry.get(other_id)
+            except HTTPException:
+                continue
+            if other.supports(tipo):
+                ordered.append(other)
+        return ordered[:self.max_attempts]
+
+    def hedge_delay(self, provider: LLMProvider, tipo: TipoPrompt) -> float:
+        observed = provider.latency_percentile(tipo, self.percentile)
+        if observed is None:
+            return self.default_delay
+        return max(self.min_delay, observed)
+
+    async def run(
+            self,
+            tipo: TipoPrompt,
+            llm_id: int,
+            prompt_text: str,
+            file_param: Optional[FilledParameter] = None,
+            latency_budget_ms: Optional[int] = None,
+            request_deadline: Optional[Deadline] = None,
+        ) -> LLMResult:
+        loop = asyncio.get_running_loop()
+        budget_ms = latency_budget_ms or self.default_budget_ms
+        deadline = loop.time() + budget_ms / 1000 if budget_ms else None
+        if request_deadline is not None:
+            request_ends_at = loop.time() + request_deadline.remaining()
+            deadline = request_ends_at if deadline is None else min(deadline, request_ends_at)
+
+        waiting = self.candidates(llm_id, tipo)
+        running = {}
+        last_error: Optional[BaseException] = None
+
+        def launch():
+            provider = waiting.pop(0)
+            task = asyncio.create_task(provider.generate(tipo, prompt_text, file_param, request_deadline))
+            # Perdedores cancelados podem terminar com erro depois; evita avisos de exceção não lida
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            running[task] = provider
+            return provider
+
+        next_hedge_at = loop.time() + self.hedge_delay(launch(), tipo)
+        try:
+            while running:
+                wake_at = next_hedge_at if waiting else None
+                if deadline is not None:
+                    wake_at = deadline if wake_at is None else min(wake_at, deadline)
+                timeout = max(0, wake_at - loop.time()) if wake_at is not None else None
+
+                done, _ = await asyncio.wait(running.keys(), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    provider = running.pop(task)
+                    if task.exception() is None:
+                        if int(provider.llm) != int(llm_id):
+                            logger.warning(f"Failover: resposta entregue por {provider.name} em vez do LLM {llm_id}")
+                        return task.result()
+                    last_error = task.exception()
+                    logger.warning(f"Failover: {provider.name} falhou ({last_error}); tentando próximo provedor")
+                    if waiting:
+                        next_hedge_at = loop.time() + self.hedge_delay(launch(), tipo)
+
+                if deadline is not None and loop.time() >= deadline:
+                    raise HTTPException(status_code=504, detail="Orçamento de latência da requisição esgotado.")
+                if waiting and loop.time() >= next_hedge_at:
+                    provider = launch()
+                    logger.info(f"Hedge: disparando requisição paralela para {provider.name}")
+                    next_hedge_at = loop.time() + self.hedge_delay(provider, tipo)
+        finally:
+            for task in running:
+                task.cancel()
+
+        if isinstance(last_error, HTTPException):
+            raise last_error
+        raise HTTPException(status_code=502, detail="Nenhum provedor de LLM conseguiu responder.")
@@ -0,0 +1,78 @@
+import asyncio
+import logging
+import os
+from concurrent.futures.process import BrokenProcessPool
+from typing import Tuple
+from cachetools import LRUCache
+from dotenv import load_dotenv
+from utils.file_payload import FilePayload
+from utils.image_processing import detect_image_mime, normalize_image
+from utils.process_pool import get_process_pool, shutdown_process_pool
+from utils.single_flight import SingleFlight
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Resolução efetiva de cada provedor: acima disso a imagem é reduzida do lado deles
+# (OpenAI: cabe em 2048x2048 e lado menor 768; Claude: ~1568 no lado maior; Gemini: 3072)
+DEFAULT_MAX_EDGES = {
+    "OPENAI": (2048, 768),
+    "ANTHROPIC": (1568, 0),
+    "GEMINI": (3072, 0),
+}
+
+
+class ImageNormalizer:
+    """
+    Reduz e recodifica imagens (TipoParametro.IMAGEM) para a resolução máxima efetiva de cada
+    provedor antes do envio, no pool de processos, e detecta o MIME real. Resultados são
+    cacheados pelo SHA-256 do original e pelos limites do provedor.
+    Configurável via IMAGE_NORMALIZATION_ENABLED, IMAGE_JPEG_QUALITY,
+    <P>_IMAGE_MAX_EDGE e <P>_IMAGE_MAX_SHORT_EDGE.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("IMAGE_NORMALIZATION_ENABLED", "true").lower() == "true"
+        self.quality = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+        self._cache = LRUCache(maxsize=int(os.getenv("IMAGE_CACHE_MAX_ITEMS", "64")))
+        self._single_flight = SingleFlight()
+
+    def limits(self, provider: str):
+        max_edge, max_short_edge = DEFAULT_MAX_EDGES.get(provider, (2048, 0))
+        return (
+            int(os.getenv(f"{provider}_IMAGE_MAX_EDGE", str(max_edge))),
+            int(os.getenv(f"{provider}_IMAGE_MAX_SHORT_EDGE", str(max_short_edge))),
+        )
+
+    async def normalize(self, file: FilePayload, provider: str) -> FilePayload:
+        """Imagem pronta para o provedor, com mime_type preenchido"""
+        if not self.enabled:
+            file_bytes = await file.read_bytes()
+            return FilePayload.from_bytes(file_bytes, file.filename, detect_image_mime(file_bytes) or "image/jpeg")
+
+        max_edge, max_short_edge = self.limits(provider)
+        key = f"{await file.sha256()}:{max_edge}:{max_short_edge}:{self.quality}"
+        normalized = self._cache.get(key)
+        if normalized is None:
+            normalized = await self._single_flight.do(key, lambda: self._normalize(key, file, max_edge, max_short_edge))
+        file_bytes, mime_type = normalized
+        return FilePayload.from_bytes(file_bytes, file.filename, mime_type)
+
+    async def _normalize(self, key: str, file: FilePayload, max_edge: int, max_short_edge: int) -> Tuple[bytes, str]:
+        file_bytes = await file.read_bytes()
+        loop = asyncio.get_running_loop()
+        try:
+            normalized = await loop.run_in_executor(
+                get_process_pool(), normalize_image, file_bytes, max_edge, max_short_edge, self.quality
+            )
+        except BrokenProcessPool as e:
+            logger.error(f"Pool de processos quebrado, será recriado: {e}")
+            shutdown_process_pool()
+            return file_bytes, detect_image_mime(file_bytes) or "image/jpeg"
+        except Exception as e:
+            # Formato que o Pillow não abre (ex.: HEIC): segue o original para o provedor decidir
+            logger.warning(f"Não foi possível normalizar a imagem: {e}")
+            normalized = (file_bytes, detect_image_mime(file_bytes) or "image/jpeg")
+        self._cache[key] = normalized
+        return normalized
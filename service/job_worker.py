@@ -0,0 +1,161 @@
+import asyncio
+import binascii
+import logging
+import os
+import socket
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from database.job_repo import JobRepository
+from models.prompt_models import AIResponse, PromptRequest
+from service.ai_service_new import AIService
+from utils.deadline import Deadline
+from utils.file_payload import FilePayload, get_file_payload
+from utils.logging_config import configure_logging
+from utils.redaction import FILE_TYPES
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Erros do cliente (prompt inexistente, sem créditos, arquivo inválido...) não melhoram com nova tentativa
+_RETRYABLE_CLIENT_STATUS = {408, 429}
+
+# Chave que, no valor de um parâmetro de arquivo gravado no job, aponta para aux.llm_job_files
+JOB_FILE_KEY = "job_file"
+
+
+def _file_ref(value: Any) -> str:
+    return value.get(JOB_FILE_KEY) if isinstance(value, dict) else None
+
+
+class JobWorker:
+    """
+    Pool de workers que consome aux.llm_jobs e executa cada job com AIService.route_ai.
+
+    Por padrão roda dentro do processo da API (LLM_JOB_WORKERS, 1 worker); com
+    LLM_JOB_WORKERS=0 a fila fica só para processos separados `python -m service.job_worker`,
+    para escalar workers independentemente dos processos web.
+    """
+
+    def __init__(self, ai_service: AIService, repo: JobRepository = None):
+        self.ai_service = ai_service
+        self.repo = repo or JobRepository()
+        self.concurrency = int(os.getenv("LLM_JOB_WORKERS", "1"))
+        self.poll_interval = float(os.getenv("LLM_JOB_POLL_SECONDS", "2"))
+        self.visibility_timeout = float(os.getenv("LLM_JOB_VISIBILITY_SECONDS", "900"))
+        self.max_attempts = int(os.getenv("LLM_JOB_MAX_ATTEMPTS", "3"))
+        self.retry_base_delay = float(os.getenv("LLM_JOB_RETRY_BASE_SECONDS", "30"))
+        self._tasks: List[asyncio.Task] = []
+
+    async def enqueue(self, user_id: str, req: PromptRequest) -> str:
+        """
+        Enfileira a requisição. Arquivos não vão para o JSONB do job: cada um é gravado uma
+        vez, pelo sha256 do conteúdo, e o parâmetro guarda só a referência.
+        """
+        request = req.model_dump(mode="json")
+        files = {}
+        for param, stored in zip(req.parameters, request["parameters"]):
+            if param.tipo in FILE_TYPES and param.valor:
+                file = get_file_payload(param)
+                try:
+                    content = await file.read_bytes()
+                except binascii.Error:
+                    raise HTTPException(status_code=400, detail=f"Arquivo do parâmetro {param.titulo} não é um base64 válido.")
+                file_sha256 = await file.sha256()
+                files[file_sha256] = content
+                stored["valor"] = {JOB_FILE_KEY: file_sha256}
+        return await self.repo.enqueue(user_id, request, self.max_attempts, files)
+
+    async def _load_request(self, request: Dict[str, Any]) -> PromptRequest:
+        """Reconstrói a PromptRequest do job, trocando as referências pelos arquivos gravados"""
+        req = PromptRequest(**request)
+        refs = [_file_ref(param.valor) for param in req.parameters if _file_ref(param.valor)]
+        files = await self.repo.get_files(refs)
+        for param in req.parameters:
+            ref = _file_ref(param.valor)
+            if ref is None:
+                continue
+            if ref not in files:
+                raise HTTPException(status_code=410, detail=f"Arquivo do parâmetro {param.titulo} não está mais disponível.")
+            param.valor = FilePayload.from_bytes(files[ref])
+        return req
+
+    def start(self, concurrency: int = None) -> None:
+        concurrency = self.concurrency if concurrency is None else concurrency
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        for i in range(concurrency):
+            self._tasks.append(asyncio.create_task(self._run(f"{prefix}:{i}")))
+        if concurrency:
+            logger.info(f"{concurrency} worker(s) de jobs de LLM iniciados")
+
+    async def stop(self) -> None:
+        """Interrompe os workers; jobs em andamento voltam à fila quando a reserva expirar"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def _run(self, worker_id: str) -> None:
+        while True:
+            try:
+                job = await self.repo.claim(worker_id, self.visibility_timeout)
+                if job is None:
+                    await self.repo.fail_abandoned()
+                    await self.repo.purge_files(self.visibility_timeout)
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+                await self._process(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Erro no worker de jobs {worker_id}: {e}", exc_info=True)
+                await asyncio.sleep(self.poll_interval)
+
+    async def _process(self, job: Dict[str, Any]) -> None:
+        job_id, attempts = job["id"], job["attempts"]
+        completed = False
+
+        async def complete(response: AIResponse) -> bool:
+            # Só cobra se este worker ainda detém o job; senão quem o reassumiu é que cobra
+            nonlocal completed
+            completed = await self.repo.complete(job_id, attempts, response.model_dump())
+            return completed
+
+        try:
+            req = await self._load_request(job["request"])
+            # O prazo da reserva é o prazo do job: depois dele outro worker pode assumi-lo
+            await self.ai_service.route_ai(req, job["user_id"], Deadline(self.visibility_timeout), complete)
+        except Exception as e:
+            # 402 (reserva de créditos recusada agora, na execução) encerra o job sem repetir
+            retryable = not isinstance(e, HTTPException) or e.status_code >= 500 or e.status_code in _RETRYABLE_CLIENT_STATUS
+            error = e.detail if isinstance(e, HTTPException) else str(e)
+            retry_at = None
+            if retryable and attempts < job["max_attempts"]:
+                retry_at = datetime.now(timezone.utc) + timedelta(seconds=self.retry_base_delay * 2 ** (attempts - 1))
+            logger.warning(f"Job {job_id} falhou na tentativa {attempts}: {error}" + (" (será repetido)" if retry_at else ""))
+            await self.repo.fail(job_id, attempts, error, retry_at)
+            return
+
+        if not completed:
+            logger.warning(f"Job {job_id} concluído após perder a reserva; resultado descartado sem cobrança")
+
+
+async def _main() -> None:
+    worker = JobWorker(AIService())
+    worker.start(worker.concurrency or 1)
+    worker.ai_service.start()
+    try:
+        await asyncio.gather(*worker._tasks)
+    finally:
+        await worker.stop()
+        await worker.ai_service.close()
+
+
+if __name__ == "__main__":
+    configure_logging()
+    try:
+        asyncio.run(_main())
+    except KeyboardInterrupt:
+        print("Workers interrompidos pelo usuário.")
@@ -0,0 +1,169 @@
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, List, Tuple
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from models.llm_models import LLMResult
+from models.prompt_models import MapReduceStats
+
+load_dotenv()
+
+# Estimativa conservadora para texto em português; evita depender de um tokenizer por provedor
+CHARS_PER_TOKEN = 4
+
+# Recebe o texto do prompt e devolve o resultado e se ele veio do cache
+LLMCall = Callable[[str], Awaitable[Tuple[LLMResult, bool]]]
+
+
+def split_chunks(text: str, max_chars: int) -> List[str]:
+    """Divide o texto em partes de até max_chars, quebrando em fim de linha sempre que possível"""
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for line in text.splitlines(keepends=True):
+        while len(line) > max_chars:
+            # Linha maior que uma parte inteira (TXT sem quebras): corta no tamanho máximo
+            if current:
+                chunks.append("".join(current))
+                current, size = [], 0
+            chunks.append(line[:max_chars])
+            line = line[max_chars:]
+        if size + len(line) > max_chars and current:
+            chunks.append("".join(current))
+            current, size = [], 0
+        current.append(line)
+        size += len(line)
+    if current:
+        chunks.append("".join(current))
+    return [chunk for chunk in chunks if chunk.strip()]
+
+
+def map_prompt(prompt_text: str, filename: str, chunk: str, index: int, total: int) -> str:
+    return (
+        f"{prompt_text}\n\n"
+        f"O arquivo {filename} é grande demais para uma única chamada e foi dividido em {total} partes. "
+        f"Responda à instrução acima considerando apenas a parte {index} abaixo; "
+        f"as respostas de todas as partes serão combinadas depois.\n\n"
+        f"Conteúdo do arquivo {filename} (parte {index} de {total}):\n{chunk}"
+    )
+
+
+def reduce_prompt(prompt_text: str, filename: str, partials: List[str]) -> str:
+    answers = "\n\n".join(f"Resposta parcial {i}:\n{partial}" for i, partial in enumerate(partials, start=1))
+    return (
+        f"{prompt_text}\n\n"
+        f"O arquivo {filename} foi processado em partes e abaixo estão as respostas parciais, "
+        f"na ordem em que as partes aparecem no arquivo. Combine-as numa única resposta para a "
+        f"instrução acima, sem repetir informações e sem mencionar a divisão em partes.\n\n{answers}"
+    )
+
+
+class MapReduce:
+    """
+    Processa documentos maiores que a janela de contexto: o texto extraído é dividido em
+    partes de até LLM_CHUNK_MAX_TOKENS, o prompt roda sobre cada parte em paralelo (até
+    LLM_CHUNK_CONCURRENCY chamadas simultâneas) e as respostas parciais são combinadas numa
+    chamada final. Se as parciais não couberem numa única chamada, a combinação é feita em
+    níveis. As chamadas ao LLM são feitas por quem usa a classe (cache, failover, prazos).
+    """
+
+    def __init__(self):
+        self.max_tokens = int(os.getenv("LLM_CHUNK_MAX_TOKENS", "24000"))
+        self.concurrency = int(os.getenv("LLM_CHUNK_CONCURRENCY", "4"))
+        self.max_chunks = int(os.getenv("LLM_CHUNK_MAX_CHUNKS", "40"))
+
+    @property
+    def max_chars(self) -> int:
+        return self.max_tokens * CHARS_PER_TOKEN
+
+    @property
+    def max_document_chars(self) -> int:
+        return self.max_chars * self.max_chunks
+
+    def split(self, text: str) -> List[str]:
+        chunks = split_chunks(text, self.max_chars)
+        if len(chunks) > self.max_chunks:
+            raise HTTPException(
+                status_code=413,
+                detail=f"O documento excede o limite de {self.max_chunks} partes de {self.max_tokens} tokens.",
+            )
+        return chunks
+
+    @staticmethod
+    def max_calls(chunks: int) -> int:
+        """Limite superior de chamadas: uma por parte e, no pior caso, uma combinação a cada par"""
+        return max(1, 2 * chunks - 1)
+
+    async def run(self, call: LLMCall, prompt_text: str, filename: str, chunks: List[str]) -> Tuple[LLMResult, MapReduceStats, List[bool]]:
+        """Retorna o resultado combinado, as estatísticas e, por chamada feita, se ela veio do cache"""
+        results: List[LLMResult] = []
+        cached_flags: List[bool] = []
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(text: str) -> LLMResult:
+            async with semaphore:
+                result, cached = await call(text)
+            results.append(result)
+            cached_flags.append(cached)
+            return result
+
+        start = time.perf_counter()
+        if len(chunks) == 1:
+            # Cabe numa chamada só: nada a combinar
+            final = await bounded(map_prompt(prompt_text, filename, chunks[0], 1, 1))
+            map_ms, reduce_ms = int((time.perf_counter() - start) * 1000), 0
+        else:
+            partials = await asyncio.gather(*(
+                bounded(map_prompt(prompt_text, filename, chunk, i, len(chunks)))
+                for i, chunk in enumerate(chunks, start=1)
+            ))
+            map_ms = int((time.perf_counter() - start) * 1000)
+
+            reduce_start = time.perf_counter()
+            final = await self._reduce(bounded, prompt_text, filename, [p.text for p in partials])
+            reduce_ms = int((time.perf_counter() - reduce_start) * 1000)
+
+        combined = LLMResult(
+            text=final.text,
+            model=final.model,
+            input_tokens=sum(r.input_tokens for r in results),
+            output_tokens=sum(r.output_tokens for r in results),
+            llm_id=final.llm_id,
+        )
+        stats = MapReduceStats(
+            chunks=len(chunks),
+            llm_calls=len(results),
+            extract_ms=0,
+            map_ms=map_ms,
+            reduce_ms=reduce_ms,
+            input_tokens=combined.input_tokens,
+            output_tokens=combined.output_tokens,
+        )
+        return combined, stats, cached_flags
+
+    async def _reduce(self, call: Callable[[str], Awaitable[LLMResult]], prompt_text: str, filename: str, partials: List[str]) -> LLMResult:
+        while True:
+            groups = self._group(partials)
+            if len(groups) == 1:
+                return await call(reduce_prompt(prompt_text, filename, groups[0]))
+            reduced = await asyncio.gather(*(call(reduce_prompt(prompt_text, filename, group)) for group in groups))
+            partials = [r.text for r in reduced]
+
+    def _group(self, partials: List[str]) -> List[List[str]]:
+        """Agrupa parciais consecutivas que cabem numa chamada; cada grupo tem ao menos duas para garantir progresso"""
+        groups: List[List[str]] = []
+        current: List[str] = []
+        size = 0
+        for partial in partials:
+            if len(current) >= 2 and size + len(partial) > self.max_chars:
+                groups.append(current)
+                current, size = [], 0
+            current.append(partial)
+            size += len(partial)
+        if current:
+            if len(current) == 1 and groups:
+                groups[-1].append(current[0])
+            else:
+                groups.append(current)
+        return groups
@@ -0,0 +1,333 @@
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+from fastapi import HTTPException
+from managers import gemini_mgr, chatgpt_mgr, claude_mgr
+from models.enums import LLM, TipoParametro, TipoPrompt
+from models.llm_models import LLMResult
+from models.prompt_models import FilledParameter
+from utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from utils.concurrency_limiter import AdaptiveLimiter
+from utils.deadline import Deadline
+from service.image_normalizer import ImageNormalizer
+from utils.file_payload import FilePayload, get_file_payload
+from utils.metrics import LLM_CALLS, LLM_CIRCUIT_STATE, LLM_CONCURRENCY_LIMIT, LLM_IN_FLIGHT, LLM_REJECTIONS, LLM_REQUEST_SECONDS, LLM_RETRIES, LLM_TOKENS
+from utils.retry import RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+image_normalizer = ImageNormalizer()
+
+CIRCUIT_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+def _error_status(error: BaseException) -> Optional[int]:
+    # openai/anthropic expõem status_code; google.api_core expõe code
+    for attr in ("status_code", "code"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def is_upstream_failure(error: BaseException) -> bool:
+    """Falha do provedor (rede, timeout, 429, 5xx), e não erro da própria requisição (4xx)"""
+    status = _error_status(error)
+    return status is None or status == 429 or status >= 500
+
+
+def is_overload(error: BaseException) -> bool:
+    return isinstance(error, asyncio.TimeoutError) or _error_status(error) == 429
+
+
+class LLMProvider:
+    """
+    Um provedor de LLM plugável. O `mgr` é qualquer objeto (normalmente um módulo de managers/)
+    que expõe as coroutines process, process_file e process_web_search e os geradores
+    assíncronos stream, stream_file e stream_web_search.
+    Cada provedor tem seus próprios modelos, limite de concorrência adaptativo, circuit breaker
+    por modelo e timeout, configuráveis por variáveis de ambiente com o prefixo informado
+    (ex.: OPENAI_TIMEOUT). Chamadas rejeitadas pelo limite ou pelo circuito falham na hora
+    com 503 e Retry-After.
+    """
+
+    def __init__(self, llm: LLM, name: str, env_prefix: str, mgr, models: Dict[TipoPrompt, str]):
+        self.llm = llm
+        self.name = name
+        self.env_prefix = env_prefix
+        self.mgr = mgr
+        self.models = {
+            tipo: os.getenv(f"{env_prefix}_{tipo.name}_MODEL", model)
+            for tipo, model in models.items()
+        }
+        self.timeout = float(os.getenv(f"{env_prefix}_TIMEOUT", "180"))
+        self.max_concurrency = int(os.getenv(f"{env_prefix}_MAX_CONCURRENCY", "100"))
+        self.limiter = AdaptiveLimiter(
+            initial_limit=min(self.max_concurrency, int(os.getenv(f"{env_prefix}_INITIAL_CONCURRENCY", "50"))),
+            max_limit=self.max_concurrency,
+        )
+        self._breaker_config = dict(
+            window=int(os.getenv(f"{env_prefix}_CB_WINDOW", "20")),
+            failure_rate=float(os.getenv(f"{env_prefix}_CB_FAILURE_RATE", "0.5")),
+            slow_call_seconds=float(os.getenv(f"{env_prefix}_CB_SLOW_CALL_SECONDS", "60")),
+            open_seconds=float(os.getenv(f"{env_prefix}_CB_OPEN_SECONDS", "30")),
+        )
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self.retry_policy = RetryPolicy()
+        self._latencies = {tipo: deque(maxlen=200) for tipo in TipoPrompt}
+        self._handlers = {
+            TipoPrompt.TEXTO: self._text,
+            TipoPrompt.ARQUIVO: self._file,
+            TipoPrompt.BUSCA: self._web_search,
+        }
+        self._stream_handlers = {
+            TipoPrompt.TEXTO: self._stream_text,
+            TipoPrompt.ARQUIVO: self._stream_file,
+            TipoPrompt.BUSCA: self._stream_web_search,
+        }
+
+    def supports(self, tipo: TipoPrompt) -> bool:
+        return tipo in self.models
+
+    def model_for(self, tipo: TipoPrompt) -> str:
+        return self.models[tipo]
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        if model not in self._breakers:
+            self._breakers[model] = CircuitBreaker(**self._breaker_config)
+        return self._breakers[model]
+
+    def _publish_state(self, model: str) -> None:
+        LLM_CIRCUIT_STATE.labels(provider=self.name, model=model).set(CIRCUIT_STATE_VALUES[self.breaker(model).state])
+        LLM_CONCURRENCY_LIMIT.labels(provider=self.name).set(int(self.limiter.limit))
+
+    def _record_tokens(self, model: str, result: LLMResult) -> None:
+        LLM_TOKENS.labels(provider=self.name, model=model, direction="input").inc(result.input_tokens)
+        LLM_TOKENS.labels(provider=self.name, model=model, direction="output").inc(result.output_tokens)
+
+    def _circuit_open(self, model: str) -> HTTPException:
+        self._publish_state(model)
+        LLM_REJECTIONS.labels(provider=self.name, reason="circuit_open").inc()
+        return HTTPException(
+            status_code=503,
+            detail=f"{self.name} temporariamente indisponível. Tente novamente mais tarde.",
+            headers={"Retry-After": str(math.ceil(self.breaker(model).retry_after()))},
+        )
+
+    def _overloaded(self) -> HTTPException:
+        LLM_REJECTIONS.labels(provider=self.name, reason="concurrency_limit").inc()
+        return HTTPException(
+            status_code=503,
+            detail=f"{self.name} sobrecarregado no momento. Tente novamente em instantes.",
+            headers={"Retry-After": "1"},
+        )
+
+    def check_available(self, model: str) -> None:
+        """503 na hora se o circuito ou o limite de concorrência rejeitariam uma chamada agora"""
+        if not self.breaker(model).would_admit():
+            raise self._circuit_open(model)
+        if not self.limiter.has_capacity():
+            raise self._overloaded()
+
+    @asynccontextmanager
+    async def _guard(self, model: str, tipo: TipoPrompt):
+        """Aplica circuit breaker e limite adaptativo em volta de uma chamada ao provedor"""
+        breaker = self.breaker(model)
+        permit = breaker.try_acquire()
+        if permit is None:
+            raise self._circuit_open(model)
+        if not self.limiter.try_acquire():
+            breaker.release(permit, None, 0)
+            raise self._overloaded()
+
+        start = time.monotonic()
+        success, overloaded, outcome = None, False, "cancelled"
+        LLM_IN_FLIGHT.labels(provider=self.name).inc()
+        try:
+            yield
+            success, outcome = True, "ok"
+        except Exception as e:
+            success = not is_upstream_failure(e)
+            overloaded = is_overload(e)
+            outcome = type(e).__name__
+            raise
+        finally:
+            latency = time.monotonic() - start
+            LLM_IN_FLIGHT.labels(provider=self.name).dec()
+            LLM_REQUEST_SECONDS.labels(provider=self.name, model=model, tipo=tipo.name).observe(latency)
+            LLM_CALLS.labels(provider=self.name, model=model, result=outcome).inc()
+            breaker.release(permit, success, latency)
+            self.limiter.release(latency if success is not None else None, overloaded)
+            self._publish_state(model)
+
+    def latency_percentile(self, tipo: TipoPrompt, percentile: float) -> Optional[float]:
+        """Percentil (em segundos) das últimas chamadas bem-sucedidas deste tipo, ou None sem amostras"""
+        samples = sorted(self._latencies[tipo])
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(len(samples) * percentile / 100))
+        return samples[index]
+
+    async def _text(self, prompt_text: str, model: str, file_param: Optional[FilledParameter]) -> LLMResult:
+        return await self.mgr.process(prompt_text, model=model)
+
+    async def _file_payload(self, file_param: FilledParameter) -> FilePayload:
+        """Conteúdo do arquivo a enviar; imagens são reduzidas para a resolução efetiva do provedor"""
+        file = get_file_payload(file_param)
+        if file_param.tipo == TipoParametro.IMAGEM:
+            file = await image_normalizer.normalize(file, self.env_prefix)
+        return file
+
+    async def _file(self, prompt_text: str, model: str, file_param: Optional[FilledParameter]) -> LLMResult:
+        return await self.mgr.process_file(await self._file_payload(file_param), prompt_text, file_param.tipo, model=model)
+
+    async def _web_search(self, prompt_text: str, model: str, file_param: Optional[FilledParameter]) -> LLMResult:
+        return await self.mgr.process_web_search(prompt_text, model=model)
+
+    def _stream_text(self, prompt_text: str, model: str, file_param: Optional[FilledParameter], result: LLMResult) -> AsyncIterator[str]:
+        return self.mgr.stream(prompt_text, model, result)
+
+    async def _stream_file(self, prompt_text: str, model: str, file_param: Optional[FilledParameter], result: LLMResult) -> AsyncIterator[str]:
+        file = await self._file_payload(file_param)
+        async for delta in self.mgr.stream_file(file, prompt_text, file_param.tipo, model, result):
+            yield delta
+
+    def _stream_web_search(self, prompt_text: str, model: str, file_param: Optional[FilledParameter], result: LLMResult) -> AsyncIterator[str]:
+        return self.mgr.stream_web_search(prompt_text, model, result)
+
+    def check_supported(self, tipo: TipoPrompt) -> None:
+        if not self.supports(tipo):
+            raise HTTPException(status_code=400, detail=f"{self.name} não suporta prompts do tipo {tipo.name}.")
+
+    def _http_error(self, tipo: TipoPrompt, model: str, error: Exception) -> HTTPException:
+        if isinstance(error, HTTPException):
+            return error
+        if isinstance(error, asyncio.TimeoutError):
+            logger.error(f"Timeout de {self.timeout}s ao processar prompt {tipo.name} com {self.name} ({model})")
+            return HTTPException(status_code=504, detail=f"Tempo limite excedido aguardando resposta do {self.name}.")
+        logger.error(f"Erro ao processar prompt {tipo.name} com {self.name} ({model}): {error}")
+        return HTTPException(status_code=500, detail=f"Erro no processamento com {self.name}: {str(error)}")
+
+    def _on_retry(self, error: BaseException) -> None:
+        logger.warning(f"Erro transitório em {self.name}, tentando novamente: {error}")
+        LLM_RETRIES.labels(provider=self.name, error=type(error).__name__).inc()
+
+    async def generate(self, tipo: TipoPrompt, prompt_text: str, file_param: Optional[FilledParameter] = None, deadline: Optional[Deadline] = None) -> LLMResult:
+        """
+        Executa o prompt respeitando circuit breaker, limite de concorrência e timeout do provedor.
+        Erros transitórios são repetidos pela RetryPolicy dentro do prazo da requisição.
+        """
+        self.check_supported(tipo)
+
+        model = self.model_for(tipo)
+
+        async def attempt() -> LLMResult:
+            timeout = self.timeout if deadline is None else min(self.timeout, deadline.remaining())
+            if timeout <= 0:
+                raise asyncio.TimeoutError()
+            async with self._guard(model, tipo):
+                start = time.monotonic()
+                result = await asyncio.wait_for(
+                    self._handlers[tipo](prompt_text, model, file_param),
+                    timeout=timeout,
+                )
+                self._latencies[tipo].append(time.monotonic() - start)
+                return result
+
+        try:
+            result = await self.retry_policy.run(attempt, deadline, self._on_retry)
+        except Exception as e:
+            raise self._http_error(tipo, model, e)
+        result.llm_id = int(self.llm)
+        self._record_tokens(model, result)
+        return result
+
+    def stream(self, tipo: TipoPrompt, prompt_text: str, result: LLMResult, file_param: Optional[FilledParameter] = None, deadline: Optional[Deadline] = None) -> AsyncIterator[str]:
+        """
+        Versão em streaming de generate: devolve os trechos de texto à medida que chegam e
+        preenche o uso de tokens em `result`. O timeout do provedor (ou o prazo da requisição,
+        se menor) limita a duração total; travamentos entre trechos são cobertos pelo timeout
+        de leitura do cliente HTTP.
+        Só há nova tentativa se a falha ocorrer antes do primeiro trecho.
+        Circuito aberto ou limite esgotado são verificados já aqui, antes de o chamador enviar
+        os cabeçalhos da resposta, para virarem 503 com Retry-After; a vaga em si só é ocupada
+        quando o gerador começa a ser consumido (um gerador nunca iniciado não a liberaria).
+        """
+        self.check_supported(tipo)
+        model = self.model_for(tipo)
+        self.check_available(model)
+        return self._stream(tipo, model, prompt_text, result, file_param, deadline)
+
+    async def _stream(self, tipo: TipoPrompt, model: str, prompt_text: str, result: LLMResult, file_param: Optional[FilledParameter], deadline: Optional[Deadline]) -> AsyncIterator[str]:
+        result.model = model
+        result.llm_id = int(self.llm)
+        loop = asyncio.get_running_loop()
+        ends_at = loop.time() + (self.timeout if deadline is None else min(self.timeout, deadline.remaining()))
+        attempt = 0
+        while True:
+            attempt += 1
+            started = False
+            try:
+                if loop.time() >= ends_at:
+                    raise asyncio.TimeoutError()
+                async with self._guard(model, tipo):
+                    async for delta in self._stream_handlers[tipo](prompt_text, model, file_param, result):
+                        if loop.time() > ends_at:
+                            raise asyncio.TimeoutError()
+                        started = True
+                        yield delta
+                self._record_tokens(model, result)
+                return
+            except Exception as e:
+                delay = None if started else self.retry_policy.next_delay(attempt, e, deadline)
+                if delay is None:
+                    raise self._http_error(tipo, model, e)
+                self._on_retry(e)
+                await asyncio.sleep(delay)
+
+
+class ProviderRegistry:
+    """Tabela de despacho LLM -> provedor; o provedor por sua vez despacha por TipoPrompt"""
+
+    def __init__(self):
+        self._providers: Dict[LLM, LLMProvider] = {}
+
+    def register(self, provider: LLMProvider) -> None:
+        self._providers[provider.llm] = provider
+
+    def get(self, llm_id: int) -> LLMProvider:
+        provider = self._providers.get(llm_id)
+        if provider is None:
+            raise HTTPException(status_code=400, detail="LLM ID inválido.")
+        return provider
+
+    def all(self) -> List[LLMProvider]:
+        return list(self._providers.values())
+
+    async def dispatch(self, tipo: TipoPrompt, llm_id: int, prompt_text: str, file_param: Optional[FilledParameter] = None, deadline: Optional[Deadline] = None) -> LLMResult:
+        return await self.get(llm_id).generate(tipo, prompt_text, file_param, deadline)
+
+
+def build_default_registry() -> ProviderRegistry:
+    registry = ProviderRegistry()
+    registry.register(LLMProvider(LLM.CHAT_GPT, "ChatGPT", "OPENAI", chatgpt_mgr, {
+        TipoPrompt.TEXTO: chatgpt_mgr.TEXT_MODEL,
+        TipoPrompt.ARQUIVO: chatgpt_mgr.MULTIMODAL_MODEL,
+        TipoPrompt.BUSCA: chatgpt_mgr.SEARCH_MODEL,
+    }))
+    registry.register(LLMProvider(LLM.CLAUDE, "Claude", "ANTHROPIC", claude_mgr, {
+        TipoPrompt.TEXTO: claude_mgr.CLAUDE4,
+        TipoPrompt.ARQUIVO: claude_mgr.CLAUDE4,
+        TipoPrompt.BUSCA: claude_mgr.CLAUDE4,
+    }))
+    registry.register(LLMProvider(LLM.GEMINI, "Gemini", "GEMINI", gemini_mgr, {
+        TipoPrompt.TEXTO: gemini_mgr.GEMINI_MODEL,
+        TipoPrompt.ARQUIVO: gemini_mgr.GEMINI_MODEL,
+        TipoPrompt.BUSCA: gemini_mgr.GEMINI_MODEL,
+    }))
+    return registry
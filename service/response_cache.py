@@ -0,0 +1,109 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from cachetools import TLRUCache
+from database.llm_cache_repo import LLMCacheRepository
+from models.enums import TipoParametro, TipoPrompt
+from models.llm_models import LLMResult
+from models.prompt_models import PromptRequest, PromptResponse
+from utils.metrics import LLM_CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTLS = {
+    TipoPrompt.TEXTO: 7 * 24 * 3600,
+    TipoPrompt.ARQUIVO: 7 * 24 * 3600,
+    TipoPrompt.BUSCA: 15 * 60,
+}
+PURGE_EVERY_WRITES = 500
+
+
+def request_fingerprint(full_prompt: PromptResponse, req: PromptRequest, model: str, prompt_text: str, file_tipo: Optional[TipoParametro] = None, file_sha256: Optional[str] = None) -> str:
+    """
+    Hash determinístico do que é enviado ao LLM: prompt montado, modelo e conteúdo do arquivo.
+    O SHA-256 do arquivo vem pronto de quem chama (calculado fora do event loop).
+    """
+    key_data = {
+        "prompt_id": full_prompt.id,
+        "tipo": int(full_prompt.tipo),
+        "llm_id": int(req.llm_id),
+        "model": model,
+        "prompt_sha256": hashlib.sha256(prompt_text.encode("utf-8")).hexdigest(),
+        "file": [int(file_tipo), file_sha256] if file_sha256 else None,
+    }
+    return hashlib.sha256(json.dumps(key_data, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Cache de respostas de LLM em dois níveis: LRU em memória (por processo) e Postgres
+    (compartilhado entre workers). A chave é o request_fingerprint, então qualquer mudança
+    no prompt do catálogo invalida as entradas.
+    TTLs por TipoPrompt configuráveis via LLM_CACHE_TTL_<TIPO> (segundos; 0 desliga).
+    """
+
+    def __init__(self, repo: LLMCacheRepository = None):
+        self.enabled = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+        self.persistent = os.getenv("LLM_CACHE_PERSISTENT", "true").lower() == "true"
+        self.hit_credit_cost = int(os.getenv("LLM_CACHE_HIT_CREDITS", "1"))
+        self.ttls = {
+            tipo: int(os.getenv(f"LLM_CACHE_TTL_{tipo.name}", ttl))
+            for tipo, ttl in DEFAULT_TTLS.items()
+        }
+        self._memory = TLRUCache(
+            maxsize=int(os.getenv("LLM_CACHE_MAX_ITEMS", "1000")),
+            ttu=lambda key, value, now: value[1],
+            timer=time.time,
+        )
+        self.repo = repo or LLMCacheRepository()
+        self._writes = 0
+
+    def stores(self, tipo: TipoPrompt) -> bool:
+        return self.enabled and self.ttls.get(tipo, 0) > 0
+
+    def is_enabled_for(self, req: PromptRequest, tipo: TipoPrompt) -> bool:
+        return req.use_cache and self.stores(tipo)
+
+    async def get(self, key: str) -> Optional[LLMResult]:
+        entry = self._memory.get(key)
+        if entry is not None:
+            LLM_CACHE_REQUESTS.labels(tier="memory", result="hit").inc()
+            return entry[0]
+        LLM_CACHE_REQUESTS.labels(tier="memory", result="miss").inc()
+
+        if not self.persistent:
+            return None
+
+        row = await self.repo.get(key)
+        if row is None:
+            LLM_CACHE_REQUESTS.labels(tier="postgres", result="miss").inc()
+            return None
+
+        LLM_CACHE_REQUESTS.labels(tier="postgres", result="hit").inc()
+        result = LLMResult(
+            text=row["llm_response"],
+            model=row["model"],
+            input_tokens=row["input_tokens"],
+            output_tokens=row["output_tokens"],
+        )
+        self._memory[key] = (result, row["expires_at"].timestamp())
+        return result
+
+    async def set(self, key: str, tipo: TipoPrompt, result: LLMResult) -> None:
+        if not self.stores(tipo) or not result.text:
+            return
+        ttl = self.ttls[tipo]
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=ttl)
+        self._memory[key] = (result, expires_at.timestamp())
+
+        if not self.persistent:
+            return
+        await self.repo.set(key, result.text, result.model, result.input_tokens, result.output_tokens, expires_at)
+        self._writes += 1
+        if self._writes % PURGE_EVERY_WRITES == 0:
+            purged = await self.repo.delete_expired()
+            logger.info(f"Cache de LLM: {purged} entradas expiradas removidas")
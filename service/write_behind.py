@@ -0,0 +1,139 @@
+import asyncio
+import functools
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from database.credits_repo import UserCreditRepository
+from database.llm_history_repo import LLMHistoryRepository
+from utils.metrics import WRITE_BEHIND_BLOCKED, WRITE_BEHIND_ITEMS, WRITE_BEHIND_QUEUE_DEPTH
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class WriteBehind:
+    """
+    Fila em memória para o registro pós-resposta: linhas de aux.llm_log e encerramento das
+    reservas de crédito. A requisição só enfileira; uma tarefa de fundo grava em lote a cada
+    LLM_WRITE_BEHIND_FLUSH_MS ou ao juntar LLM_WRITE_BEHIND_BATCH_ROWS itens (um INSERT
+    multi-linha para o histórico e um comando para todas as reservas do lote).
+
+    Garantias:
+    - Com a fila cheia (LLM_WRITE_BEHIND_QUEUE_MAX) a requisição espera por espaço: nada é
+      descartado por excesso de carga, a latência é que aumenta.
+    - close() (shutdown da aplicação ou do worker) grava tudo o que estiver na fila. Se o
+      processo morrer sem shutdown, os itens ainda não gravados (no máximo um intervalo de
+      flush) se perdem.
+    - Histórico e reservas são regravados até LLM_WRITE_BEHIND_RETRIES vezes (ambos são
+      idempotentes pelo id). Os créditos já saíram do saldo na reserva, antes da chamada ao
+      LLM: uma reserva cujo encerramento se perdeu é devolvida integralmente quando vence.
+    - Créditos não usados (falha do provedor, resposta do cache mais barata) voltam ao
+      saldo até um intervalo de flush depois da resposta.
+    - O request_id é gerado antes de enfileirar, então já vale na resposta; o item só
+      aparece no histórico após o flush.
+    """
+
+    def __init__(self, history_repo: LLMHistoryRepository = None, credits_repo: UserCreditRepository = None):
+        self.history_repo = history_repo or LLMHistoryRepository()
+        self.credits_repo = credits_repo or UserCreditRepository()
+        self.enabled = os.getenv("LLM_WRITE_BEHIND_ENABLED", "true").lower() == "true"
+        self.batch_rows = int(os.getenv("LLM_WRITE_BEHIND_BATCH_ROWS", "200"))
+        self.flush_interval = int(os.getenv("LLM_WRITE_BEHIND_FLUSH_MS", "200")) / 1000
+        self.retries = int(os.getenv("LLM_WRITE_BEHIND_RETRIES", "3"))
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=int(os.getenv("LLM_WRITE_BEHIND_QUEUE_MAX", "10000")))
+        self._batch_ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    async def log(self, entry: Dict[str, Any]) -> None:
+        """Enfileira uma linha de aux.llm_log (formato de LLMHistoryRepository.log_messages)"""
+        await self._put(("log", entry))
+
+    async def settle(self, reservation_id: str, used: int, request_id: Optional[str] = None) -> None:
+        """
+        Enfileira o encerramento de uma reserva: `used` créditos ficam, o resto volta ao saldo.
+        `request_id` liga os lançamentos do livro-razão à linha de aux.llm_log.
+        """
+        await self._put(("settle", (reservation_id, used, request_id)))
+
+    async def _put(self, item: Tuple[str, Any]) -> None:
+        if not self.enabled or self._closing:
+            await self._flush([item])
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        if self._queue.full():
+            WRITE_BEHIND_BLOCKED.inc()
+        await self._queue.put(item)
+        WRITE_BEHIND_QUEUE_DEPTH.inc()
+        if self._queue.qsize() >= self.batch_rows:
+            self._batch_ready.set()
+
+    async def close(self) -> None:
+        """Grava o que estiver na fila e encerra a tarefa de fundo"""
+        self._closing = True
+        if self._task is not None and not self._task.done():
+            await self._queue.put(_STOP)
+            self._batch_ready.set()
+            await self._task
+        # Requisições que esperavam espaço na fila cheia entram depois do _STOP
+        leftover = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not _STOP:
+                leftover.append(item)
+        if leftover:
+            WRITE_BEHIND_QUEUE_DEPTH.dec(len(leftover))
+            await self._flush(leftover)
+
+    async def _run(self) -> None:
+        while True:
+            item = await self._queue.get()
+            if item is not _STOP:
+                # Espera o intervalo de flush, ou menos se o lote encher antes
+                try:
+                    await asyncio.wait_for(self._batch_ready.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._batch_ready.clear()
+
+            batch = []
+            while item is not _STOP:
+                batch.append(item)
+                if len(batch) >= self.batch_rows or self._queue.empty():
+                    break
+                item = self._queue.get_nowait()
+
+            if batch:
+                WRITE_BEHIND_QUEUE_DEPTH.dec(len(batch))
+                await self._flush(batch)
+            if item is _STOP:
+                return
+
+    async def _flush(self, batch: List[Tuple[str, Any]]) -> None:
+        settlements: Dict[str, int] = {}
+        request_ids: Dict[str, Optional[str]] = {}
+        for kind, payload in batch:
+            if kind == "settle":
+                reservation_id, used, request_id = payload
+                settlements[reservation_id] = used
+                request_ids[reservation_id] = request_id
+        entries = [payload for kind, payload in batch if kind == "log"]
+        if settlements:
+            await self._write("settle", len(settlements), functools.partial(self.credits_repo.settle, request_ids=request_ids), settlements)
+        if entries:
+            await self._write("log", len(entries), self.history_repo.log_messages, entries)
+
+    async def _write(self, kind: str, count: int, write: Callable[[Any], Awaitable[Any]], payload: Any) -> None:
+        for attempt in range(self.retries + 1):
+            try:
+                await write(payload)
+                WRITE_BEHIND_ITEMS.labels(kind=kind, result="written").inc(count)
+                return
+            except Exception as e:
+                if attempt == self.retries:
+                    WRITE_BEHIND_ITEMS.labels(kind=kind, result="dropped").inc(count)
+                    logger.error(f"{count} item(ns) '{kind}' descartado(s) após {attempt + 1} tentativas: {e}", exc_info=True)
+                    return
+                await asyncio.sleep(0.5 * 2 ** attempt)
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Os módulos da aplicação são importados a partir da raiz do repositório (sem pacote instalado)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,55 @@
+import asyncio
+import os
+import pytest
+from fastapi import HTTPException
+
+
+class _FakeCredits:
+    def __init__(self, result=None, error=None):
+        self.result = result
+        self.error = error
+
+    async def reserve(self, user_id, amount, ttl_seconds):
+        if self.error:
+            raise self.error
+        return self.result
+
+
+@pytest.fixture
+def service(monkeypatch):
+    # Os módulos exigem a URL do banco e as chaves ao serem importados, mas _reserve não conecta
+    for name, value in [
+        ("ASYNC_PG_CONN_STR", "postgresql+asyncpg://test@localhost/test"),
+        ("OPENAI_API_KEY", "test"),
+        ("ANTHROPIC_API_KEY", "test"),
+        ("GEMINI_API_KEY", "test"),
+    ]:
+        if not os.getenv(name):
+            monkeypatch.setenv(name, value)
+    from service.ai_service_new import AIService
+
+    svc = AIService.__new__(AIService)
+    svc.reservation_ttl = 60
+    return svc
+
+
+def _reserve(svc, credits):
+    svc.credits_repo = credits
+    return asyncio.run(svc._reserve("u1", 3, "sem saldo"))
+
+
+def test_reserve_returns_the_reservation(service):
+    assert _reserve(service, _FakeCredits(result="r1")) == "r1"
+
+
+def test_reserve_without_balance_is_402(service):
+    with pytest.raises(HTTPException) as exc:
+        _reserve(service, _FakeCredits(result=None))
+    assert exc.value.status_code == 402 and exc.value.detail == "sem saldo"
+
+
+def test_reserve_database_error_is_503_with_retry_after(service):
+    with pytest.raises(HTTPException) as exc:
+        _reserve(service, _FakeCredits(error=ConnectionError("db down")))
+    assert exc.value.status_code == 503
+    assert exc.value.headers == {"Retry-After": "5"}
@@ -0,0 +1,105 @@
+import time
+from utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+def _breaker(**kwargs) -> CircuitBreaker:
+    config = dict(window=10, min_calls=4, failure_rate=0.5, slow_call_seconds=1, open_seconds=0.05, half_open_calls=2)
+    config.update(kwargs)
+    return CircuitBreaker(**config)
+
+
+def _call(breaker: CircuitBreaker, success: bool, latency: float = 0.01) -> None:
+    permit = breaker.try_acquire()
+    assert permit
+    breaker.release(permit, success, latency)
+
+
+def test_stays_closed_below_min_calls():
+    breaker = _breaker()
+    for _ in range(3):
+        _call(breaker, False)
+    assert breaker.state == CLOSED
+
+
+def test_opens_on_failure_rate_and_rejects():
+    breaker = _breaker()
+    for success in (True, False, True, False):
+        _call(breaker, success)
+    assert breaker.state == OPEN
+    assert breaker.try_acquire() is None
+    assert breaker.retry_after() >= 1.0
+
+
+def test_opens_on_slow_calls():
+    breaker = _breaker()
+    for _ in range(4):
+        _call(breaker, True, latency=2)
+    assert breaker.state == OPEN
+
+
+def test_cancelled_calls_are_not_counted():
+    breaker = _breaker()
+    for _ in range(10):
+        breaker.release(breaker.try_acquire(), None, 0)
+    assert breaker.state == CLOSED
+
+
+def test_half_open_closes_after_successful_probes():
+    breaker = _breaker()
+    for _ in range(4):
+        _call(breaker, False)
+    time.sleep(0.06)
+    first = breaker.try_acquire()
+    assert first.probe and breaker.state == HALF_OPEN
+    second = breaker.try_acquire()
+    # Só half_open_calls sondas ao mesmo tempo
+    assert breaker.try_acquire() is None
+    breaker.release(first, True, 0.01)
+    breaker.release(second, True, 0.01)
+    assert breaker.state == CLOSED
+
+
+def test_half_open_reopens_on_probe_failure():
+    breaker = _breaker()
+    for _ in range(4):
+        _call(breaker, False)
+    time.sleep(0.06)
+    _call(breaker, False)
+    assert breaker.state == OPEN
+
+
+def test_calls_admitted_before_opening_do_not_affect_half_open():
+    breaker = _breaker()
+    stale = [breaker.try_acquire() for _ in range(3)]
+    for _ in range(4):
+        _call(breaker, False)
+    time.sleep(0.06)
+    probe = breaker.try_acquire()
+    assert probe.probe and breaker.state == HALF_OPEN
+    # Chamadas liberadas com o circuito fechado terminam durante o meio-aberto
+    breaker.release(stale[0], False, 0.01)
+    breaker.release(stale[1], True, 0.01)
+    breaker.release(stale[2], None, 0)
+    assert breaker.state == HALF_OPEN
+    # A vaga de sonda continua ocupada só pela sonda de verdade
+    assert breaker.try_acquire() is not None and breaker.try_acquire() is None
+    breaker.release(probe, True, 0.01)
+    assert breaker.state == HALF_OPEN
+
+
+def test_probe_from_previous_cycle_is_ignored():
+    breaker = _breaker()
+    for _ in range(4):
+        _call(breaker, False)
+    time.sleep(0.06)
+    slow_probe = breaker.try_acquire()
+    _call(breaker, False)
+    assert breaker.state == OPEN
+    time.sleep(0.06)
+    probe = breaker.try_acquire()
+    assert probe.probe
+    breaker.release(slow_probe, False, 0.01)
+    assert breaker.state == HALF_OPEN
+    breaker.release(probe, True, 0.01)
+    _call(breaker, True)
+    assert breaker.state == CLOSED
@@ -0,0 +1,56 @@
+from utils.concurrency_limiter import AdaptiveLimiter
+
+
+def test_rejects_above_limit():
+    limiter = AdaptiveLimiter(initial_limit=2, max_limit=10)
+    assert limiter.try_acquire() and limiter.try_acquire()
+    assert not limiter.try_acquire()
+    limiter.release(None)
+    assert limiter.in_flight == 1
+    assert limiter.try_acquire()
+
+
+def test_grows_when_busy_and_capped_at_max():
+    limiter = AdaptiveLimiter(initial_limit=2, max_limit=4)
+    for _ in range(10):
+        while limiter.try_acquire():
+            pass
+        for _ in range(limiter.in_flight):
+            limiter.release(0.1)
+    assert limiter.limit == 4
+
+
+def test_does_not_grow_when_mostly_idle():
+    limiter = AdaptiveLimiter(initial_limit=10, max_limit=20)
+    for _ in range(20):
+        for _ in range(5):
+            assert limiter.try_acquire()
+        for _ in range(5):
+            limiter.release(0.1)
+    assert limiter.limit == 10
+
+
+def test_backs_off_on_overload_down_to_min():
+    limiter = AdaptiveLimiter(initial_limit=10, min_limit=2, backoff=0.5)
+    for _ in range(10):
+        assert limiter.try_acquire()
+        limiter.release(0.1, overloaded=True)
+    assert limiter.limit == 2
+
+
+def test_backs_off_when_latency_rises():
+    limiter = AdaptiveLimiter(initial_limit=10, max_limit=10, latency_tolerance=2.0)
+    for _ in range(20):
+        limiter.try_acquire()
+        limiter.release(0.1)
+    before = limiter.limit
+    limiter.try_acquire()
+    limiter.release(1.0)
+    assert limiter.limit < before
+
+
+def test_cancelled_calls_do_not_change_limit():
+    limiter = AdaptiveLimiter(initial_limit=5)
+    limiter.try_acquire()
+    limiter.release(None)
+    assert limiter.limit == 5 and limiter.in_flight == 0
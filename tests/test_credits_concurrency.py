@@ -0,0 +1,34 @@
+import argparse
+import asyncio
+import os
+import pytest
+
+# Precisa de um Postgres descartável (o mesmo do benchmarks/credits_concurrency.py)
+if not os.getenv("ASYNC_PG_CONN_STR"):
+    pytest.skip("ASYNC_PG_CONN_STR não definida", allow_module_level=True)
+
+from benchmarks.credits_concurrency import run_mode  # noqa: E402
+from database.db_config import engine  # noqa: E402
+
+
+def _run(mode: str, credits: int) -> dict:
+    args = argparse.Namespace(credits=credits, requests=300, concurrency=100, hold_ms=5, fail_rate=0.1, seed=1)
+
+    async def scenario():
+        try:
+            return await run_mode(mode, args)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(scenario())
+
+
+def test_concurrent_reservations_never_overspend():
+    result = _run("reserve", credits=50)
+    assert result["served"] <= 50
+    assert result["overspent"] == 0
+    assert result["balance"] == 50 - result["served"]
+    assert result["open_reservations"] == 0
+    assert result["ledger_ok"]
+    # Com 300 requisições para 50 créditos, o saldo tem de ter sido todo disputado
+    assert result["rejected"] > 0 and result["balance"] < 50
@@ -0,0 +1,22 @@
+import asyncio
+import io
+from utils.file_payload import FilePayload
+
+
+def test_source_is_closed_only_by_the_last_holder():
+    async def scenario():
+        closed = []
+
+        async def on_close():
+            closed.append(1)
+
+        payload = FilePayload(file=io.BytesIO(b"arquivo"), on_close=on_close)
+        payload.hold()
+        # Ex.: a chamada compartilhada do single-flight ainda lendo o arquivo
+        payload.hold()
+        await payload.release()
+        assert closed == [] and await payload.read_bytes() == b"arquivo"
+        await payload.release()
+        assert closed == [1]
+
+    asyncio.run(scenario())
@@ -0,0 +1,27 @@
+from service.map_reduce import split_chunks
+
+
+def test_short_text_is_one_chunk():
+    assert split_chunks("a\nb\n", 100) == ["a\nb\n"]
+
+
+def test_splits_on_line_boundaries():
+    text = "".join(f"linha {i}\n" for i in range(100))
+    chunks = split_chunks(text, 50)
+    assert "".join(chunks) == text
+    assert all(len(chunk) <= 50 for chunk in chunks)
+    assert all(chunk.endswith("\n") for chunk in chunks)
+
+
+def test_cuts_lines_longer_than_a_chunk():
+    text = "cabeçalho\n" + "x" * 25 + "\nfim\n"
+    chunks = split_chunks(text, 10)
+    assert "".join(chunks) == text
+    assert all(len(chunk) <= 10 for chunk in chunks)
+
+
+def test_drops_blank_chunks():
+    chunks = split_chunks("a\n" + "\n" * 30 + "b\n", 5)
+    assert all(chunk.strip() for chunk in chunks)
+    assert "".join(chunks).split() == ["a", "b"]
+    assert split_chunks("", 10) == []
@@ -0,0 +1,43 @@
+import asyncio
+import base64
+import hashlib
+import io
+from models.enums import TipoParametro
+from models.prompt_models import FilledParameter, PromptRequest
+from utils.file_payload import FilePayload
+from utils.redaction import parameters_fingerprint, redact_value
+
+
+def _request(file_value) -> PromptRequest:
+    return PromptRequest(prompt_id=1, llm_id=1, parameters=[
+        FilledParameter(titulo="tema", tipo=TipoParametro.TEXTO, valor="contratos"),
+        FilledParameter(titulo="arquivo", tipo=TipoParametro.ARQUIVO_PDF, valor=file_value),
+    ])
+
+
+def test_redact_value():
+    assert redact_value("abc", 5) == "abc"
+    assert redact_value("abcdefgh", 5) == "abcde…(+3 caracteres)"
+    assert redact_value(b"\x00" * 10, 5) == "<10 bytes>"
+    assert redact_value(42, 5) == 42
+
+
+def test_fingerprint_never_contains_file_content():
+    content = b"%PDF-1.4 conteudo secreto"
+    fingerprint, files = asyncio.run(parameters_fingerprint(_request(base64.b64encode(content).decode())))
+    assert files == [{"titulo": "arquivo", "tipo": "ARQUIVO_PDF", "sha256": hashlib.sha256(content).hexdigest(), "bytes": len(content)}]
+    assert "secreto" not in fingerprint and len(fingerprint) == 64
+
+
+def test_fingerprint_is_the_same_for_base64_and_upload():
+    content = b"mesmo arquivo"
+    from_json = asyncio.run(parameters_fingerprint(_request(base64.b64encode(content).decode())))
+    from_upload = asyncio.run(parameters_fingerprint(_request(FilePayload(file=io.BytesIO(content)))))
+    assert from_json == from_upload
+
+
+def test_fingerprint_changes_with_parameters():
+    content = base64.b64encode(b"arquivo").decode()
+    other = _request(content)
+    other.parameters[0].valor = "licitações"
+    assert asyncio.run(parameters_fingerprint(_request(content)))[0] != asyncio.run(parameters_fingerprint(other))[0]
@@ -0,0 +1,79 @@
+import asyncio
+import httpx
+import openai
+import pytest
+from fastapi import HTTPException
+from utils.deadline import Deadline
+from utils.retry import RetryPolicy, is_retryable, retry_after_seconds
+
+
+def _status_error(status: int, headers: dict = None) -> openai.APIStatusError:
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(status, headers=headers or {}, request=request)
+    return openai.APIStatusError("erro", response=response, body=None)
+
+
+def test_retryable_errors():
+    assert is_retryable(asyncio.TimeoutError())
+    assert is_retryable(_status_error(429))
+    assert is_retryable(_status_error(503))
+    assert not is_retryable(_status_error(400))
+    assert not is_retryable(HTTPException(status_code=503))
+    assert not is_retryable(ValueError())
+
+
+def test_retry_after_header():
+    assert retry_after_seconds(_status_error(429, {"retry-after-ms": "1500"})) == 1.5
+    assert retry_after_seconds(_status_error(429, {"retry-after": "2"})) == 2.0
+    assert retry_after_seconds(_status_error(429, {"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"})) is None
+    assert retry_after_seconds(asyncio.TimeoutError()) is None
+
+
+def test_next_delay_is_jittered_and_capped():
+    policy = RetryPolicy(max_attempts=5, base_delay=1, max_delay=3)
+    for attempt in range(1, 5):
+        delay = policy.next_delay(attempt, asyncio.TimeoutError(), None)
+        assert 0 <= delay <= min(3, 2 ** attempt)
+
+
+def test_next_delay_stops():
+    policy = RetryPolicy(max_attempts=3, base_delay=0.01, max_delay=0.01)
+    assert policy.next_delay(3, asyncio.TimeoutError(), None) is None
+    assert policy.next_delay(1, ValueError(), None) is None
+    # A espera pedida pelo provedor não cabe no prazo restante
+    assert policy.next_delay(1, _status_error(429, {"retry-after": "5"}), Deadline(1)) is None
+    assert policy.next_delay(1, _status_error(429, {"retry-after": "0.5"}), Deadline(1)) == 0.5
+
+
+def test_explicit_zero_settings_are_kept():
+    policy = RetryPolicy(max_attempts=0, base_delay=0, max_delay=0)
+    assert (policy.max_attempts, policy.base_delay, policy.max_delay) == (0, 0, 0)
+    assert policy.next_delay(1, asyncio.TimeoutError(), None) is None
+    assert RetryPolicy(max_attempts=2, base_delay=0, max_delay=0).next_delay(1, asyncio.TimeoutError(), None) == 0
+
+
+def test_run_retries_until_success():
+    policy = RetryPolicy(max_attempts=3, base_delay=0.001, max_delay=0.001)
+    calls, retried = [], []
+
+    async def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise asyncio.TimeoutError()
+        return "ok"
+
+    assert asyncio.run(policy.run(flaky, None, retried.append)) == "ok"
+    assert len(calls) == 3 and len(retried) == 2
+
+
+def test_run_propagates_after_last_attempt():
+    policy = RetryPolicy(max_attempts=2, base_delay=0.001, max_delay=0.001)
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        raise asyncio.TimeoutError()
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(policy.run(failing))
+    assert len(calls) == 2
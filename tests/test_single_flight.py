@@ -0,0 +1,70 @@
+import asyncio
+import pytest
+from utils.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    async def scenario():
+        flight = SingleFlight()
+        calls = []
+
+        async def fn():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "r"
+
+        results = await asyncio.gather(*(flight.do("k", fn) for _ in range(5)))
+        assert results == ["r"] * 5 and len(calls) == 1
+        assert not flight.in_flight("k")
+        # Depois de concluída, a chave dispara uma nova execução
+        assert await flight.do("k", fn) == "r" and len(calls) == 2
+
+    asyncio.run(scenario())
+
+
+def test_different_keys_run_separately():
+    async def scenario():
+        flight = SingleFlight()
+        calls = []
+
+        async def fn():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+
+        await asyncio.gather(flight.do("a", fn), flight.do("b", fn))
+        assert len(calls) == 2
+
+    asyncio.run(scenario())
+
+
+def test_exception_is_shared():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def fn():
+            await asyncio.sleep(0.01)
+            raise ValueError("falhou")
+
+        results = await asyncio.gather(flight.do("k", fn), flight.do("k", fn), return_exceptions=True)
+        assert all(isinstance(r, ValueError) for r in results)
+
+    asyncio.run(scenario())
+
+
+def test_cancelling_one_caller_keeps_the_others():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def fn():
+            await asyncio.sleep(0.05)
+            return "r"
+
+        first = asyncio.create_task(flight.do("k", fn))
+        second = asyncio.create_task(flight.do("k", fn))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == "r"
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    asyncio.run(scenario())
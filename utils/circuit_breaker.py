@@ -0,0 +1,116 @@
+import time
+from collections import deque
+from typing import Optional
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+
+
+class Permit:
+    """Chamada liberada por try_acquire: `probe` indica sonda do meio-aberto"""
+
+    __slots__ = ("probe", "cycle")
+
+    def __init__(self, probe: bool, cycle: int):
+        self.probe = probe
+        self.cycle = cycle
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker com janela deslizante das últimas chamadas.
+
+    Abre quando, com pelo menos `min_calls` amostras, a taxa de falhas ou de chamadas lentas
+    (acima de `slow_call_seconds`) atinge o limite. Aberto, rejeita tudo por `open_seconds`;
+    depois passa a meio-aberto e deixa passar até `half_open_calls` sondas: se todas derem
+    certo fecha, se alguma falhar volta a abrir. Só o resultado das sondas decide o meio-aberto:
+    chamadas liberadas antes de o circuito abrir são ignoradas ao terminar.
+    """
+
+    def __init__(
+            self,
+            window: int = 20,
+            min_calls: int = 10,
+            failure_rate: float = 0.5,
+            slow_call_rate: float = 0.5,
+            slow_call_seconds: float = 60,
+            open_seconds: float = 30,
+            half_open_calls: int = 2,
+        ):
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_rate = slow_call_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        # Incrementado a cada abertura: permissões de um ciclo anterior não contam mais
+        self._cycle = 0
+
+    def _refresh(self) -> None:
+        if self.state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self.state = HALF_OPEN
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+
+    def retry_after(self) -> float:
+        """Segundos até o circuito aceitar novas chamadas"""
+        if self.state != OPEN:
+            return 1.0
+        return max(1.0, self.open_seconds - (time.monotonic() - self._opened_at))
+
+    def would_admit(self) -> bool:
+        """Se try_acquire liberaria uma chamada agora (sem reservar a vaga)"""
+        self._refresh()
+        if self.state == HALF_OPEN:
+            return self._probes_in_flight < self.half_open_calls
+        return self.state == CLOSED
+
+    def try_acquire(self) -> Optional[Permit]:
+        """Libera a chamada (devolvendo a permissão a passar para release) ou None se rejeitada"""
+        if not self.would_admit():
+            return None
+        probe = self.state == HALF_OPEN
+        if probe:
+            self._probes_in_flight += 1
+        return Permit(probe, self._cycle)
+
+    def release(self, permit: Permit, success: Optional[bool], latency: float) -> None:
+        """Registra o resultado de uma chamada liberada por try_acquire (None = cancelada)"""
+        if permit.cycle != self._cycle:
+            return
+        if permit.probe:
+            if self.state != HALF_OPEN:
+                return
+            self._probes_in_flight -= 1
+            if success is None:
+                return
+            if not success:
+                self._open()
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_calls:
+                self.state = CLOSED
+                self._outcomes.clear()
+            return
+
+        if success is None or self.state != CLOSED:
+            return
+        self._outcomes.append((success, latency >= self.slow_call_seconds))
+        if len(self._outcomes) < self.min_calls:
+            return
+        failures = sum(1 for ok, _ in self._outcomes if not ok)
+        slow = sum(1 for _, is_slow in self._outcomes if is_slow)
+        if failures / len(self._outcomes) >= self.failure_rate or slow / len(self._outcomes) >= self.slow_call_rate:
+            self._open()
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self._cycle += 1
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
@@ -0,0 +1,55 @@
+class AdaptiveLimiter:
+    """
+    Limite de concorrência adaptativo (AIMD com sinal de latência no estilo Vegas).
+
+    Cada sucesso com pelo menos `grow_utilization` do limite em uso aumenta o limite em 1. Sobrecarga (429,
+    timeout) ou latência recente bem acima da média de longo prazo reduz o limite
+    multiplicando por `backoff`. Acima do limite as chamadas são rejeitadas na hora,
+    em vez de enfileirar coroutines esperando um upstream degradado.
+    """
+
+    def __init__(
+            self,
+            initial_limit: int = 50,
+            min_limit: int = 1,
+            max_limit: int = 100,
+            backoff: float = 0.9,
+            latency_tolerance: float = 2.0,
+            grow_utilization: float = 0.9,
+        ):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.grow_utilization = grow_utilization
+        self.in_flight = 0
+        self._short_latency = None
+        self._long_latency = None
+
+    def has_capacity(self) -> bool:
+        """Se try_acquire liberaria uma chamada agora (sem reservar a vaga)"""
+        return self.in_flight < int(self.limit)
+
+    def try_acquire(self) -> bool:
+        if not self.has_capacity():
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self, latency: float = None, overloaded: bool = False) -> None:
+        """Libera a vaga; latency None indica chamada cancelada (sem amostra)"""
+        self.in_flight -= 1
+        if latency is None:
+            return
+
+        if self._long_latency is None:
+            self._short_latency = self._long_latency = latency
+        else:
+            self._short_latency = 0.5 * self._short_latency + 0.5 * latency
+            self._long_latency = 0.95 * self._long_latency + 0.05 * latency
+
+        if overloaded or self._short_latency > self._long_latency * self.latency_tolerance:
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+        elif self.in_flight + 1 >= int(self.limit) * self.grow_utilization:
+            self.limit = min(self.max_limit, self.limit + 1)
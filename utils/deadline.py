@@ -0,0 +1,28 @@
+import os
+import time
+from typing import Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "180"))
+
+
+class Deadline:
+    """Prazo absoluto de uma requisição, propagado do controller até as chamadas aos provedores"""
+
+    def __init__(self, timeout_seconds: float):
+        self.expires_at = time.monotonic() + timeout_seconds
+
+    @classmethod
+    def from_header(cls, header_value: Optional[float]) -> "Deadline":
+        """Usa o timeout informado pelo cliente (X-Request-Timeout), limitado ao padrão do servidor"""
+        if header_value is None or header_value <= 0:
+            return cls(DEFAULT_DEADLINE_SECONDS)
+        return cls(min(header_value, DEFAULT_DEADLINE_SECONDS))
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from cachetools import TLRUCache
+from dotenv import load_dotenv
+from utils.file_payload import FilePayload
+from utils.metrics import LLM_FILE_CACHE_REQUESTS
+from utils.single_flight import SingleFlight
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# (handle do provedor, instante em que expira)
+Entry = Tuple[str, float]
+Uploader = Callable[[bytes, str, str], Awaitable[Tuple[str, Optional[float]]]]
+Deleter = Callable[[str], Awaitable[None]]
+
+_caches: List["FileHandleCache"] = []
+
+
+class _HandleLRU(TLRUCache):
+    """TLRUCache que avisa quando uma entrada sai por LRU ou por expiração"""
+
+    def __init__(self, maxsize, ttu, timer, on_evict: Callable[[Entry], None]):
+        super().__init__(maxsize, ttu, timer)
+        self._on_evict = on_evict
+
+    def popitem(self):
+        key, value = super().popitem()
+        self._on_evict(value)
+        return key, value
+
+    def expire(self, time=None):
+        expired = super().expire(time)
+        for _, value in expired:
+            self._on_evict(value)
+        return expired
+
+
+class FileHandleCache:
+    """
+    Arquivos já enviados a um provedor (file names do Gemini, file ids da OpenAI e da
+    Anthropic), indexados pelo SHA-256 do conteúdo decodificado. Reenvios do mesmo
+    documento reaproveitam o handle até ele expirar; handles que saem do cache (LRU ou
+    expiração) são apagados no provedor em segundo plano, depois de uma carência maior que
+    o timeout do provedor, para não sumirem sob uma requisição que ainda os usa.
+    Configurável por provedor: <P>_FILE_CACHE_ENABLED, <P>_FILE_CACHE_MIN_BYTES (arquivos
+    menores continuam indo inline), <P>_FILE_CACHE_MAX_ITEMS, <P>_FILE_CACHE_TTL_SECONDS e
+    <P>_FILE_CACHE_DELETE_GRACE_SECONDS (padrão: <P>_TIMEOUT + 60).
+    """
+
+    def __init__(self, provider: str, upload: Uploader, delete: Deleter, default_ttl: float):
+        prefix = provider.upper()
+        self.provider = provider
+        self.enabled = os.getenv(f"{prefix}_FILE_CACHE_ENABLED", "true").lower() == "true"
+        self.min_bytes = int(os.getenv(f"{prefix}_FILE_CACHE_MIN_BYTES", str(1024 * 1024)))
+        self.ttl = float(os.getenv(f"{prefix}_FILE_CACHE_TTL_SECONDS", str(default_ttl)))
+        provider_timeout = float(os.getenv(f"{prefix}_TIMEOUT", "180"))
+        self.delete_grace = float(os.getenv(f"{prefix}_FILE_CACHE_DELETE_GRACE_SECONDS", str(provider_timeout + 60)))
+        self._upload = upload
+        self._delete = delete
+        self._entries = _HandleLRU(
+            maxsize=int(os.getenv(f"{prefix}_FILE_CACHE_MAX_ITEMS", "200")),
+            ttu=lambda key, value, now: value[1],
+            timer=time.time,
+            on_evict=self._schedule_delete,
+        )
+        self._single_flight = SingleFlight()
+        # Remoções agendadas (handle -> tarefa), ainda na carência
+        self._pending_deletes: Dict[str, asyncio.Task] = {}
+        _caches.append(self)
+
+    def applies_to(self, size: int) -> bool:
+        return self.enabled and size >= self.min_bytes
+
+    async def get_or_upload(self, file: FilePayload, mime_type: str, filename: str) -> str:
+        """
+        Retorna o handle do arquivo no provedor, enviando-o só se ainda não estiver no cache.
+        A chave é o hash já memoizado no FilePayload; os bytes só são lidos para o envio.
+        """
+        key = await file.sha256()
+        self._entries.expire()
+        entry = self._entries.get(key)
+        if entry:
+            LLM_FILE_CACHE_REQUESTS.labels(provider=self.provider, result="hit").inc()
+            return entry[0]
+
+        LLM_FILE_CACHE_REQUESTS.labels(provider=self.provider, result="miss").inc()
+        return await self._single_flight.do(key, lambda: self._store(key, file, mime_type, filename))
+
+    async def _store(self, key: str, file: FilePayload, mime_type: str, filename: str) -> str:
+        handle, expires_at = await self._upload(await file.read_bytes(), mime_type, filename)
+        # Margem para o handle não expirar no provedor durante uma requisição em andamento
+        local_expiry = time.time() + self.ttl
+        if expires_at:
+            local_expiry = min(local_expiry, expires_at - 600)
+        self._entries[key] = (handle, local_expiry)
+        return handle
+
+    def _schedule_delete(self, entry: Entry) -> None:
+        handle = entry[0]
+        task = asyncio.ensure_future(self._delete_later(handle))
+        self._pending_deletes[handle] = task
+        task.add_done_callback(lambda done: self._forget_delete(handle, done))
+
+    def _forget_delete(self, handle: str, task: asyncio.Task) -> None:
+        if self._pending_deletes.get(handle) is task:
+            del self._pending_deletes[handle]
+
+    async def _delete_later(self, handle: str) -> None:
+        # Requisições que pegaram o handle antes da saída do cache ainda podem estar gerando
+        await asyncio.sleep(self.delete_grace)
+        await self._safe_delete(handle)
+
+    async def _safe_delete(self, handle: str) -> None:
+        try:
+            await self._delete(handle)
+        except Exception as e:
+            logger.warning(f"Não foi possível remover o arquivo {handle} do provedor {self.provider}: {e}")
+
+    async def close(self) -> None:
+        """Apaga no provedor todos os arquivos ainda em cache ou aguardando remoção"""
+        # clear() esvazia o cache via popitem, que agenda a remoção de cada handle
+        self._entries.clear()
+        # No shutdown não há mais requisições em andamento: a carência é dispensada
+        pending = dict(self._pending_deletes)
+        for task in pending.values():
+            task.cancel()
+        await asyncio.gather(*pending.values(), return_exceptions=True)
+        await asyncio.gather(*(self._safe_delete(handle) for handle in pending))
+
+
+async def close_file_caches() -> None:
+    """Apaga os arquivos enviados pelos caches de todos os provedores (usado no shutdown)"""
+    await asyncio.gather(*(cache.close() for cache in _caches))
@@ -0,0 +1,115 @@
+import asyncio
+import base64
+import hashlib
+import io
+import threading
+from typing import Awaitable, BinaryIO, Callable, Optional
+from models.prompt_models import FilledParameter
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+class FilePayload:
+    """
+    Conteúdo de um arquivo enviado ao LLM. Vem em base64 no JSON de PromptRequest ou como
+    arquivo (SpooledTemporaryFile) do upload multipart; os managers pedem bytes ou base64
+    conforme o que o provedor aceita, sem que o controller precise converter antes.
+    """
+
+    def __init__(self, file_base64: str = None, file: BinaryIO = None, size: int = None, filename: str = None, mime_type: str = None, on_close: Callable[[], Awaitable[None]] = None):
+        self._base64 = file_base64
+        self._file = file
+        # Fecha o arquivo de origem (ex.: o form do upload) quando o último detentor o liberar
+        self._on_close = on_close
+        self._holders = 0
+        self._size = size
+        self._decoded: Optional[asyncio.Future] = None
+        self._sha256: Optional[asyncio.Future] = None
+        # Leituras em threads diferentes (ex.: failover com dois provedores) disputam o seek do arquivo
+        self._file_lock = threading.Lock()
+        self.filename = filename
+        # MIME real do conteúdo, quando conhecido (ex.: imagem normalizada); senão vale o do TipoParametro
+        self.mime_type = mime_type
+
+    @classmethod
+    def from_bytes(cls, file_bytes: bytes, filename: str = None, mime_type: str = None) -> "FilePayload":
+        return cls(file=io.BytesIO(file_bytes), size=len(file_bytes), filename=filename, mime_type=mime_type)
+
+    @property
+    def size(self) -> int:
+        """Tamanho em bytes do conteúdo decodificado"""
+        if self._size is None:
+            if self._base64 is not None:
+                self._size = len(self._base64) * 3 // 4 - self._base64[-2:].count("=")
+            else:
+                self._file.seek(0, 2)
+                self._size = self._file.tell()
+        return self._size
+
+    def hold(self) -> None:
+        """Registra mais um detentor do arquivo; cada hold precisa de um release"""
+        self._holders += 1
+
+    async def release(self) -> None:
+        """Libera um detentor; o último a sair fecha o arquivo de origem"""
+        self._holders -= 1
+        if self._holders == 0 and self._on_close is not None:
+            on_close, self._on_close = self._on_close, None
+            await on_close()
+
+    def _read_file(self) -> bytes:
+        with self._file_lock:
+            self._file.seek(0)
+            return self._file.read()
+
+    def _hash_file(self) -> str:
+        digest = hashlib.sha256()
+        with self._file_lock:
+            self._file.seek(0)
+            for chunk in iter(lambda: self._file.read(_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    async def _hash(self) -> str:
+        if self._base64 is not None:
+            file_bytes = await self.read_bytes()
+            return await asyncio.to_thread(lambda: hashlib.sha256(file_bytes).hexdigest())
+        return await asyncio.to_thread(self._hash_file)
+
+    async def read_bytes(self) -> bytes:
+        """Conteúdo decodificado; o base64 é decodificado uma única vez, em thread separada"""
+        if self._base64 is None:
+            return await asyncio.to_thread(self._read_file)
+        if self._decoded is None:
+            self._decoded = asyncio.ensure_future(asyncio.to_thread(base64.b64decode, self._base64))
+        return await asyncio.shield(self._decoded)
+
+    async def base64(self) -> str:
+        if self._base64 is not None:
+            return self._base64
+        file_bytes = await asyncio.to_thread(self._read_file)
+        return await asyncio.to_thread(lambda: base64.b64encode(file_bytes).decode("ascii"))
+
+    async def sha256(self) -> str:
+        """
+        SHA-256 do conteúdo decodificado (o mesmo para o JSON em base64 e para o upload),
+        calculado fora do event loop uma única vez por FilePayload
+        """
+        if self._sha256 is None:
+            self._sha256 = asyncio.ensure_future(self._hash())
+        return await asyncio.shield(self._sha256)
+
+    def __repr__(self) -> str:
+        # Nunca despejar o conteúdo do arquivo em logs ou mensagens de erro
+        return f"FilePayload(filename={self.filename!r}, size={self.size})"
+
+
+def get_file_payload(file_param: FilledParameter) -> FilePayload:
+    """
+    FilePayload do parâmetro de arquivo, seja ele base64 (JSON) ou upload multipart. O base64
+    é convertido uma única vez e o próprio parâmetro passa a guardar o FilePayload, então
+    todas as etapas da requisição (cache, extração, provedor, log) compartilham o mesmo hash.
+    """
+    if not isinstance(file_param.valor, FilePayload):
+        file_param.valor = FilePayload(file_base64=file_param.valor)
+    return file_param.valor
@@ -1,5 +1,7 @@
 
+from typing import Optional
 from models.enums import TipoParametro
+from models.prompt_models import FilledParameter, PromptRequest
 
 
 def get_mime_type(tipo_arquivo: TipoParametro) -> str:
@@ -26,4 +28,29 @@ def get_default_filename(tipo_arquivo: TipoParametro) -> str:
         TipoParametro.ARQUIVO_TXT: "arquivo.txt",
         TipoParametro.IMAGEM: "imagem.jpg"
     }
-    return filenames.get(tipo_arquivo, None)
\ No newline at end of file
+    return filenames.get(tipo_arquivo, None)
+
+def get_file_parameter(req: PromptRequest) -> Optional[FilledParameter]:
+    """Retorna o primeiro parâmetro de arquivo (não texto/numérico) da requisição"""
+    for param in req.parameters:
+        if param.tipo not in (TipoParametro.TEXTO, TipoParametro.NUMERICO):
+            return param
+    return None
+
+
+def get_tipo_arquivo(filename: str) -> Optional[TipoParametro]:
+    """Deduz o TipoParametro de arquivo pela extensão do nome (ex.: no upload multipart)"""
+    extensions = {
+        "pdf": TipoParametro.ARQUIVO_PDF,
+        "docx": TipoParametro.ARQUIVO_DOCX,
+        "xlsx": TipoParametro.ARQUIVO_XLSX,
+        "xls": TipoParametro.ARQUIVO_XLS,
+        "csv": TipoParametro.ARQUIVO_CSV,
+        "txt": TipoParametro.ARQUIVO_TXT,
+        "jpg": TipoParametro.IMAGEM,
+        "jpeg": TipoParametro.IMAGEM,
+        "png": TipoParametro.IMAGEM,
+    }
+    if not filename or "." not in filename:
+        return None
+    return extensions.get(filename.rsplit(".", 1)[-1].lower())
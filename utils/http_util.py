@@ -0,0 +1,39 @@
+import os
+from typing import List
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+_clients: List[httpx.AsyncClient] = []
+
+
+def get_http_timeout(provider: str) -> httpx.Timeout:
+    """Retorna os timeouts de conexão/leitura configurados para o provedor (ex.: OPENAI_CONNECT_TIMEOUT)"""
+    prefix = provider.upper()
+    connect_timeout = float(os.getenv(f"{prefix}_CONNECT_TIMEOUT", "5"))
+    read_timeout = float(os.getenv(f"{prefix}_READ_TIMEOUT", "120"))
+    return httpx.Timeout(read_timeout, connect=connect_timeout)
+
+
+def build_async_http_client(provider: str) -> httpx.AsyncClient:
+    """
+    Cria um httpx.AsyncClient de longa duração para o provedor, com keep-alive
+    e limite de conexões configurável (ex.: OPENAI_MAX_CONNECTIONS).
+    """
+    prefix = provider.upper()
+    limits = httpx.Limits(
+        max_connections=int(os.getenv(f"{prefix}_MAX_CONNECTIONS", "200")),
+        max_keepalive_connections=int(os.getenv(f"{prefix}_MAX_KEEPALIVE", "50")),
+        keepalive_expiry=float(os.getenv(f"{prefix}_KEEPALIVE_EXPIRY", "60")),
+    )
+    client = httpx.AsyncClient(limits=limits, timeout=get_http_timeout(provider))
+    _clients.append(client)
+    return client
+
+
+async def close_http_clients() -> None:
+    """Fecha todos os pools de conexão criados por build_async_http_client"""
+    while _clients:
+        client = _clients.pop()
+        await client.aclose()
@@ -0,0 +1,62 @@
+import io
+from typing import Optional, Tuple
+
+# Assinaturas (magic bytes) dos formatos de imagem aceitos pelos provedores
+_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+
+
+def detect_image_mime(file_bytes: bytes) -> Optional[str]:
+    """MIME real da imagem pelos primeiros bytes, ou None se não reconhecido"""
+    for signature, mime_type in _SIGNATURES:
+        if file_bytes.startswith(signature):
+            return mime_type
+    if file_bytes[:4] == b"RIFF" and file_bytes[8:12] == b"WEBP":
+        return "image/webp"
+    if file_bytes[4:8] == b"ftyp" and file_bytes[8:12] in (b"heic", b"heix", b"mif1", b"msf1"):
+        return "image/heic"
+    return None
+
+
+def _target_size(width: int, height: int, max_edge: int, max_short_edge: int) -> Tuple[int, int]:
+    scale = min(1.0, max_edge / max(width, height))
+    if max_short_edge:
+        scale = min(scale, max_short_edge / min(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def normalize_image(file_bytes: bytes, max_edge: int, max_short_edge: int = 0, quality: int = 85) -> Tuple[bytes, str]:
+    """
+    Corrige a orientação EXIF, reduz a imagem para caber em `max_edge` (e `max_short_edge`,
+    se informado) e recodifica sem metadados: JPEG para imagens opacas, PNG se houver
+    transparência. Se o resultado não for menor, devolve o original com o MIME detectado.
+    Roda em processo separado (ImageNormalizer), por isso é uma função de módulo.
+    """
+    from PIL import Image, ImageOps
+
+    original_mime = detect_image_mime(file_bytes)
+
+    with Image.open(io.BytesIO(file_bytes)) as image:
+        image.draft("RGB", _target_size(image.width, image.height, max_edge, max_short_edge))
+        image = ImageOps.exif_transpose(image)
+        size = _target_size(image.width, image.height, max_edge, max_short_edge)
+        if size != image.size:
+            image = image.resize(size, Image.Resampling.LANCZOS)
+
+        has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+        output = io.BytesIO()
+        if has_alpha:
+            image.convert("RGBA").save(output, format="PNG", optimize=True)
+            mime_type = "image/png"
+        else:
+            image.convert("RGB").save(output, format="JPEG", quality=quality, optimize=True, progressive=True)
+            mime_type = "image/jpeg"
+
+    normalized = output.getvalue()
+    if original_mime and original_mime != "image/heic" and len(normalized) >= len(file_bytes):
+        return file_bytes, original_mime
+    return normalized, mime_type
@@ -0,0 +1,196 @@
+"""
+Logging estruturado e assíncrono da aplicação.
+
+configure_logging() troca os handlers do root por um QueueHandler: quem loga só monta o
+registro (mensagem já limitada em tamanho) e o enfileira; a serialização em JSON e a escrita
+em stdout acontecem na thread do QueueListener. Assim o custo e o volume de log não crescem
+com o tamanho dos prompts ou arquivos da requisição.
+
+Variáveis de ambiente:
+    LOG_LEVEL             nível do root (INFO)
+    LOG_FORMAT            json (padrão) ou text
+    LOG_SAMPLE_RATES      amostragem por logger para registros abaixo de WARNING,
+                          ex.: "managers.gemini_mgr=0.1,httpx=0.01"
+    LOG_MAX_FIELD_CHARS   tamanho máximo da mensagem e de cada campo extra (2000)
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from utils.redaction import redact_value
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Atributos padrão de LogRecord; o que sobrar veio de `extra=` e vai como campo do JSON
+_RESERVED_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id"}
+
+_UVICORN_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def _parse_sample_rates(value: str) -> Dict[str, float]:
+    rates = {}
+    for item in value.split(","):
+        name, _, rate = item.partition("=")
+        if name.strip() and rate.strip():
+            rates[name.strip()] = float(rate)
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """Descarta uma fração dos registros abaixo de WARNING por logger (o prefixo mais longo vale)"""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._cache: Dict[str, float] = {}
+
+    def _rate(self, name: str) -> float:
+        if name not in self._cache:
+            matches = [prefix for prefix in self.rates if name == prefix or name.startswith(prefix + ".")]
+            self._cache[name] = self.rates[max(matches, key=len)] if matches else 1.0
+        return self._cache[name]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+class _ContextQueueHandler(logging.handlers.QueueHandler):
+    """
+    Prepara o registro na thread de quem loga: captura o request_id (contextvars não chegam à
+    thread do listener), resolve e limita a mensagem e transforma a exceção em texto.
+    """
+
+    def __init__(self, log_queue: queue.Queue, max_chars: int):
+        super().__init__(log_queue)
+        self.max_chars = max_chars
+        self._exception_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Como no QueueHandler da stdlib, o original segue intacto para os demais handlers (caplog, Sentry...)
+        record = copy.copy(record)
+        record.request_id = request_id_var.get()
+        record.msg = redact_value(record.getMessage(), self.max_chars)
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self._exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        record.stack_info = None
+        for key, value in list(vars(record).items()):
+            if key not in _RESERVED_ATTRS:
+                setattr(record, key, redact_value(value, self.max_chars))
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        request_id = getattr(record, "request_id", None)
+        prefix = f"[{request_id[:8]}] " if request_id else ""
+        text = f"{self.formatTime(record)} {record.levelname} {record.name}: {prefix}{record.getMessage()}"
+        if record.exc_text:
+            text += "\n" + record.exc_text
+        return text
+
+
+def configure_logging() -> None:
+    """Configura o root logger uma única vez por processo (chamadas seguintes não fazem nada)"""
+    global _listener
+    if _listener is not None:
+        return
+
+    max_chars = int(os.getenv("LOG_MAX_FIELD_CHARS", "2000"))
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(_TextFormatter() if os.getenv("LOG_FORMAT", "json").lower() == "text" else JsonFormatter())
+
+    log_queue: queue.Queue = queue.Queue(-1)
+    handler = _ContextQueueHandler(log_queue, max_chars)
+    rates = _parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", ""))
+    if rates:
+        handler.addFilter(SamplingFilter(rates))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+
+    # `uvicorn app:app` instala o log_config padrão antes de importar a aplicação: os logs do
+    # servidor e de acesso passam a ir para o root (e para a fila) em vez dos handlers dele
+    for name in _UVICORN_LOGGERS:
+        uvicorn_logger = logging.getLogger(name)
+        for existing in list(uvicorn_logger.handlers):
+            uvicorn_logger.removeHandler(existing)
+        uvicorn_logger.propagate = True
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """Esvazia a fila e encerra a thread do listener"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class RequestIdMiddleware:
+    """
+    Middleware ASGI puro que define o request_id da requisição (X-Request-ID recebido ou um
+    uuid4 novo), disponível para todos os logs da requisição e devolvido no cabeçalho da resposta.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope["headers"]).get(b"x-request-id", b"").decode("latin-1")
+        # Aceita o id do cliente/proxy apenas se for curto e sem caracteres estranhos
+        request_id = incoming if incoming and len(incoming) <= 64 and incoming.replace("-", "").isalnum() else str(uuid.uuid4())
+        token = request_id_var.set(request_id)
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(token)
@@ -0,0 +1,146 @@
+"""
+Métricas Prometheus da aplicação, expostas em /metrics (controllers/metrics_controller.py).
+
+Com vários workers do uvicorn, defina PROMETHEUS_MULTIPROC_DIR (um diretório vazio, limpo a
+cada deploy) antes de iniciar o processo: cada worker grava seus valores em arquivos mmap e o
+/metrics de qualquer worker agrega todos. Gauges declaram como agregar (multiprocess_mode).
+"""
+from prometheus_client import Counter, Gauge, Histogram
+
+LLM_CACHE_REQUESTS = Counter(
+    "llm_cache_requests_total",
+    "Consultas ao cache de respostas de LLM",
+    ["tier", "result"],
+)
+
+LLM_SINGLE_FLIGHT_REQUESTS = Counter(
+    "llm_single_flight_requests_total",
+    "Requisições ao LLM por papel no single-flight (leader dispara, follower reaproveita)",
+    ["role"],
+)
+
+LLM_CIRCUIT_STATE = Gauge(
+    "llm_circuit_state",
+    "Estado do circuit breaker por provedor/modelo (0 fechado, 1 meio-aberto, 2 aberto)",
+    ["provider", "model"],
+    multiprocess_mode="max",  # Com vários workers, mostra o pior estado
+)
+
+LLM_CONCURRENCY_LIMIT = Gauge(
+    "llm_concurrency_limit",
+    "Limite de concorrência adaptativo atual por provedor",
+    ["provider"],
+    multiprocess_mode="livesum",
+)
+
+LLM_REJECTIONS = Counter(
+    "llm_rejections_total",
+    "Chamadas rejeitadas antes de chegar ao provedor",
+    ["provider", "reason"],
+)
+
+LLM_RETRIES = Counter(
+    "llm_retries_total",
+    "Novas tentativas de chamadas a provedores após erros transitórios",
+    ["provider", "error"],
+)
+
+LLM_FILE_CACHE_REQUESTS = Counter(
+    "llm_file_cache_requests_total",
+    "Consultas ao cache de arquivos já enviados aos provedores",
+    ["provider", "result"],
+)
+
+LLM_FILE_EXTRACTIONS = Counter(
+    "llm_file_extractions_total",
+    "Arquivos de prompts ARQUIVO por resultado da extração local de texto",
+    ["tipo", "result"],
+)
+
+REQUEST_STAGE_SECONDS = Histogram(
+    "request_stage_seconds",
+    "Duração de cada etapa de uma requisição (auth, banco, LLM...)",
+    ["stage"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total",
+    "Requisições HTTP por rota (template do path) e status",
+    ["method", "route", "status"],
+)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Latência das requisições HTTP por rota, até o fim da resposta",
+    ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+
+HTTP_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "Requisições HTTP em andamento",
+    multiprocess_mode="livesum",
+)
+
+LLM_REQUEST_SECONDS = Histogram(
+    "llm_request_duration_seconds",
+    "Latência das chamadas aos provedores de LLM (cada tentativa)",
+    ["provider", "model", "tipo"],
+    buckets=(0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120, 300),
+)
+
+LLM_CALLS = Counter(
+    "llm_calls_total",
+    "Chamadas aos provedores de LLM por resultado (ok ou nome do erro)",
+    ["provider", "model", "result"],
+)
+
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "Tokens consumidos nos provedores de LLM",
+    ["provider", "model", "direction"],
+)
+
+LLM_IN_FLIGHT = Gauge(
+    "llm_requests_in_flight",
+    "Chamadas aos provedores de LLM em andamento",
+    ["provider"],
+    multiprocess_mode="livesum",
+)
+
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Conexões do pool do SQLAlchemy por estado (checked_out, idle, overflow)",
+    ["state"],
+    multiprocess_mode="livesum",
+)
+
+CREDIT_OPERATIONS = Counter(
+    "credit_operations_total",
+    "Operações de crédito por tipo e resultado",
+    ["operation", "result"],
+)
+
+CREDITS_AMOUNT = Counter(
+    "credits_amount_total",
+    "Créditos movimentados por tipo de operação",
+    ["operation"],
+)
+
+WRITE_BEHIND_QUEUE_DEPTH = Gauge(
+    "write_behind_queue_depth",
+    "Itens aguardando gravação na fila write-behind (histórico e reservas de crédito)",
+    multiprocess_mode="livesum",
+)
+
+WRITE_BEHIND_ITEMS = Counter(
+    "write_behind_items_total",
+    "Itens processados pela fila write-behind por tipo e resultado (written, dropped)",
+    ["kind", "result"],
+)
+
+WRITE_BEHIND_BLOCKED = Counter(
+    "write_behind_blocked_total",
+    "Vezes em que a fila write-behind estava cheia e a requisição esperou por espaço",
+)
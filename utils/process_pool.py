@@ -0,0 +1,27 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Pool de processos compartilhado para trabalho de CPU (extração de texto, imagens).
+    Criado sob demanda: os processos só existem se houver arquivo para tratar.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=int(os.getenv("PROCESS_POOL_WORKERS", "2")))
+    return _executor
+
+
+def shutdown_process_pool() -> None:
+    """Encerra o pool; o próximo get_process_pool cria um novo (também usado se ele quebrar)"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,47 @@
+import hashlib
+import json
+from typing import Any, List, Tuple
+from models.enums import TipoParametro
+from models.prompt_models import PromptRequest
+from utils.file_payload import get_file_payload
+
+# Tipos de parâmetro cujo valor é um arquivo (base64 ou upload): nunca vão para logs ou para o banco
+FILE_TYPES = {
+    TipoParametro.ARQUIVO_PDF,
+    TipoParametro.ARQUIVO_DOCX,
+    TipoParametro.ARQUIVO_XLSX,
+    TipoParametro.ARQUIVO_TXT,
+    TipoParametro.IMAGEM,
+    TipoParametro.ARQUIVO_XLS,
+    TipoParametro.ARQUIVO_CSV,
+}
+
+
+def redact_value(value: Any, max_chars: int) -> Any:
+    """Limita strings (e bytes) ao tamanho máximo, indicando quanto foi cortado; outros tipos passam intactos"""
+    if isinstance(value, (bytes, bytearray)):
+        return f"<{len(value)} bytes>"
+    if isinstance(value, str) and len(value) > max_chars:
+        return f"{value[:max_chars]}…(+{len(value) - max_chars} caracteres)"
+    return value
+
+
+async def parameters_fingerprint(req: PromptRequest) -> Tuple[str, List[dict]]:
+    """
+    Impressão digital dos parâmetros da requisição para aux.llm_log: sha256 dos valores, com
+    arquivos representados pelo hash do conteúdo. Devolve também a lista de arquivos (tipo,
+    sha256 e tamanho), para que o log nunca guarde o payload em si. O hash do arquivo é o
+    mesmo já calculado para a chave do cache (guardado no FilePayload do parâmetro).
+    """
+    values = []
+    files = []
+    for param in req.parameters:
+        if param.tipo in FILE_TYPES and param.valor:
+            file = get_file_payload(param)
+            file_sha256 = await file.sha256()
+            files.append({"titulo": param.titulo, "tipo": param.tipo.name, "sha256": file_sha256, "bytes": file.size})
+            values.append([param.titulo, int(param.tipo), files[-1]["sha256"]])
+        else:
+            values.append([param.titulo, int(param.tipo), str(param.valor)])
+    fingerprint = hashlib.sha256(json.dumps(values, ensure_ascii=False).encode("utf-8")).hexdigest()
+    return fingerprint, files
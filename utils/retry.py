@@ -0,0 +1,86 @@
+import asyncio
+import os
+import random
+from typing import Awaitable, Callable, Optional, TypeVar
+import anthropic
+import openai
+from google.api_core import exceptions as google_exceptions
+from utils.deadline import Deadline
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Erros transitórios dos SDKs (rede, timeout, 429, 5xx). HTTPException nunca é repetida."""
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    if isinstance(error, (openai.APIConnectionError, anthropic.APIConnectionError)):
+        return True
+    if isinstance(error, (openai.APIStatusError, anthropic.APIStatusError)):
+        return error.status_code in RETRYABLE_STATUS or error.status_code >= 500
+    if isinstance(error, google_exceptions.GoogleAPICallError):
+        return error.code in RETRYABLE_STATUS
+    return False
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Lê retry-after-ms / retry-after da resposta HTTP do erro, quando houver"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        # retry-after também pode vir como data HTTP; nesse caso usamos o backoff normal
+        return None
+    return None
+
+
+class RetryPolicy:
+    """
+    Repetição com backoff exponencial e "full jitter", respeitando Retry-After.
+    Nunca espera além do prazo da requisição: se a próxima tentativa não cabe no
+    que resta do Deadline, o erro original é propagado.
+    """
+
+    def __init__(self, max_attempts: int = None, base_delay: float = None, max_delay: float = None):
+        if max_attempts is None:
+            max_attempts = int(os.getenv("LLM_RETRY_MAX_ATTEMPTS", "3"))
+        if base_delay is None:
+            base_delay = float(os.getenv("LLM_RETRY_BASE_DELAY_MS", "500")) / 1000
+        if max_delay is None:
+            max_delay = float(os.getenv("LLM_RETRY_MAX_DELAY_MS", "8000")) / 1000
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def next_delay(self, attempt: int, error: BaseException, deadline: Optional[Deadline]) -> Optional[float]:
+        """Espera antes da próxima tentativa, ou None se não deve repetir"""
+        if attempt >= self.max_attempts or not is_retryable(error):
+            return None
+        delay = retry_after_seconds(error)
+        if delay is None:
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if deadline is not None and delay >= deadline.remaining():
+            return None
+        return delay
+
+    async def run(self, fn: Callable[[], Awaitable[T]], deadline: Optional[Deadline] = None, on_retry: Callable[[BaseException], None] = None) -> T:
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return await fn()
+            except Exception as e:
+                delay = self.next_delay(attempt, e, deadline)
+                if delay is None:
+                    raise
+                if on_retry:
+                    on_retry(e)
+                await asyncio.sleep(delay)
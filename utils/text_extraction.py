@@ -0,0 +1,110 @@
+import csv
+import io
+from typing import Iterable, List, Optional
+from models.enums import TipoParametro
+
+# Tipos de arquivo cujo conteúdo pode ser extraído localmente como texto
+EXTRACTABLE_TYPES = {
+    TipoParametro.ARQUIVO_CSV,
+    TipoParametro.ARQUIVO_TXT,
+    TipoParametro.ARQUIVO_XLSX,
+    TipoParametro.ARQUIVO_XLS,
+    TipoParametro.ARQUIVO_DOCX,
+}
+
+
+def _decode(file_bytes: bytes) -> str:
+    for encoding in ("utf-8-sig", "cp1252"):
+        try:
+            return file_bytes.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return file_bytes.decode("latin-1")
+
+
+def _cell(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).replace("\t", " ").replace("\n", " ").strip()
+
+
+def _table(rows: Iterable[Iterable]) -> List[str]:
+    """Linhas separadas por tab, sem linhas vazias nem células vazias no fim da linha"""
+    lines = []
+    for row in rows:
+        cells = [_cell(value) for value in row]
+        while cells and not cells[-1]:
+            cells.pop()
+        if cells:
+            lines.append("\t".join(cells))
+    return lines
+
+
+def _extract_csv(file_bytes: bytes) -> str:
+    content = _decode(file_bytes)
+    try:
+        dialect = csv.Sniffer().sniff(content[:4096], delimiters=",;\t|")
+    except csv.Error:
+        dialect = csv.excel
+    return "\n".join(_table(csv.reader(io.StringIO(content), dialect)))
+
+
+def _extract_xlsx(file_bytes: bytes) -> str:
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(io.BytesIO(file_bytes), read_only=True, data_only=True)
+    try:
+        sheets = []
+        for sheet in workbook.worksheets:
+            lines = _table(sheet.iter_rows(values_only=True))
+            if lines:
+                sheets.append(f"## Planilha: {sheet.title}\n" + "\n".join(lines))
+        return "\n\n".join(sheets)
+    finally:
+        workbook.close()
+
+
+def _extract_xls(file_bytes: bytes) -> str:
+    import xlrd
+
+    workbook = xlrd.open_workbook(file_contents=file_bytes)
+    sheets = []
+    for sheet in workbook.sheets():
+        lines = _table(sheet.row_values(i) for i in range(sheet.nrows))
+        if lines:
+            sheets.append(f"## Planilha: {sheet.name}\n" + "\n".join(lines))
+    return "\n\n".join(sheets)
+
+
+def _extract_docx(file_bytes: bytes) -> str:
+    import docx
+
+    document = docx.Document(io.BytesIO(file_bytes))
+    blocks = [paragraph.text.strip() for paragraph in document.paragraphs if paragraph.text.strip()]
+    for table in document.tables:
+        lines = _table([cell.text for cell in row.cells] for row in table.rows)
+        if lines:
+            blocks.append("\n".join(lines))
+    return "\n\n".join(blocks)
+
+
+_EXTRACTORS = {
+    TipoParametro.ARQUIVO_CSV: _extract_csv,
+    TipoParametro.ARQUIVO_TXT: lambda file_bytes: _decode(file_bytes).strip(),
+    TipoParametro.ARQUIVO_XLSX: _extract_xlsx,
+    TipoParametro.ARQUIVO_XLS: _extract_xls,
+    TipoParametro.ARQUIVO_DOCX: _extract_docx,
+}
+
+
+def extract_text(file_bytes: bytes, tipo_arquivo: TipoParametro) -> Optional[str]:
+    """
+    Extrai o texto (tabelas como linhas separadas por tab) de arquivos CSV, TXT, XLSX, XLS e
+    DOCX. Roda em processo separado (DocumentExtractor), por isso é uma função de módulo.
+    """
+    extractor = _EXTRACTORS.get(tipo_arquivo)
+    if extractor is None:
+        return None
+    return extractor(file_bytes)
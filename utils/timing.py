@@ -0,0 +1,83 @@
+import functools
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence
+from utils.metrics import REQUEST_STAGE_SECONDS
+
+# Etapas medidas na requisição atual: nome -> [segundos acumulados, ocorrências]. O dicionário é
+# compartilhado com as tarefas filhas (asyncio copia o contexto, não o objeto).
+_stages: ContextVar[Optional[Dict[str, List[float]]]] = ContextVar("request_stages", default=None)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Mede o bloco como uma etapa da requisição atual e alimenta o histograma por etapa"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        REQUEST_STAGE_SECONDS.labels(stage=stage).observe(elapsed)
+        stages = _stages.get()
+        if stages is not None:
+            entry = stages.setdefault(stage, [0.0, 0])
+            entry[0] += elapsed
+            entry[1] += 1
+
+
+def timed_async(stage: str):
+    """Decorador de `timed` para métodos assíncronos (ex.: métodos de repositórios)"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with timed(stage):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def server_timing(stages: Dict[str, List[float]], total: float) -> str:
+    """Valor do cabeçalho Server-Timing; etapas repetidas mostram a soma e a contagem"""
+    entries = []
+    for stage, (seconds, count) in stages.items():
+        desc = f';desc="{count}x"' if count > 1 else ""
+        entries.append(f"{stage};dur={seconds * 1000:.1f}{desc}")
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+class ServerTimingMiddleware:
+    """
+    Middleware ASGI puro (sem BaseHTTPMiddleware, que quebra contextvars e streaming): abre o
+    registro de etapas da requisição e acrescenta o cabeçalho Server-Timing no início da
+    resposta. Em respostas de streaming, só entram as etapas concluídas antes do primeiro byte.
+    """
+
+    def __init__(self, app, allow_origins: Sequence[str] = ()):
+        self.app = app
+        # SERVER_TIMING_ENABLED=false mantém as métricas mas não expõe o cabeçalho
+        self.enabled = os.getenv("SERVER_TIMING_ENABLED", "true").lower() == "true"
+        # Sem Timing-Allow-Origin o navegador esconde o Server-Timing de requisições cross-origin
+        self.extra_headers = [(b"timing-allow-origin", origin.encode("latin-1")) for origin in allow_origins]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stages: Dict[str, List[float]] = {}
+        token = _stages.set(stages)
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and self.enabled:
+                header = server_timing(stages, time.perf_counter() - start)
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", header.encode("latin-1"))] + self.extra_headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _stages.reset(token)
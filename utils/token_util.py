@@ -2,13 +2,15 @@ from fastapi import HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from firebase_admin import auth
 import requests 
+from utils.timing import timed
 
 security = HTTPBearer()
 
 async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     token = credentials.credentials
     try:
-        decoded_token = auth.verify_id_token(token)
+        with timed("auth"):
+            decoded_token = auth.verify_id_token(token)
         
         if not decoded_token.get("email_verified", False):
             raise Exception("E-mail não verificado")
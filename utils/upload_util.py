@@ -0,0 +1,58 @@
+import os
+from dotenv import load_dotenv
+from fastapi import HTTPException, Request
+from starlette.datastructures import FormData
+from starlette.formparsers import MultiPartException, MultiPartParser
+
+load_dotenv()
+
+MAX_UPLOAD_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(20 * 1024 * 1024)))
+# Folga para os demais campos e cabeçalhos do multipart na checagem de Content-Length
+_FORM_OVERHEAD_BYTES = 64 * 1024
+
+
+class _FileTooLarge(MultiPartException):
+    pass
+
+
+class _CappedMultiPartParser(MultiPartParser):
+    """
+    MultiPartParser do Starlette que grava os arquivos em SpooledTemporaryFile (memória até
+    UPLOAD_SPOOL_MAX_BYTES, disco acima disso) e interrompe o upload assim que um arquivo
+    passa de `max_file_size`, sem ler o restante do corpo.
+    """
+
+    spool_max_size = int(os.getenv("UPLOAD_SPOOL_MAX_BYTES", str(1024 * 1024)))
+
+    def __init__(self, *args, max_file_size: int, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_file_size = max_file_size
+        self._file_sizes = {}
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        part = self._current_part
+        if part.file is not None:
+            size = self._file_sizes.get(id(part), 0) + end - start
+            if size > self.max_file_size:
+                raise _FileTooLarge(f"Arquivo excede o limite de {self.max_file_size // (1024 * 1024)}MB.")
+            self._file_sizes[id(part)] = size
+        super().on_part_data(data, start, end)
+
+
+async def parse_upload(request: Request, max_file_size: int = MAX_UPLOAD_BYTES) -> FormData:
+    """Lê o corpo multipart em streaming; 413 se o arquivo exceder o limite, 400 se o corpo for inválido"""
+    content_type = request.headers.get("content-type", "")
+    if not content_type.startswith("multipart/form-data"):
+        raise HTTPException(status_code=415, detail="Envie o arquivo como multipart/form-data.")
+
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_file_size + _FORM_OVERHEAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Arquivo excede o limite de {max_file_size // (1024 * 1024)}MB.")
+
+    parser = _CappedMultiPartParser(request.headers, request.stream(), max_files=1, max_fields=20, max_file_size=max_file_size)
+    try:
+        return await parser.parse()
+    except _FileTooLarge as e:
+        raise HTTPException(status_code=413, detail=e.message)
+    except MultiPartException as e:
+        raise HTTPException(status_code=400, detail=e.message)